@@ -0,0 +1,89 @@
+"""
+components/alert_notifier.py - Admin Stress Alert Notifications
+Sidebar badge and pop-up toasts for alerts from the alert engine. Pages can
+register a handler to react to alerts while they are on screen.
+"""
+
+import tkinter as tk
+from config import COLORS
+from local_store import db
+from alert_engine import get_alert_engine, ALERT_RAISED
+from records import User
+
+
+DRAIN_MS = 250  # in-memory queue check; the network side is push-only
+TOAST_MS = 8000
+
+_handlers = []
+
+
+def add_alert_handler(widget, callback):
+    """Call callback(alert) for each alert while `widget` exists."""
+    _handlers.append((widget, callback))
+
+
+def _dispatch(alert):
+    for widget, callback in list(_handlers):
+        if not widget.winfo_exists():
+            _handlers.remove((widget, callback))
+            continue
+        callback(alert)
+
+
+def _user_name(user_id):
+    try:
+        rows = db.table('user1').select('first_name, last_name, email').eq('id', user_id).execute().data
+    except Exception:
+        rows = None
+    return User.from_row(rows[0]).full_name if rows else f"User {user_id}"
+
+
+def show_alert_toast(root, alert):
+    """Borderless card in the bottom-right corner of the main window."""
+    toast = tk.Toplevel(root)
+    toast.overrideredirect(True)
+    toast.attributes('-topmost', True)
+    toast.configure(bg=COLORS['accent_red'])
+
+    body = tk.Frame(toast, bg=COLORS['bg_card'])
+    body.pack(fill='both', expand=True, padx=(4, 0))
+    tk.Label(body, text="🚨 High stress alert", font=('Segoe UI', 11, 'bold'),
+             bg=COLORS['bg_card'], fg=COLORS['accent_red']).pack(anchor='w', padx=14, pady=(10, 2))
+    tk.Label(body, text=f"{_user_name(alert.user_id)} at {alert.score * 100:.0f}% stress",
+             font=('Segoe UI', 10), bg=COLORS['bg_card'], fg=COLORS['text_primary']).pack(anchor='w', padx=14)
+    tk.Label(body, text="Click to dismiss", font=('Segoe UI', 8),
+             bg=COLORS['bg_card'], fg=COLORS['text_secondary']).pack(anchor='w', padx=14, pady=(2, 10))
+
+    toast.update_idletasks()
+    x = root.winfo_rootx() + root.winfo_width() - toast.winfo_reqwidth() - 24
+    y = root.winfo_rooty() + root.winfo_height() - toast.winfo_reqheight() - 24
+    toast.geometry(f"+{max(x, 0)}+{max(y, 0)}")
+
+    for widget in (toast, body, *body.winfo_children()):
+        widget.bind('<Button-1>', lambda e: toast.destroy())
+    toast.after(TOAST_MS, lambda: toast.winfo_exists() and toast.destroy())
+    return toast
+
+
+def create_alert_notifier(app, parent):
+    """Create the sidebar badge and start draining the alert queue."""
+    engine = get_alert_engine()
+    label = tk.Label(parent, font=('Segoe UI', 9), bg=parent['bg'])
+    label.pack(pady=(0, 5))
+
+    def refresh():
+        if not label.winfo_exists():
+            return
+        for alert in engine.drain():
+            if alert.kind == ALERT_RAISED:
+                show_alert_toast(app.root, alert)
+            _dispatch(alert)
+        active = sum(1 for user_id in engine.event_counts if engine.is_active(user_id))
+        if active:
+            label.config(text=f"🔔  {active} user(s) over threshold", fg=COLORS['accent_red'])
+        else:
+            label.config(text="🔔  No active alerts", fg=COLORS['text_secondary'])
+        label.after(DRAIN_MS, refresh)
+
+    refresh()
+    return label
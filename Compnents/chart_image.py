@@ -0,0 +1,93 @@
+"""
+components/chart_image.py - Cached Chart Bitmaps
+Shows a chart as a Tk image rendered off the UI thread through the chart
+cache. A hit displays at once; on a miss the previous bitmap of the same
+chart stays up until the new one is ready.
+"""
+
+import base64
+import threading
+import tkinter as tk
+from config import COLORS
+from chart_cache import fingerprint, render_png, get_chart_cache
+from session_memory import set_label_image
+from event_log import get_logger
+
+
+DEFAULT_SIZE = (1000, 400)
+
+logger = get_logger('chart_cache')
+
+# kind -> key of the bitmap last shown, so a revisit can show it while the
+# current data renders.
+_last_shown = {}
+
+
+def _chart_size(body):
+    """Bitmap size for body: its current width (less padding) at the standard height."""
+    body.update_idletasks()
+    width = body.winfo_width() - 40
+    return (width, DEFAULT_SIZE[1]) if width >= 200 else DEFAULT_SIZE
+
+
+def _label(body):
+    label = getattr(body, '_chart_label', None)
+    if label is None or not label.winfo_exists():
+        for widget in body.winfo_children():
+            widget.destroy()
+        label = tk.Label(body, bg=COLORS['bg_card'], bd=0)
+        label.pack(fill='both', expand=True, padx=20, pady=(0, 20))
+        body._chart_label = label
+    return label
+
+
+def _show(body, png):
+    image = tk.PhotoImage(master=body, data=base64.b64encode(png))
+    set_label_image(_label(body), image)
+
+
+def has_chart(body):
+    """True once body displays a chart bitmap (so callers can skip a spinner)."""
+    label = getattr(body, '_chart_label', None)
+    return label is not None and label.winfo_exists()
+
+
+def show_chart(body, kind, data, draw, size=None):
+    """Display draw(fig) for `data` in body, from the cache when possible.
+
+    `data` must be JSON-serializable and fully determine the drawing.
+    """
+    cache = get_chart_cache()
+    size = size or _chart_size(body)
+    key = fingerprint(kind, data, size)
+    png = cache.get(key)
+    if png is not None:
+        _last_shown[kind] = key
+        _show(body, png)
+        return
+    if not has_chart(body):
+        previous = _last_shown.get(kind)
+        stale = cache.get(previous) if previous else None
+        if stale is not None:
+            _show(body, stale)
+    body._chart_pending = key
+
+    def run():
+        try:
+            png = render_png(draw, size)
+        except Exception as e:
+            logger.error("❌ Chart render failed (%s): %s", kind, e)
+            return
+        cache.put(key, png)
+        try:
+            body.after(0, lambda: finish(png))
+        except (RuntimeError, tk.TclError):
+            pass  # window closed while rendering
+
+    def finish(png):
+        # A newer request for this body may have started meanwhile.
+        if body.winfo_exists() and getattr(body, '_chart_pending', None) == key:
+            _last_shown[kind] = key
+            _show(body, png)
+
+    threading.Thread(target=run, daemon=True).start()
@@ -0,0 +1,40 @@
+"""
+components/perf_overlay.py - Live Performance Overlay
+Card listing per-stage latency (p50 / p95 / max) from the instrumentation module.
+Creating the card turns collection on, so PERF_OVERLAY works without PERF_ENABLED.
+"""
+
+import tkinter as tk
+from config import COLORS
+import instrumentation
+
+
+def create_perf_overlay(parent, refresh_ms=1000):
+    """Create a self-refreshing table of stage timings."""
+    if not instrumentation.enabled:
+        instrumentation.set_enabled(True)
+
+    card = tk.Frame(parent, bg=COLORS['bg_card'],
+                    highlightbackground=COLORS['border'], highlightthickness=1)
+    card.pack(fill='x', pady=(12, 0))
+
+    tk.Label(card, text="Performance", font=('Segoe UI', 10, 'bold'),
+             bg=COLORS['bg_card'], fg=COLORS['text_primary']).pack(anchor='w', padx=12, pady=(10, 4))
+    table = tk.Label(card, font=('Consolas', 8), justify='left', anchor='w',
+                     bg=COLORS['bg_card'], fg=COLORS['text_secondary'])
+    table.pack(fill='x', padx=12, pady=(0, 10))
+
+    def refresh():
+        if not table.winfo_exists():
+            return
+        snap = instrumentation.snapshot()
+        lines = [f"{'stage':<22}{'p50':>6}{'p95':>6}{'max':>7}"]
+        for name, s in snap['stages'].items():
+            lines.append(f"{name[:21]:<22}{s['p50_ms']:>6.1f}{s['p95_ms']:>6.1f}{s['max_ms']:>7.1f}")
+        for name, value in snap['counters'].items():
+            lines.append(f"{name[:21]:<22}{value:>19}")
+        table.config(text='\n'.join(lines) if len(lines) > 1 else "No samples yet (ms)")
+        table.after(refresh_ms, refresh)
+
+    refresh()
+    return card
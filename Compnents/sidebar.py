@@ -5,6 +5,8 @@ Navigation sidebar used across all pages.
 
 import tkinter as tk
 from config import COLORS
+from components.sync_indicator import create_sync_indicator
+from components.alert_notifier import create_alert_notifier
 
 
 def create_sidebar(app, parent, is_admin=False):
@@ -49,6 +51,9 @@ def create_sidebar(app, parent, is_admin=False):
              bg=COLORS['bg_card'], fg=COLORS['text_secondary'],
              relief='flat', anchor='w', padx=15, pady=12, cursor='hand2', bd=0,
              command=lambda: show_login(app)).pack(fill='x')
+    create_sync_indicator(logout_frame)
+    if is_admin:
+        create_alert_notifier(app, logout_frame)
     tk.Label(logout_frame, text="Stress Monitor v1.0", font=('Segoe UI', 8),
             bg=COLORS['bg_darker'], fg=COLORS['text_secondary']).pack(pady=15)
 
@@ -0,0 +1,36 @@
+"""
+components/sync_indicator.py - Sync Status Indicator
+Small sidebar badge showing whether local changes have reached Supabase.
+"""
+
+import tkinter as tk
+from config import COLORS
+from local_store import store, SyncStatus
+
+
+STATUS_STYLES = {
+    SyncStatus.SYNCED: ("●  Synced", COLORS['accent_green']),
+    SyncStatus.SYNCING: ("●  Syncing...", COLORS['accent_blue']),
+    SyncStatus.PENDING: ("●  {pending} change(s) pending", '#f59e0b'),
+    SyncStatus.OFFLINE: ("●  Offline - {pending} pending", COLORS['accent_red']),
+}
+
+
+def create_sync_indicator(parent):
+    """Create a label that refreshes itself from the local store status."""
+    if store is None:
+        return None
+
+    label = tk.Label(parent, font=('Segoe UI', 9), bg=parent['bg'], cursor='hand2')
+    label.pack(pady=(0, 5))
+    label.bind('<Button-1>', lambda e: store.request_sync())
+
+    def refresh():
+        if not label.winfo_exists():
+            return
+        text, color = STATUS_STYLES.get(store.status, STATUS_STYLES[SyncStatus.PENDING])
+        label.config(text=text.format(pending=store.pending_count()), fg=color)
+        label.after(1000, refresh)
+
+    refresh()
+    return label
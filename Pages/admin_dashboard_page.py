@@ -4,40 +4,52 @@ Displays analytics, metrics, and stress trends for administrators from Supabase.
 """
 
 import tkinter as tk
-from tkinter import ttk
-import numpy as np
+from tkinter import ttk, messagebox
+import matplotlib
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 from matplotlib.figure import Figure
-from config import COLORS
+from config import COLORS, REPORTS_FOLDER, CHART_LABEL_MAX_POINTS, HEATMAP_REFRESH_MS, ANALYTICS_SERVICE_URL
 from components.sidebar import create_sidebar
-from supabase_client import supabase
-from datetime import datetime, timedelta
+from components.alert_notifier import add_alert_handler
+from components.chart_image import show_chart, has_chart
+from session_memory import track_figure
+from downsample import fit_to_width
+from heatmap import get_heatmap, WEEKDAYS
+from alert_engine import ALERT_RAISED
+from stress_queries import (query_stress_summary, empty_summary, preset_range, parse_custom_range,
+                            previous_range, is_single_day, load_departments, load_department_users)
+from event_log import get_logger
+import instrumentation
+from datetime import timedelta
+from time_buckets import now as zone_now
 import threading
+import urllib.error
 
+logger = get_logger('admin_dashboard')
 
-def load_stress_data():
-    """Fetch stress records from Supabase."""
-    try:
-        response = supabase.table('stress_records').select('*').order('created_at', desc=True).limit(200).execute()
-        return response.data if response.data else []
-    except Exception as e:
-        print(f"❌ Error loading stress data: {str(e)}")
-        return []
 
+def _metric_values(summary):
+    """Stress, productivity, absenteeism and engagement percentages."""
+    stress_percentage = int(summary['score_sum'] / summary['sessions'] * 100)
+    total_possible = summary['total_users'] or 1
+    engagement = min(100, int(summary['active_users'] / total_possible * 100))
+    return {
+        'avg_stress': stress_percentage,
+        # Productivity is the inverse of stress
+        'productivity': max(0, 100 - stress_percentage),
+        # Absenteeism: share of users with no activity on an average day
+        'absenteeism': max(0, 100 - engagement),
+        'engagement': engagement,
+    }
 
-def load_users():
-    """Fetch all users from Supabase."""
-    try:
-        response = supabase.table('user1').select('id, email, created_at').execute()
-        return response.data if response.data else []
-    except Exception as e:
-        print(f"❌ Error loading users: {str(e)}")
-        return []
 
+def calculate_metrics(summary, previous=None):
+    """Calculate KPI figures from an aggregated stress summary.
 
-def calculate_metrics(stress_data, users):
-    """Calculate real metrics from stress records."""
-    if not stress_data:
+    Changes are percentage-point differences against the previous period's
+    summary; they are 0 when that period has no data.
+    """
+    if not summary['sessions']:
         return {
             'avg_stress': 0,
             'productivity': 100,
@@ -51,115 +63,440 @@ def calculate_metrics(stress_data, users):
             'engagement_change': 0
         }
     
-    total_sessions = len(stress_data)
-    stress_scores = [float(record['avg_stress_score'] or 0) for record in stress_data]
-    avg_stress = sum(stress_scores) / len(stress_scores) if stress_scores else 0
-    
-    # Convert to percentage (0-100)
-    stress_percentage = int(avg_stress * 100)
-    
-    # Calculate productivity (inverse of stress)
-    productivity = max(0, 100 - stress_percentage)
-    
-    # Count high stress events
-    high_stress_count = sum(1 for score in stress_scores if score >= 0.7)
-    
-    # Calculate engagement based on sessions and users
-    unique_users = len(set(record['user_id'] for record in stress_data))
-    total_possible = len(users) if users else 1
-    engagement = int((unique_users / total_possible * 100)) if total_possible > 0 else 0
-    
-    # Calculate absenteeism (users with no recent activity)
-    absenteeism = max(0, 100 - engagement)
-    
-    # Calculate changes (random for now, can be calculated from historical data)
-    stress_change = -5 if stress_percentage < 70 else 5
-    productivity_change = 3
-    absenteeism_change = -1 if absenteeism < 10 else 1
-    engagement_change = 7
-    
-    return {
-        'avg_stress': stress_percentage,
-        'productivity': productivity,
-        'absenteeism': absenteeism,
-        'engagement': engagement,
-        'high_stress_count': high_stress_count,
-        'total_sessions': total_sessions,
-        'stress_change': stress_change,
-        'productivity_change': productivity_change,
-        'absenteeism_change': absenteeism_change,
-        'engagement_change': engagement_change
-    }
+    metrics = _metric_values(summary)
+    metrics['high_stress_count'] = summary['high_stress_count']
+    metrics['total_sessions'] = summary['sessions']
 
+    before = _metric_values(previous) if previous and previous['sessions'] else None
+    for key in ('avg_stress', 'productivity', 'absenteeism', 'engagement'):
+        change_key = 'stress_change' if key == 'avg_stress' else f'{key}_change'
+        metrics[change_key] = metrics[key] - before[key] if before else 0
+    return metrics
 
-def get_last_n_days_stress(stress_data, days=30):
-    """Get stress data for last N days - works with your timestamp format."""
-    
-    if not stress_data:
-        return {'Day 1': 50, 'Day 2': 55, 'Day 3': 60, 'Day 4': 45, 'Day 5': 70}
-    
-    daily_data = {}
-    
-    for record in stress_data:
-        if record['created_at']:
-            try:
-                timestamp_str = record['created_at']
-                date = timestamp_str.split(' ')[0]
-                
-                stress = float(record['avg_stress_score'] or 0) * 100
-                if date not in daily_data:
-                    daily_data[date] = []
-                daily_data[date].append(stress)
-            except Exception as e:
-                print(f"Error parsing date: {e}")
-                continue
-    
-    if not daily_data:
-        return {'Day 1': 50, 'Day 2': 55, 'Day 3': 60, 'Day 4': 45, 'Day 5': 70}
-    
-    daily_avg = {}
-    for date, scores in sorted(daily_data.items()):
-        avg = sum(scores) / len(scores) if scores else 0
-        daily_avg[date] = int(avg)
-    
-    print(f"✅ Daily data: {daily_avg}")
-    return daily_avg
 
+def get_trend_series(summary, start, end):
+    """Hourly series for single-day ranges, daily series otherwise."""
+    if is_single_day(start, end):
+        series = summary['hourly']
+        return list(series), list(series.values()), list(series), 'Hour of Day'
+    series = summary['daily']
+    return list(series), list(series.values()), [d[5:] for d in series], 'Date'
 
-def get_hourly_stress_data(stress_data):
-    """Get stress data by hour - best for same-day data."""
-    
-    if not stress_data:
-        return {'09:00': 50, '10:00': 55, '11:00': 60, '12:00': 45, '13:00': 70}
-    
-    hourly_data = {}
-    
-    for record in stress_data:
-        if record['created_at']:
-            try:
-                timestamp_str = record['created_at']
-                time_part = timestamp_str.split(' ')[1]
-                hour = time_part.split(':')[0]
-                hour_str = f"{hour}:00"
-                
-                stress = float(record['avg_stress_score'] or 0) * 100
-                if hour_str not in hourly_data:
-                    hourly_data[hour_str] = []
-                hourly_data[hour_str].append(stress)
-            except Exception as e:
-                print(f"Error parsing hour: {e}")
-                continue
+
+def start_monthly_reports(app, button):
+    """Generate last month's all-staff reports without blocking the UI."""
+    from report_engine import generate_reports, month_range
+
+    month = (zone_now().replace(day=1) - timedelta(days=1)).strftime('%Y-%m')
+    start, end = month_range(month)
+
+    def set_button(**options):
+        if button.winfo_exists():
+            button.config(**options)
+
+    set_button(state='disabled', text="⏳ Generating...")
+
+    def progress(done, total):
+        app.root.after(0, lambda: set_button(text=f"⏳ {done}/{total}"))
+
+    def run():
+        try:
+            files = list(generate_reports(start, end, on_progress=progress))
+            message = f"Generated {len(files)} file(s) for {month} in '{REPORTS_FOLDER}'."
+            app.root.after(0, lambda: messagebox.showinfo("Reports Ready", message))
+        except Exception as e:
+            error = str(e)
+            app.root.after(0, lambda: messagebox.showerror("Error", f"Failed to generate reports: {error}"))
+        finally:
+            app.root.after(0, lambda: set_button(state='normal', text="📄 Monthly Reports"))
+
+    threading.Thread(target=run, daemon=True).start()
+
+
+def create_filter_bar(parent, on_change):
+    """Range presets, custom dates, department and user filters.
+
+    Returns a dict holding the current selection; on_change() is called
+    whenever it changes.
+    """
+    state = {'preset': '7d', 'start': None, 'end': None, 'department': None, 'user_id': None}
+    state['start'], state['end'] = preset_range('7d')
+
+    bar = tk.Frame(parent, bg=COLORS['bg_card'], highlightbackground=COLORS['border'], highlightthickness=1)
+    bar.pack(fill='x', pady=(0, 20))
+    inner = tk.Frame(bar, bg=COLORS['bg_card'])
+    inner.pack(fill='x', padx=15, pady=12)
+
+    # Range presets
+    range_buttons = {}
+    custom_frame = tk.Frame(inner, bg=COLORS['bg_card'])
+
+    def select_preset(preset):
+        state['preset'] = preset
+        for key, btn in range_buttons.items():
+            btn.config(bg=COLORS['accent_blue'] if key == preset else COLORS['bg_input'])
+        if preset == 'custom':
+            custom_frame.pack(side='left', padx=(10, 0))
+            return
+        custom_frame.pack_forget()
+        state['start'], state['end'] = preset_range(preset)
+        on_change()
+
+    for key, label in (('today', "Today"), ('7d', "7 Days"), ('30d', "30 Days"), ('custom', "Custom")):
+        btn = tk.Button(inner, text=label, font=('Segoe UI', 10, 'bold'), bg=COLORS['bg_input'],
+                        fg=COLORS['text_primary'], relief='flat', padx=14, pady=6, cursor='hand2', bd=0,
+                        command=lambda k=key: select_preset(k))
+        btn.pack(side='left', padx=(0, 6))
+        range_buttons[key] = btn
+    range_buttons['7d'].config(bg=COLORS['accent_blue'])
+
+    # Custom range (YYYY-MM-DD, end inclusive)
+    start_entry = tk.Entry(custom_frame, font=('Segoe UI', 10), width=11, bg=COLORS['bg_input'],
+                           fg=COLORS['text_primary'], relief='flat', insertbackground=COLORS['text_primary'])
+    end_entry = tk.Entry(custom_frame, font=('Segoe UI', 10), width=11, bg=COLORS['bg_input'],
+                         fg=COLORS['text_primary'], relief='flat', insertbackground=COLORS['text_primary'])
+    start_entry.insert(0, state['start'])
+    end_entry.insert(0, zone_now().strftime('%Y-%m-%d'))
+    start_entry.pack(side='left', ipady=5)
+    tk.Label(custom_frame, text="→", font=('Segoe UI', 10), bg=COLORS['bg_card'],
+             fg=COLORS['text_secondary']).pack(side='left', padx=5)
+    end_entry.pack(side='left', ipady=5)
+
+    def apply_custom():
+        try:
+            state['start'], state['end'] = parse_custom_range(start_entry.get(), end_entry.get())
+        except ValueError as e:
+            messagebox.showerror("Error", f"Invalid date range (use YYYY-MM-DD): {str(e)}")
+            return
+        on_change()
+
+    tk.Button(custom_frame, text="Apply", font=('Segoe UI', 9, 'bold'), bg=COLORS['accent_green'],
+              fg='white', relief='flat', padx=10, pady=4, cursor='hand2', bd=0,
+              command=apply_custom).pack(side='left', padx=(6, 0))
+
+    # Department and user filters
+    user_var = tk.StringVar(value="All users")
+    user_box = ttk.Combobox(inner, textvariable=user_var, state='readonly', width=28)
+    user_box.pack(side='right')
+    tk.Label(inner, text="User", font=('Segoe UI', 9), bg=COLORS['bg_card'],
+             fg=COLORS['text_secondary']).pack(side='right', padx=(15, 6))
+
+    dept_var = tk.StringVar(value="All departments")
+    dept_box = ttk.Combobox(inner, textvariable=dept_var, state='readonly', width=20)
+    dept_box.pack(side='right')
+    tk.Label(inner, text="Department", font=('Segoe UI', 9), bg=COLORS['bg_card'],
+             fg=COLORS['text_secondary']).pack(side='right', padx=(15, 6))
+
+    user_ids = {}
+
+    def fill_users(users):
+        user_ids.clear()
+        for u in users:
+            user_ids[f"{u.full_name} ({u.email or ''})"] = u.id
+        if user_box.winfo_exists():
+            user_box.config(values=["All users"] + list(user_ids))
+            user_var.set("All users")
+
+    def app_after(callback):
+        if bar.winfo_exists():
+            bar.after(0, callback)
+
+    def on_department(event=None):
+        dept = dept_var.get()
+        department = None if dept == "All departments" else dept
+        state['department'] = department
+        state['user_id'] = None
+
+        def reload_users():
+            users = load_department_users(department)
+            app_after(lambda: fill_users(users))
+
+        threading.Thread(target=reload_users, daemon=True).start()
+        on_change()
+
+    def on_user(event=None):
+        state['user_id'] = user_ids.get(user_var.get())
+        on_change()
+
+    dept_box.bind('<<ComboboxSelected>>', on_department)
+    user_box.bind('<<ComboboxSelected>>', on_user)
+
+    def load_filter_options():
+        departments = load_departments()
+        users = load_department_users()
+        app_after(lambda: dept_box.config(values=["All departments"] + departments))
+        app_after(lambda: fill_users(users))
+
+    threading.Thread(target=load_filter_options, daemon=True).start()
+    return state
+
+
+def render_kpis(kpi_frame, metrics):
+    """Draw the four KPI cards into kpi_frame."""
+    for widget in kpi_frame.winfo_children():
+        widget.destroy()
+
+    kpis = [
+        ("😟", "Average Stress Level", f"{metrics['avg_stress']}%", 
+         f"{'↑' if metrics['stress_change'] > 0 else '↓'} {abs(metrics['stress_change'])}%", 
+         COLORS['accent_blue'], COLORS['bg_card']),
+        ("⚡", "Productivity Index", f"{metrics['productivity']}%", 
+         f"{'↑' if metrics['productivity_change'] > 0 else '↓'} {abs(metrics['productivity_change'])}%", 
+         COLORS['accent_green'], '#1a472a'),
+        ("📉", "Absenteeism", f"{metrics['absenteeism']}%", 
+         f"{'↓' if metrics['absenteeism_change'] < 0 else '↑'} {abs(metrics['absenteeism_change'])}%", 
+         COLORS['accent_orange'], '#472a1a'),
+        ("🤝", "Engagement", f"{metrics['engagement']}%", 
+         f"{'↑' if metrics['engagement_change'] > 0 else '↓'} {abs(metrics['engagement_change'])}%", 
+         COLORS['accent_purple'], '#3a1a47')
+    ]
+    
+    for icon, title, value, change, accent_color, card_bg in kpis:
+        card = tk.Frame(kpi_frame, bg=card_bg, highlightbackground=accent_color, highlightthickness=2)
+        card.pack(side='left', expand=True, fill='both', padx=5)
+        
+        card_content = tk.Frame(card, bg=card_bg)
+        card_content.pack(padx=18, pady=18)
+        
+        # Icon + Title
+        icon_title = tk.Frame(card_content, bg=card_bg)
+        icon_title.pack(anchor='w', pady=(0, 8))
+        tk.Label(icon_title, text=icon, font=('Segoe UI', 20), bg=card_bg).pack(side='left', padx=(0, 10))
+        tk.Label(icon_title, text=title, font=('Segoe UI', 9), bg=card_bg, fg=COLORS['text_secondary']).pack(side='left')
+        
+        # Value
+        tk.Label(card_content, text=value, font=('Segoe UI', 28, 'bold'), bg=card_bg, fg=accent_color).pack(anchor='w')
+        
+        # Change
+        change_color = '#10b981' if '↑' in change or '↓' in change else COLORS['text_secondary']
+        tk.Label(card_content, text=change, font=('Segoe UI', 10), bg=card_bg, fg=change_color).pack(anchor='w', pady=(5, 0))
+
+
+def draw_stress_chart(fig, values, x_labels, x_title):
+    """Stress trend line chart (values in %) onto an empty figure."""
+    fig.set(facecolor=COLORS['bg_card'], edgecolor=COLORS['border'], linewidth=2)
+    ax = fig.add_subplot(111)
+    ax.set_facecolor(COLORS['bg_darker'])
+    
+    # Long ranges are cut to about one point per pixel; markers only on short ones
+    short = len(values) <= CHART_LABEL_MAX_POINTS
+    xs, ys = fit_to_width(range(len(values)), values, int(fig.get_figwidth() * fig.dpi))
+    if short:
+        ax.plot(xs, ys, color=COLORS['accent_blue'], linewidth=3.5, marker='o', markersize=8, markerfacecolor=COLORS['accent_blue'], markeredgecolor='white', markeredgewidth=2)
+    else:
+        ax.plot(xs, ys, color=COLORS['accent_blue'], linewidth=2)
+    ax.fill_between(xs, ys, alpha=0.2, color=COLORS['accent_blue'])
+    
+    ticks = range(0, len(x_labels), -(-len(x_labels) // 12))
+    ax.set_xticks(ticks)
+    ax.set_xticklabels([x_labels[i] for i in ticks], color=COLORS['text_secondary'], fontsize=10)
+    ax.set_ylim(0, 100)
+    ax.tick_params(colors=COLORS['text_secondary'], labelsize=10, left=True, bottom=True)
+    
+    # Grid styling
+    ax.grid(True, color=COLORS['border'], linestyle='--', alpha=0.3, linewidth=0.8)
+    ax.set_axisbelow(True)
+    
+    # Spine styling
+    ax.spines['bottom'].set_color(COLORS['border'])
+    ax.spines['top'].set_visible(False)
+    ax.spines['right'].set_visible(False)
+    ax.spines['left'].set_color(COLORS['border'])
+    ax.spines['left'].set_linewidth(1.5)
+    ax.spines['bottom'].set_linewidth(1.5)
+    
+    # Axis labels
+    ax.set_ylabel('Average Stress Level (%)', color=COLORS['text_secondary'], fontsize=10, labelpad=15)
+    ax.set_xlabel(x_title, color=COLORS['text_secondary'], fontsize=10)
+    
+    # Add value labels on points
+    if short:
+        for x, y in enumerate(values):
+            ax.text(x, y + 3, f'{y}%', ha='center', va='bottom', color=COLORS['accent_blue'], fontsize=9, fontweight='bold')
+
+
+@instrumentation.timed('chart.stress_trend')
+def render_stress_chart(body, summary, start, end):
+    """Show the stress trend chart in body (cached bitmap, rendered off the UI thread)."""
+    keys, values, x_labels, x_title = get_trend_series(summary, start, end)
+    if not values:
+        show_loading(body, "❌ No data available", COLORS['bg_card'])
+        return
+    show_chart(body, 'stress_trend', [values, x_labels, x_title],
+               lambda fig: draw_stress_chart(fig, values, x_labels, x_title))
+
+
+def draw_emotion_chart(fig, stress_counts, emotion_counts):
+    """Stress level bars and emotion pie side by side onto an empty figure."""
+    fig.set(facecolor=COLORS['bg_card'], edgecolor=COLORS['border'], linewidth=2)
+    
+    # Left: Stress Level Bar Chart
+    ax1 = fig.add_subplot(121)
+    ax1.set_facecolor(COLORS['bg_darker'])
+    levels = list(stress_counts.keys())
+    counts = list(stress_counts.values())
+    colors_map = {'Low': '#10b981', 'Medium': '#f59e0b', 'High': '#ef4444', 'Unknown': '#64748b'}
+    bar_colors = [colors_map.get(level, '#64748b') for level in levels]
+    
+    bars = ax1.bar(levels, counts, color=bar_colors, edgecolor='white', linewidth=2, width=0.6)
+    ax1.set_title('Stress Level Distribution', color=COLORS['text_primary'], fontweight='bold', fontsize=12, pad=15)
+    ax1.set_ylabel('Count', color=COLORS['text_secondary'], fontsize=10, labelpad=10)
+    ax1.tick_params(colors=COLORS['text_secondary'], labelsize=10, left=True, bottom=True)
+    ax1.spines['bottom'].set_color(COLORS['border'])
+    ax1.spines['top'].set_visible(False)
+    ax1.spines['right'].set_visible(False)
+    ax1.spines['left'].set_color(COLORS['border'])
+    ax1.spines['left'].set_linewidth(1.5)
+    ax1.spines['bottom'].set_linewidth(1.5)
+    ax1.grid(True, axis='y', color=COLORS['border'], linestyle='--', alpha=0.3, linewidth=0.8)
+    ax1.set_axisbelow(True)
+    
+    # Add value labels
+    for bar in bars:
+        height = bar.get_height()
+        ax1.text(bar.get_x() + bar.get_width()/2., height,
+                f'{int(height)}', ha='center', va='bottom', color=COLORS['text_secondary'], fontsize=10, fontweight='bold')
+    
+    # Right: Emotion Pie Chart
+    ax2 = fig.add_subplot(122)
+    ax2.set_facecolor(COLORS['bg_darker'])
+    emotions_list = list(emotion_counts.keys())
+    emotion_values = list(emotion_counts.values())
+    emotion_colors = ['#3b82f6', '#10b981', '#f59e0b', '#ef4444']
+    
+    wedges, texts, autotexts = ax2.pie(emotion_values, labels=emotions_list, autopct='%1.1f%%',
+                                        colors=emotion_colors, startangle=90, 
+                                        textprops={'color': COLORS['text_secondary'], 'fontsize': 9},
+                                        wedgeprops={'edgecolor': 'white', 'linewidth': 2})
+    ax2.set_title('Emotion Distribution', color=COLORS['text_primary'], fontweight='bold', fontsize=12, pad=15)
+    
+    # Style autotext
+    for autotext in autotexts:
+        autotext.set_color('white')
+        autotext.set_fontweight('bold')
+        autotext.set_fontsize(9)
+
+
+@instrumentation.timed('chart.emotion')
+def render_emotion_chart(body, summary):
+    """Show the stress level / emotion chart in body (cached bitmap, rendered off the UI thread)."""
+    if not summary['sessions']:
+        show_loading(body, "❌ No data available", COLORS['bg_card'])
+        return
+    levels, emotions = dict(summary['levels']), dict(summary['emotions'])
+    show_chart(body, 'emotion', [levels, emotions], lambda fig: draw_emotion_chart(fig, levels, emotions))
+
+
+def _draw_heatmap(body, names, matrix):
+    for widget in body.winfo_children():
+        widget.destroy()
+    fig = Figure(figsize=(10, max(2.5, 0.32 * len(names) + 1.2)), facecolor=COLORS['bg_card'])
+    ax = fig.add_subplot(111)
+    cmap = matplotlib.colormaps['RdYlGn_r'].with_extremes(bad=COLORS['bg_darker'])
+    # One image for every department and hour: no per-cell artists.
+    image = ax.imshow(matrix, aspect='auto', cmap=cmap, vmin=0, vmax=100, interpolation='nearest')
+    ax.set_yticks(range(len(names)))
+    ax.set_yticklabels(names, color=COLORS['text_secondary'], fontsize=9)
+    ax.set_xticks([day * 24 + 12 for day in range(7)])
+    ax.set_xticklabels(WEEKDAYS, color=COLORS['text_secondary'], fontsize=9)
+    ax.set_xticks([day * 24 - 0.5 for day in range(1, 7)], minor=True)
+    ax.tick_params(which='minor', length=0)
+    ax.grid(True, which='minor', axis='x', color=COLORS['bg_card'], linewidth=2)
+    ax.tick_params(which='major', length=0)
+    for spine in ax.spines.values():
+        spine.set_visible(False)
+    colorbar = fig.colorbar(image, ax=ax, fraction=0.025, pad=0.01)
+    colorbar.ax.tick_params(colors=COLORS['text_secondary'], labelsize=8)
+    colorbar.set_label('Avg stress (%)', color=COLORS['text_secondary'], fontsize=9)
+
+    canvas = track_figure(FigureCanvasTkAgg(fig, body))
+    canvas.draw()
+    canvas.get_tk_widget().pack(fill='both', expand=True, padx=20, pady=(10, 20))
+    return image, canvas
+
+
+def render_heatmap(body):
+    """Department x weekday/hour heatmap that follows the replica: new
+    records only update the image data, not the figure."""
+    def load():
+        message = None
+        try:
+            heatmap = get_heatmap()
+        except urllib.error.HTTPError as e:
+            logger.error("❌ Analytics service refused the heatmap: %s", e)
+            heatmap, message = None, f"❌ Analytics service refused the request (HTTP {e.code})"
+        except OSError as e:
+            # Without a replica the first matrix comes from the analytics service.
+            logger.error("❌ Analytics service unreachable: %s", e)
+            heatmap, message = None, f"❌ Analytics service unreachable at {ANALYTICS_SERVICE_URL}"
+        except Exception as e:
+            logger.error("❌ Error building stress heatmap: %s", e)
+            heatmap, message = None, "❌ Could not build the heatmap"
+        if body.winfo_exists():
+            body.after(0, lambda: start(heatmap, message))
+
+    def start(heatmap, message=None):
+        if not body.winfo_exists():
+            return
+        if heatmap is None:
+            show_loading(body, message or "Heatmap needs the local replica (OFFLINE_MODE) or ANALYTICS_SERVICE_URL",
+                         COLORS['bg_card'])
+            return
+        shown = {'version': None, 'names': None, 'image': None, 'canvas': None}
+
+        @instrumentation.timed('chart.heatmap')
+        def update():
+            if heatmap.version == shown['version']:
+                return
+            shown['version'] = heatmap.version
+            names, matrix = heatmap.matrix()
+            if not names:
+                show_loading(body, "❌ No data available", COLORS['bg_card'])
+                shown['names'] = None
+            elif names == shown['names']:
+                shown['image'].set_data(matrix)
+                shown['canvas'].draw_idle()
+            else:
+                shown['image'], shown['canvas'] = _draw_heatmap(body, names, matrix)
+                shown['names'] = names
+
+        def poll():
+            if body.winfo_exists():
+                update()
+                body.after(HEATMAP_REFRESH_MS, poll)
+
+        poll()
+
+    show_loading(body, "⏳ Building heatmap...", COLORS['bg_card'])
+    threading.Thread(target=load, daemon=True).start()
+
+
+def create_chart_card(parent, title, accent):
+    """Card with a coloured header; returns the body frame charts render into."""
+    card = tk.Frame(parent, bg=COLORS['bg_card'], highlightbackground=accent, highlightthickness=2)
+    card.pack(fill='both', expand=True, pady=(0, 20))
     
-    if not hourly_data:
-        return {'09:00': 50, '10:00': 55, '11:00': 60, '12:00': 45, '13:00': 70}
+    # Chart header with collapse button
+    chart_header = tk.Frame(card, bg=accent)
+    chart_header.pack(fill='x', padx=0, pady=0)
     
-    hourly_avg = {}
-    for hour, scores in sorted(hourly_data.items()):
-        avg = sum(scores) / len(scores) if scores else 0
-        hourly_avg[hour] = int(avg)
+    header_content = tk.Frame(chart_header, bg=accent)
+    header_content.pack(fill='x', padx=20, pady=15)
     
-    print(f"✅ Hourly data: {hourly_avg}")
-    return hourly_avg
+    tk.Label(header_content, text=title, font=('Segoe UI', 16, 'bold'),
+            bg=accent, fg=COLORS['text_primary']).pack(side='left', expand=True)
+    tk.Label(header_content, text="⬆", font=('Segoe UI', 16),
+            bg=accent, fg=COLORS['text_primary']).pack(side='right')
+
+    body = tk.Frame(card, bg=COLORS['bg_card'])
+    body.pack(fill='both', expand=True)
+    return body
+
+
+def show_loading(frame, text, bg):
+    for widget in frame.winfo_children():
+        widget.destroy()
+    tk.Label(frame, text=text, font=('Segoe UI', 10), bg=bg, fg=COLORS['text_secondary']).pack(pady=20)
 
 
 def show_admin_dashboard(app):
@@ -179,7 +516,13 @@ def show_admin_dashboard(app):
     header.pack(fill='x', padx=40, pady=30)
     tk.Label(header, text="📊 Admin Dashboard", font=('Segoe UI', 32, 'bold'),
             bg=COLORS['bg_dark'], fg=COLORS['accent_blue']).pack(side='left')
-    
+
+    report_btn = tk.Button(header, text="📄 Monthly Reports", font=('Segoe UI', 11, 'bold'),
+                           bg=COLORS['accent_purple'], fg='white', relief='flat',
+                           padx=20, pady=8, cursor='hand2', bd=0)
+    report_btn.config(command=lambda: start_monthly_reports(app, report_btn))
+    report_btn.pack(side='right')
+
     # Scrollable Content
     canvas = tk.Canvas(main, bg=COLORS['bg_dark'], highlightthickness=0, bd=0)
     scrollbar = ttk.Scrollbar(main, orient='vertical', command=canvas.yview)
@@ -192,6 +535,9 @@ def show_admin_dashboard(app):
     
     content = tk.Frame(scrollable_frame, bg=COLORS['bg_dark'])
     content.pack(fill='both', expand=True, padx=40, pady=20)
+
+    # Filters
+    filters = create_filter_bar(content, lambda: refresh())
     
     # KPI Section - with loading
     tk.Label(content, text="📈 Employee Metrics", font=('Segoe UI', 14, 'bold'),
@@ -200,221 +546,49 @@ def show_admin_dashboard(app):
     kpi_frame = tk.Frame(content, bg=COLORS['bg_dark'])
     kpi_frame.pack(fill='x', pady=(0, 25))
     
-    loading_label = tk.Label(kpi_frame, text="⏳ Loading metrics...",
-                            font=('Segoe UI', 11), bg=COLORS['bg_dark'], fg=COLORS['text_secondary'])
-    loading_label.pack()
-    
-    def load_and_display_kpis():
-        stress_data = load_stress_data()
-        users = load_users()
-        metrics = calculate_metrics(stress_data, users)
-        
-        loading_label.pack_forget()
-        
-        kpis = [
-            ("😟", "Average Stress Level", f"{metrics['avg_stress']}%", 
-             f"{'↑' if metrics['stress_change'] > 0 else '↓'} {abs(metrics['stress_change'])}%", 
-             COLORS['accent_blue'], COLORS['bg_card']),
-            ("⚡", "Productivity Index", f"{metrics['productivity']}%", 
-             f"{'↑' if metrics['productivity_change'] > 0 else '↓'} {abs(metrics['productivity_change'])}%", 
-             COLORS['accent_green'], '#1a472a'),
-            ("📉", "Absenteeism", f"{metrics['absenteeism']}%", 
-             f"{'↓' if metrics['absenteeism_change'] < 0 else '↑'} {abs(metrics['absenteeism_change'])}%", 
-             COLORS['accent_orange'], '#472a1a'),
-            ("🤝", "Engagement", f"{metrics['engagement']}%", 
-             f"{'↑' if metrics['engagement_change'] > 0 else '↓'} {abs(metrics['engagement_change'])}%", 
-             COLORS['accent_purple'], '#3a1a47')
-        ]
-        
-        for icon, title, value, change, accent_color, card_bg in kpis:
-            card = tk.Frame(kpi_frame, bg=card_bg, highlightbackground=accent_color, highlightthickness=2)
-            card.pack(side='left', expand=True, fill='both', padx=5)
-            
-            card_content = tk.Frame(card, bg=card_bg)
-            card_content.pack(padx=18, pady=18)
-            
-            # Icon + Title
-            icon_title = tk.Frame(card_content, bg=card_bg)
-            icon_title.pack(anchor='w', pady=(0, 8))
-            tk.Label(icon_title, text=icon, font=('Segoe UI', 20), bg=card_bg).pack(side='left', padx=(0, 10))
-            tk.Label(icon_title, text=title, font=('Segoe UI', 9), bg=card_bg, fg=COLORS['text_secondary']).pack(side='left')
-            
-            # Value
-            tk.Label(card_content, text=value, font=('Segoe UI', 28, 'bold'), bg=card_bg, fg=accent_color).pack(anchor='w')
-            
-            # Change
-            change_color = '#10b981' if '↑' in change or '↓' in change else COLORS['text_secondary']
-            tk.Label(card_content, text=change, font=('Segoe UI', 10), bg=card_bg, fg=change_color).pack(anchor='w', pady=(5, 0))
-    
-    thread = threading.Thread(target=load_and_display_kpis, daemon=True)
-    thread.start()
-    
     # Stress Trends Chart
-    chart_card = tk.Frame(content, bg=COLORS['bg_card'], 
-                         highlightbackground=COLORS['accent_blue'], highlightthickness=2)
-    chart_card.pack(fill='both', expand=True, pady=(0, 20))
-    
-    # Chart header with collapse button
-    chart_header = tk.Frame(chart_card, bg=COLORS['accent_blue'])
-    chart_header.pack(fill='x', padx=0, pady=0)
-    
-    header_content = tk.Frame(chart_header, bg=COLORS['accent_blue'])
-    header_content.pack(fill='x', padx=20, pady=15)
-    
-    tk.Label(header_content, text="📈 Stress Trends", font=('Segoe UI', 16, 'bold'),
-            bg=COLORS['accent_blue'], fg=COLORS['text_primary']).pack(side='left', expand=True)
-    tk.Label(header_content, text="⬆", font=('Segoe UI', 16),
-            bg=COLORS['accent_blue'], fg=COLORS['text_primary']).pack(side='right')
-    
-    chart_loading = tk.Label(chart_card, text="⏳ Generating chart...",
-                            font=('Segoe UI', 10), bg=COLORS['bg_card'], fg=COLORS['text_secondary'])
-    chart_loading.pack(pady=20)
-    
-    def load_and_display_stress_chart():
-        stress_data = load_stress_data()
-        daily_avg = get_last_n_days_stress(stress_data)
-        
-        if not daily_avg:
-            chart_loading.config(text="❌ No data available")
-            return
-        
-        chart_loading.pack_forget()
-        
-        days = sorted(daily_avg.keys())
-        values = [daily_avg[d] for d in days]
-        x_labels = [d.split('-')[2] for d in days]  # Extract day from YYYY-MM-DD
-        
-        fig = Figure(figsize=(10, 4), facecolor=COLORS['bg_card'], edgecolor=COLORS['border'], linewidth=2)
-        ax = fig.add_subplot(111)
-        ax.set_facecolor(COLORS['bg_darker'])
-        
-        # Plot with gradient effect
-        ax.plot(range(len(values)), values, color=COLORS['accent_blue'], linewidth=3.5, marker='o', markersize=8, markerfacecolor=COLORS['accent_blue'], markeredgecolor='white', markeredgewidth=2)
-        ax.fill_between(range(len(values)), values, alpha=0.2, color=COLORS['accent_blue'])
-        
-        ax.set_xticks(range(len(x_labels)))
-        ax.set_xticklabels(x_labels, color=COLORS['text_secondary'], fontsize=10)
-        ax.set_ylim(0, 100)
-        ax.tick_params(colors=COLORS['text_secondary'], labelsize=10, left=True, bottom=True)
-        
-        # Grid styling
-        ax.grid(True, color=COLORS['border'], linestyle='--', alpha=0.3, linewidth=0.8)
-        ax.set_axisbelow(True)
-        
-        # Spine styling
-        ax.spines['bottom'].set_color(COLORS['border'])
-        ax.spines['top'].set_visible(False)
-        ax.spines['right'].set_visible(False)
-        ax.spines['left'].set_color(COLORS['border'])
-        ax.spines['left'].set_linewidth(1.5)
-        ax.spines['bottom'].set_linewidth(1.5)
-        
-        # Y-axis label
-        ax.set_ylabel('Average Stress Level (%)', color=COLORS['text_secondary'], fontsize=10, labelpad=15)
-        
-        # Add value labels on points
-        for i, (x, y) in enumerate(zip(range(len(values)), values)):
-            ax.text(x, y + 3, f'{y}%', ha='center', va='bottom', color=COLORS['accent_blue'], fontsize=9, fontweight='bold')
-        
-        canvas_chart = FigureCanvasTkAgg(fig, chart_card)
-        canvas_chart.draw()
-        canvas_chart.get_tk_widget().pack(fill='both', expand=True, padx=20, pady=(0, 20))
-    
-    thread = threading.Thread(target=load_and_display_stress_chart, daemon=True)
-    thread.start()
+    trend_body = create_chart_card(content, "📈 Stress Trends", COLORS['accent_blue'])
     
     # Emotion & Stress Level Distribution
-    dept_card = tk.Frame(content, bg=COLORS['bg_card'], 
-                        highlightbackground=COLORS['accent_purple'], highlightthickness=2)
-    dept_card.pack(fill='both', expand=True, pady=(0, 20))
-    
-    dept_header = tk.Frame(dept_card, bg=COLORS['accent_purple'])
-    dept_header.pack(fill='x', padx=0, pady=0)
-    
-    header_content2 = tk.Frame(dept_header, bg=COLORS['accent_purple'])
-    header_content2.pack(fill='x', padx=20, pady=15)
-    
-    tk.Label(header_content2, text="🎭 Stress Level & Emotion Analysis", font=('Segoe UI', 16, 'bold'),
-            bg=COLORS['accent_purple'], fg=COLORS['text_primary']).pack(side='left', expand=True)
-    tk.Label(header_content2, text="⬆", font=('Segoe UI', 16),
-            bg=COLORS['accent_purple'], fg=COLORS['text_primary']).pack(side='right')
-    
-    chart_loading2 = tk.Label(dept_card, text="⏳ Generating chart...",
-                             font=('Segoe UI', 10), bg=COLORS['bg_card'], fg=COLORS['text_secondary'])
-    chart_loading2.pack(pady=20)
-    
-    def load_and_display_emotion_chart():
-        stress_data = load_stress_data()
-        
-        if not stress_data:
-            chart_loading2.config(text="❌ No data available")
+    emotion_body = create_chart_card(content, "🎭 Stress Level & Emotion Analysis", COLORS['accent_purple'])
+
+    # Department x weekday/hour over the last quarter; independent of the filters
+    heatmap_body = create_chart_card(content, "🔥 Stress by Department, Weekday & Hour", COLORS['accent_orange'])
+    render_heatmap(heatmap_body)
+
+    # Only the newest request renders; slower, stale queries are dropped.
+    generation = [0]
+
+    def refresh():
+        generation[0] += 1
+        current = generation[0]
+        selection = dict(filters)
+        show_loading(kpi_frame, "⏳ Loading metrics...", COLORS['bg_dark'])
+        # Charts already on screen stay up until the new bitmaps are ready.
+        for body in (trend_body, emotion_body):
+            if not has_chart(body):
+                show_loading(body, "⏳ Generating chart...", COLORS['bg_card'])
+
+        def load():
+            filters_kw = {'department': selection['department'], 'user_id': selection['user_id']}
+            try:
+                summary = query_stress_summary(selection['start'], selection['end'], **filters_kw)
+                previous = query_stress_summary(*previous_range(selection['start'], selection['end']), **filters_kw)
+            except Exception as e:
+                logger.error("❌ Error loading dashboard data: %s", e)
+                summary, previous = empty_summary(), None
+            if kpi_frame.winfo_exists():
+                kpi_frame.after(0, lambda: render(current, selection, summary, previous))
+
+        threading.Thread(target=load, daemon=True).start()
+
+    def render(current, selection, summary, previous):
+        if current != generation[0] or not kpi_frame.winfo_exists():
             return
-        
-        chart_loading2.pack_forget()
-        
-        # Stress Level Distribution
-        stress_levels = [record['stress_level'] or 'Unknown' for record in stress_data]
-        stress_counts = {}
-        for level in stress_levels:
-            stress_counts[level] = stress_counts.get(level, 0) + 1
-        
-        # Emotion Distribution
-        emotions = [record['dominant_emotion'] or 'Unknown' for record in stress_data]
-        emotion_counts = {}
-        for emotion in emotions:
-            emotion_counts[emotion] = emotion_counts.get(emotion, 0) + 1
-        
-        fig2 = Figure(figsize=(10, 4), facecolor=COLORS['bg_card'], edgecolor=COLORS['border'], linewidth=2)
-        
-        # Left: Stress Level Bar Chart
-        ax1 = fig2.add_subplot(121)
-        ax1.set_facecolor(COLORS['bg_darker'])
-        levels = list(stress_counts.keys())
-        counts = list(stress_counts.values())
-        colors_map = {'Low': '#10b981', 'Medium': '#f59e0b', 'High': '#ef4444', 'Unknown': '#64748b'}
-        bar_colors = [colors_map.get(level, '#64748b') for level in levels]
-        
-        bars = ax1.bar(levels, counts, color=bar_colors, edgecolor='white', linewidth=2, width=0.6)
-        ax1.set_title('Stress Level Distribution', color=COLORS['text_primary'], fontweight='bold', fontsize=12, pad=15)
-        ax1.set_ylabel('Count', color=COLORS['text_secondary'], fontsize=10, labelpad=10)
-        ax1.tick_params(colors=COLORS['text_secondary'], labelsize=10, left=True, bottom=True)
-        ax1.spines['bottom'].set_color(COLORS['border'])
-        ax1.spines['top'].set_visible(False)
-        ax1.spines['right'].set_visible(False)
-        ax1.spines['left'].set_color(COLORS['border'])
-        ax1.spines['left'].set_linewidth(1.5)
-        ax1.spines['bottom'].set_linewidth(1.5)
-        ax1.grid(True, axis='y', color=COLORS['border'], linestyle='--', alpha=0.3, linewidth=0.8)
-        ax1.set_axisbelow(True)
-        
-        # Add value labels
-        for bar in bars:
-            height = bar.get_height()
-            ax1.text(bar.get_x() + bar.get_width()/2., height,
-                    f'{int(height)}', ha='center', va='bottom', color=COLORS['text_secondary'], fontsize=10, fontweight='bold')
-        
-        # Right: Emotion Pie Chart
-        ax2 = fig2.add_subplot(122)
-        ax2.set_facecolor(COLORS['bg_darker'])
-        emotions_list = list(emotion_counts.keys())
-        emotion_values = list(emotion_counts.values())
-        emotion_colors = ['#3b82f6', '#10b981', '#f59e0b', '#ef4444']
-        
-        wedges, texts, autotexts = ax2.pie(emotion_values, labels=emotions_list, autopct='%1.1f%%',
-                                            colors=emotion_colors, startangle=90, 
-                                            textprops={'color': COLORS['text_secondary'], 'fontsize': 9},
-                                            wedgeprops={'edgecolor': 'white', 'linewidth': 2})
-        ax2.set_title('Emotion Distribution', color=COLORS['text_primary'], fontweight='bold', fontsize=12, pad=15)
-        
-        # Style autotext
-        for autotext in autotexts:
-            autotext.set_color('white')
-            autotext.set_fontweight('bold')
-            autotext.set_fontsize(9)
-        
-        canvas_dept = FigureCanvasTkAgg(fig2, dept_card)
-        canvas_dept.draw()
-        canvas_dept.get_tk_widget().pack(fill='both', expand=True, padx=20, pady=(0, 20))
-    
-    thread = threading.Thread(target=load_and_display_emotion_chart, daemon=True)
-    thread.start()
\ No newline at end of file
+        render_kpis(kpi_frame, calculate_metrics(summary, previous))
+        render_stress_chart(trend_body, summary, selection['start'], selection['end'])
+        render_emotion_chart(emotion_body, summary)
+
+    # A new alert means new records: redraw with them instead of waiting for a revisit.
+    add_alert_handler(kpi_frame, lambda alert: alert.kind == ALERT_RAISED and refresh())
+    refresh()
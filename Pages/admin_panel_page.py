@@ -1,10 +1,23 @@
 # pages/admin_panel_page.py
+import threading
 import tkinter as tk
-from tkinter import messagebox
+from tkinter import ttk, messagebox
 from datetime import datetime
-from config import COLORS
-from supabase_client import supabase
+import matplotlib.dates as mdates
+from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+from matplotlib.figure import Figure
+from config import COLORS, CHART_LABEL_MAX_POINTS, HISTORY_DAYS
+from local_store import db
+from records import User
 from components.sidebar import create_sidebar
+from components.alert_notifier import add_alert_handler
+from alert_engine import get_alert_engine, ALERT_RAISED
+from stress_queries import preset_range, parse_custom_range, load_departments, load_user_history
+from time_buckets import now as zone_now, format_local, get_zone
+from downsample import fit_to_width
+from session_memory import track_figure
+import instrumentation
+from exporter import EXPORT_FORMATS, export_path, export_stress_records, load_checkpoint
 
 
 class ScrollableFrame(tk.Frame):
@@ -62,6 +75,11 @@ def show_admin_panel(app):
               padx=20, pady=8, cursor='hand2', bd=0,
               command=lambda: add_user_popup(app)).pack(side='left')
 
+    tk.Button(search_frame, text="Export Data", font=('Segoe UI', 11, 'bold'),
+              bg=COLORS['bg_input'], fg=COLORS['text_primary'], relief='flat',
+              padx=20, pady=8, cursor='hand2', bd=0,
+              command=lambda: export_popup(app)).pack(side='left', padx=(12, 0))
+
     # Scrollable table content
     content = ScrollableFrame(main)
     content.pack(fill='both', expand=True)
@@ -84,26 +102,41 @@ def show_admin_panel(app):
         lbl.pack(side='left', fill='x', expand=True, ipadx=widths[i], padx=10, pady=10)
 
     # Fetch Users
-    response = supabase.table('user1').select('*').execute()
-    users = response.data if response.data else []
+    users = User.from_rows(db.table('user1').select('*').execute().data)
+    # stress_events is kept current in user1 by the stress_records trigger;
+    # only alerts raised after this fetch are added on top.
+    engine = get_alert_engine()
+    counted = dict(engine.event_counts)
 
     def refresh_table(*args):
         for widget in table.winfo_children():
             if widget != header_row:
                 widget.destroy()
+        needle = search_var.get().lower()
         filtered = [
-            u for u in users if search_var.get().lower() in u['first_name'].lower()
-            or search_var.get().lower() in u['last_name'].lower()
-            or search_var.get().lower() in u['email'].lower()
+            u for u in users if needle in (u.first_name or '').lower()
+            or needle in (u.last_name or '').lower()
+            or needle in (u.email or '').lower()
         ]
+        event_labels.clear()
         for user in filtered:
-            create_user_row(app, table, user)
-
+            key = str(user.id)
+            new_events = engine.event_counts.get(key, 0) - counted.get(key, 0)
+            event_labels[key] = create_user_row(app, table, user, new_events)
+
+    def on_alert(alert):
+        # Bump the live counter without refetching the user list.
+        label = event_labels.get(str(alert.user_id))
+        if alert.kind == ALERT_RAISED and label is not None and label.winfo_exists():
+            label.config(text=str(int(label['text']) + 1), fg=COLORS['accent_red'])
+
+    event_labels = {}
+    add_alert_handler(table, on_alert)
     search_var.trace_add("write", refresh_table)
     refresh_table()
 
 
-def create_user_row(app, parent, user):
+def create_user_row(app, parent, user, new_events=0):
     # Increased width by adding more horizontal padding
     row = tk.Frame(parent, bg=COLORS['bg_card'])
     row.pack(fill='x', pady=1, padx=10)  # Added horizontal padding
@@ -117,35 +150,42 @@ def create_user_row(app, parent, user):
     info = tk.Frame(user_frame, bg=COLORS['bg_card'])
     info.pack(side='left', fill='x', expand=True)
     
-    tk.Label(info, text=f"{user['first_name']} {user['last_name']}",
+    tk.Label(info, text=f"{user.first_name} {user.last_name}",
              font=('Segoe UI', 11, 'bold'), bg=COLORS['bg_card'],
              fg=COLORS['text_primary']).pack(anchor='w')
-    tk.Label(info, text=user['email'], font=('Segoe UI', 9),
+    tk.Label(info, text=user.email, font=('Segoe UI', 9),
              bg=COLORS['bg_card'], fg=COLORS['text_secondary']).pack(anchor='w')
 
-    role_color = COLORS['accent_purple'] if user['role'] == 'Admin' else COLORS['accent_blue']
-    tk.Label(row, text=user['role'], font=('Segoe UI', 9), bg=role_color, fg='white',
+    role_color = COLORS['accent_purple'] if user.role == 'Admin' else COLORS['accent_blue']
+    tk.Label(row, text=user.role, font=('Segoe UI', 9), bg=role_color, fg='white',
              padx=15, pady=3).pack(side='left', padx=30)  # Increased padx from 20 to 30
 
-    status_color = COLORS['accent_green'] if user['status'] == 'Active' else '#64748b'
-    tk.Label(row, text=user['status'], font=('Segoe UI', 9), bg=status_color, fg='white',
+    status_color = COLORS['accent_green'] if user.status == 'Active' else '#64748b'
+    tk.Label(row, text=user.status, font=('Segoe UI', 9), bg=status_color, fg='white',
              padx=15, pady=3).pack(side='left', padx=30)  # Increased padx from 20 to 30
 
-    tk.Label(row, text=str(user.get('stress_events', 0)), font=('Segoe UI', 11),
-             bg=COLORS['bg_card'], fg=COLORS['text_primary']).pack(side='left', padx=50)  # Increased from 40 to 50
+    engine = get_alert_engine()
+    events = int(user.stress_events or 0) + new_events
+    events_label = tk.Label(row, text=str(events), font=('Segoe UI', 11), bg=COLORS['bg_card'],
+                            fg=COLORS['accent_red'] if engine.is_active(user.id) else COLORS['text_primary'])
+    events_label.pack(side='left', padx=50)  # Increased from 40 to 50
 
-    last_active = user.get('last_active', 'Never')
+    last_active = format_local(user.last_active) if user.last_active else 'Never'
     tk.Label(row, text=last_active, font=('Segoe UI', 11),
              bg=COLORS['bg_card'], fg=COLORS['text_primary']).pack(side='left', padx=50)  # Increased from 40 to 50
 
     actions = tk.Frame(row, bg=COLORS['bg_card'])
     actions.pack(side='right', padx=30)  # Increased from 20 to 30
+    tk.Button(actions, text="📈", font=('Segoe UI', 10), bg=COLORS['bg_input'],
+              fg='white', relief='flat', cursor='hand2', width=4,
+              command=lambda: history_popup(app, user)).pack(side='left', padx=3)
     tk.Button(actions, text="✏️", font=('Segoe UI', 10), bg=COLORS['bg_input'],
               fg='white', relief='flat', cursor='hand2', width=4,
               command=lambda: edit_user_popup(app, user)).pack(side='left', padx=3)
     tk.Button(actions, text="🗑️", font=('Segoe UI', 10), bg=COLORS['bg_input'],
               fg='white', relief='flat', cursor='hand2', width=4,
-              command=lambda: handle_delete_user(app, user['id'])).pack(side='left', padx=3)
+              command=lambda: handle_delete_user(app, user.id)).pack(side='left', padx=3)
+    return events_label
 
 
 # ---------- POPUPS WITH SCROLL (COMPACT FIXED VERSION) ----------
@@ -205,7 +245,7 @@ def add_user_popup(app):
             return
 
         try:
-            supabase.table('user1').insert(data).execute()
+            db.table('user1').insert(data).execute()
             messagebox.showinfo("Success", "User added successfully!")
             window.destroy()
             show_admin_panel(app)
@@ -221,25 +261,207 @@ def edit_user_popup(app, user):
     def save(entries, window):
         data = {k: v.get() for k, v in entries.items()}
         data.update({'updated_at': datetime.now().isoformat()})
+        if not data['password']:
+            # Passwords are not replicated, so the form starts blank: keep the current one.
+            del data['password']
         if not data['first_name'] or not data['last_name'] or not data['email']:
             messagebox.showerror("Error", "Please fill in all required fields")
             return
         try:
-            supabase.table('user1').update(data).eq('id', user['id']).execute()
+            db.table('user1').update(data).eq('id', user.id).execute()
             messagebox.showinfo("Success", "User updated successfully!")
             window.destroy()
             show_admin_panel(app)
         except Exception as e:
             messagebox.showerror("Error", f"Failed to update user: {str(e)}")
 
-    create_scrollable_popup("Edit User", fields, app, user, on_save=save)
+    create_scrollable_popup("Edit User", fields, app, user.to_row(), on_save=save)
 
 
 def handle_delete_user(app, user_id):
     if messagebox.askyesno("Confirm Delete", "Are you sure you want to delete this user?"):
         try:
-            supabase.table('user1').delete().eq('id', user_id).execute()
+            db.table('user1').delete().eq('id', user_id).execute()
             messagebox.showinfo("Deleted", "User deleted successfully.")
             show_admin_panel(app)
         except Exception as e:
-            messagebox.showerror("Error", f"Failed to delete user: {str(e)}")
\ No newline at end of file
+            messagebox.showerror("Error", f"Failed to delete user: {str(e)}")
+
+
+# ---------- USER HISTORY ----------
+
+def history_popup(app, user):
+    """Every stress sample of one user over HISTORY_DAYS, loaded on a worker
+    thread and cut down to the chart width before plotting."""
+    window = tk.Toplevel(app.root)
+    window.title(f"Stress History - {user.first_name} {user.last_name}")
+    window.configure(bg=COLORS['bg_dark'])
+
+    content = tk.Frame(window, bg=COLORS['bg_dark'])
+    content.pack(fill='both', expand=True, padx=20, pady=20)
+    tk.Label(content, text=f"{user.first_name} {user.last_name}", font=('Segoe UI', 18, 'bold'),
+             bg=COLORS['bg_dark'], fg=COLORS['text_primary']).pack(anchor='w')
+    status = tk.Label(content, text=f"⏳ Loading the last {HISTORY_DAYS} days...", font=('Segoe UI', 10),
+                      bg=COLORS['bg_dark'], fg=COLORS['text_secondary'])
+    status.pack(anchor='w', pady=(2, 10))
+    body = tk.Frame(content, bg=COLORS['bg_card'])
+    body.pack(fill='both', expand=True)
+
+    def show(times, values):
+        if not window.winfo_exists():
+            return
+        if not len(values):
+            status.config(text=f"No stress samples in the last {HISTORY_DAYS} days")
+            return
+        shown = render_user_history(body, times, values)
+        status.config(text=f"{len(values):,} samples, {shown:,} plotted")
+
+    def run():
+        try:
+            times, values = load_user_history(user.id)
+        except Exception as e:
+            error = str(e)
+            app.root.after(0, lambda: window.winfo_exists() and
+                           status.config(text=f"Could not load history: {error}", fg=COLORS['accent_red']))
+            return
+        app.root.after(0, lambda: show(times, values))
+
+    threading.Thread(target=run, daemon=True).start()
+    window.transient(app.root)
+    window.focus_force()
+
+
+@instrumentation.timed('chart.user_history')
+def render_user_history(body, times, values):
+    """Plot (epoch, stress %) into body; returns how many points were drawn."""
+    fig = Figure(figsize=(10, 4), facecolor=COLORS['bg_card'])
+    ax = fig.add_subplot(111)
+    ax.set_facecolor(COLORS['bg_darker'])
+
+    xs, ys = fit_to_width(times, values, int(fig.get_figwidth() * fig.dpi))
+    xs = xs / 86400.0  # matplotlib date numbers are days since the Unix epoch
+    if len(xs) <= CHART_LABEL_MAX_POINTS:
+        ax.plot(xs, ys, color=COLORS['accent_blue'], linewidth=2, marker='o', markersize=5)
+    else:
+        ax.plot(xs, ys, color=COLORS['accent_blue'], linewidth=1.2)
+    ax.fill_between(xs, ys, alpha=0.2, color=COLORS['accent_blue'])
+
+    zone = get_zone()
+    locator = mdates.AutoDateLocator(tz=zone)
+    ax.xaxis.set_major_locator(locator)
+    ax.xaxis.set_major_formatter(mdates.ConciseDateFormatter(locator, tz=zone))
+    ax.set_ylim(0, 100)
+    ax.set_ylabel('Stress Level (%)', color=COLORS['text_secondary'], fontsize=10)
+    ax.tick_params(colors=COLORS['text_secondary'], labelsize=9)
+    ax.grid(True, color=COLORS['border'], linestyle='--', alpha=0.3, linewidth=0.8)
+    for side in ('top', 'right'):
+        ax.spines[side].set_visible(False)
+    for side in ('bottom', 'left'):
+        ax.spines[side].set_color(COLORS['border'])
+    fig.subplots_adjust(left=0.08, right=0.98, top=0.95, bottom=0.12)  # tight_layout costs a full extra draw
+
+    canvas = track_figure(FigureCanvasTkAgg(fig, body))
+    canvas.draw()
+    canvas.get_tk_widget().pack(fill='both', expand=True, padx=10, pady=10)
+    return len(xs)
+
+
+# ---------- DATA EXPORT ----------
+
+def export_popup(app):
+    """Stream stress_records for a range/department to CSV or Parquet parts.
+
+    Runs on a worker thread; closing the window cancels after the current
+    page, and exporting the same filters again resumes from the checkpoint.
+    """
+    window = tk.Toplevel(app.root)
+    window.title("Export Stress Records")
+    window.configure(bg=COLORS['bg_dark'])
+    window.resizable(False, False)
+
+    content = tk.Frame(window, bg=COLORS['bg_dark'])
+    content.pack(fill='both', expand=True, padx=20, pady=20)
+    tk.Label(content, text="Export Stress Records", font=('Segoe UI', 18, 'bold'),
+             bg=COLORS['bg_dark'], fg=COLORS['text_primary']).pack(anchor='w', pady=(5, 15))
+
+    start = preset_range('30d')[0]
+    entries = {}
+    for key, label, value in (('start', "From (YYYY-MM-DD)", start),
+                              ('end', "To (YYYY-MM-DD)", zone_now().strftime('%Y-%m-%d'))):
+        tk.Label(content, text=label, font=('Segoe UI', 11),
+                 bg=COLORS['bg_dark'], fg=COLORS['text_primary']).pack(anchor='w')
+        e = tk.Entry(content, font=('Segoe UI', 11), bg=COLORS['bg_input'], fg=COLORS['text_primary'],
+                     relief='flat', bd=0, insertbackground=COLORS['text_primary'])
+        e.pack(fill='x', ipady=7, pady=(0, 8))
+        e.insert(0, value)
+        entries[key] = e
+
+    tk.Label(content, text="Department", font=('Segoe UI', 11),
+             bg=COLORS['bg_dark'], fg=COLORS['text_primary']).pack(anchor='w')
+    dept_var = tk.StringVar(value="All departments")
+    ttk.Combobox(content, textvariable=dept_var, state='readonly',
+                 values=["All departments"] + load_departments()).pack(fill='x', pady=(0, 8))
+
+    fmt_var = tk.StringVar(value=EXPORT_FORMATS[0])
+    fmt_row = tk.Frame(content, bg=COLORS['bg_dark'])
+    fmt_row.pack(fill='x', pady=(0, 8))
+    for fmt in EXPORT_FORMATS:
+        tk.Radiobutton(fmt_row, text=fmt.upper(), variable=fmt_var, value=fmt, font=('Segoe UI', 10),
+                       bg=COLORS['bg_dark'], fg=COLORS['text_primary'], selectcolor=COLORS['bg_input'],
+                       activebackground=COLORS['bg_dark']).pack(side='left', padx=(0, 12))
+
+    status = tk.Label(content, text="", font=('Segoe UI', 10),
+                      bg=COLORS['bg_dark'], fg=COLORS['text_secondary'])
+    status.pack(anchor='w', pady=(4, 0))
+    cancel = threading.Event()
+
+    def set_status(text, **options):
+        if status.winfo_exists():
+            status.config(text=text, **options)
+
+    def start_export():
+        try:
+            start, end = parse_custom_range(entries['start'].get(), entries['end'].get())
+        except ValueError as e:
+            messagebox.showerror("Error", f"Invalid date range: {e}", parent=window)
+            return
+        dept = dept_var.get()
+        department = None if dept == "All departments" else dept
+        fmt = fmt_var.get()
+        checkpoint = load_checkpoint(export_path(start, end, department, fmt))
+        if checkpoint and not checkpoint.get('complete'):
+            set_status(f"Resuming after {checkpoint['rows']:,} rows...")
+        else:
+            set_status("Starting...")
+        btn.config(state='disabled')
+
+        def progress(rows):
+            app.root.after(0, lambda: set_status(f"⏳ {rows:,} rows written"))
+
+        def run():
+            try:
+                result = export_stress_records(start, end, department, fmt, on_progress=progress, cancel=cancel)
+                if result['complete']:
+                    message = f"Exported {result['rows']:,} rows to '{result['path']}'."
+                    app.root.after(0, lambda: messagebox.showinfo("Export Ready", message))
+                    app.root.after(0, lambda: window.winfo_exists() and window.destroy())
+            except Exception as e:
+                error = str(e)
+                app.root.after(0, lambda: set_status(f"Export failed: {error}", fg=COLORS['accent_red']))
+                app.root.after(0, lambda: btn.winfo_exists() and btn.config(state='normal'))
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def close():
+        cancel.set()
+        window.destroy()
+
+    btn = tk.Button(content, text="Export", font=('Segoe UI', 11, 'bold'),
+                    bg=COLORS['accent_green'], fg='white',
+                    relief='flat', padx=25, pady=10, cursor='hand2',
+                    bd=0, command=start_export)
+    btn.pack(anchor='e', pady=(15, 5))
+
+    window.protocol("WM_DELETE_WINDOW", close)
+    window.transient(app.root)
+    window.focus_force()
@@ -7,6 +7,7 @@ import tkinter as tk
 from tkinter import messagebox
 from config import COLORS
 from supabase_client import supabase
+from records import User, Admin
 
 def show_login(app):
     """Display the login page."""
@@ -91,15 +92,16 @@ def login(app, email, password):
     
     user_type = app.user_type_var.get()
     
+    # Credentials are not kept in the local replica: sign-in always asks the server.
     try:
         if user_type == "admin":
             # Query admin table
             response = supabase.table('admins').select('*').eq('email', email).execute()
             
             if response.data and len(response.data) > 0:
-                admin = response.data[0]
+                admin = Admin.from_row(response.data[0])
                 # Verify password (plain text comparison)
-                if admin['password'] == password:
+                if admin.password == password:
                     # Login successful
                     app.current_user = admin
                     app.current_user_type = "admin"
@@ -115,9 +117,9 @@ def login(app, email, password):
             response = supabase.table('user1').select('*').eq('email', email).execute()
             
             if response.data and len(response.data) > 0:
-                user = response.data[0]
+                user = User.from_row(response.data[0])
                 # Verify password (plain text comparison)
-                if user['password'] == password:
+                if user.password == password:
                     # Login successful
                     app.current_user = user
                     app.current_user_type = "user"
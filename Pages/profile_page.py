@@ -8,7 +8,12 @@ from tkinter import messagebox
 from config import COLORS
 from components.sidebar import create_sidebar
 from components.avatar import create_avatar_with_badge
-from supabase_client import supabase
+from local_store import db
+from records import User, Admin
+from time_buckets import zone_label
+from event_log import get_logger
+
+logger = get_logger('profile_page')
 
 
 def show_profile(app, is_admin):
@@ -71,19 +76,14 @@ def show_profile(app, is_admin):
     create_avatar_with_badge(profile_card, is_admin=is_admin)
     
     # Get name from user data
-    if is_admin:
-        user_name = user_data.get('name', 'Admin')
-    else:
-        first_name = user_data.get('first_name', '')
-        last_name = user_data.get('last_name', '')
-        user_name = f"{first_name} {last_name}".strip() or "User"
+    user_name = user_data.full_name
     
     tk.Label(profile_card, text=user_name, font=('Segoe UI', 24, 'bold'),
             bg=COLORS['bg_card'], fg=COLORS['text_primary']).pack()
     tk.Label(profile_card, text="User", font=('Segoe UI', 16),
             bg=COLORS['bg_card'], fg=COLORS['text_primary']).pack()
     
-    user_email = user_data.get('email', 'N/A')
+    user_email = user_data.email or 'N/A'
     tk.Label(profile_card, text=user_email, font=('Segoe UI', 11),
             bg=COLORS['bg_card'], fg=COLORS['text_secondary']).pack(pady=8)
     
@@ -176,7 +176,7 @@ def show_profile(app, is_admin):
             bg=COLORS['bg_card'], fg=COLORS['text_secondary']).pack(anchor='w', pady=(0, 8))
     tz_select = tk.Frame(form_frame, bg=COLORS['bg_input'])
     tz_select.pack(fill='x', pady=(0, 25))
-    tk.Label(tz_select, text="Sri Lanka (GMT+5:30)", font=('Segoe UI', 12),
+    tk.Label(tz_select, text=zone_label(), font=('Segoe UI', 12),
             bg=COLORS['bg_input'], fg=COLORS['text_primary'],
             anchor='w').pack(side='left', fill='both', expand=True, padx=12, ipady=12)
     tk.Label(tz_select, text="▼", font=('Segoe UI', 10),
@@ -195,25 +195,22 @@ def show_profile(app, is_admin):
 def fetch_user_data(app, is_admin):
     """Fetch user data from Supabase based on current user."""
     try:
-        if is_admin:
-            user_id = app.current_user['id']
-            response = supabase.table('admins').select('*').eq('id', user_id).execute()
-        else:
-            user_id = app.current_user['id']
-            response = supabase.table('user1').select('*').eq('id', user_id).execute()
-        
+        model = Admin if is_admin else User
+        table = 'admins' if is_admin else 'user1'
+        response = db.table(table).select('*').eq('id', app.current_user.id).execute()
+
         if response.data and len(response.data) > 0:
-            return response.data[0]
+            return model.from_row(response.data[0])
         return None
     except Exception as e:
-        print(f"Error fetching user data: {str(e)}")
+        logger.error("Error fetching user data: %s", e)
         return None
 
 
 def save_profile_changes(app, is_admin, user_data, name_entry, email_entry, bio_text, phone_entry):
     """Save profile changes to Supabase."""
     try:
-        user_id = user_data['id']
+        user_id = user_data.id
         
         if is_admin:
             # Update admin table
@@ -223,7 +220,7 @@ def save_profile_changes(app, is_admin, user_data, name_entry, email_entry, bio_
                 'bio': bio_text.get('1.0', 'end-1c'),
                 'number': phone_entry.get()
             }
-            supabase.table('admins').update(update_data).eq('id', user_id).execute()
+            db.table('admins').update(update_data).eq('id', user_id).execute()
         else:
             # Update user1 table
             name_parts = name_entry.get().split(' ', 1)
@@ -236,7 +233,7 @@ def save_profile_changes(app, is_admin, user_data, name_entry, email_entry, bio_
                 'email': email_entry.get(),
                 'phone': phone_entry.get()
             }
-            supabase.table('user1').update(update_data).eq('id', user_id).execute()
+            db.table('user1').update(update_data).eq('id', user_id).execute()
         
         messagebox.showinfo("Success", "Profile updated successfully!")
         app.current_user = fetch_user_data(app, is_admin)
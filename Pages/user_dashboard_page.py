@@ -4,8 +4,10 @@ Main monitoring page with live camera feed and stress metrics.
 """
 
 import tkinter as tk
-from config import COLORS
+from config import COLORS, PERF_OVERLAY
 from components.sidebar import create_sidebar
+from components.perf_overlay import create_perf_overlay
+from activity_tracker import get_activity_tracker
 
 
 def show_user_dashboard(app):
@@ -16,6 +18,9 @@ def show_user_dashboard(app):
     container.pack(fill='both', expand=True)
     
     create_sidebar(app, container, is_admin=False)
+
+    # Keyboard/mouse signals run alongside the camera and keep last_active fresh.
+    get_activity_tracker().start(getattr(getattr(app, 'current_user', None), 'id', None))
     
     main = tk.Frame(container, bg=COLORS['bg_dark'])
     main.pack(side='left', fill='both', expand=True)
@@ -109,4 +114,7 @@ def show_user_dashboard(app):
     app.stress_events_label = tk.Label(time_info, text="0% Stress", font=('Segoe UI', 14, 'bold'), 
                                       bg=COLORS['accent_green'], fg='white')
     app.stress_events_label.pack(anchor='w')
-    tk.Label(time_info, text="Real-time", font=('Segoe UI', 11), bg=COLORS['accent_green'], fg='#86efac').pack(anchor='w')
\ No newline at end of file
+    tk.Label(time_info, text="Real-time", font=('Segoe UI', 11), bg=COLORS['accent_green'], fg='#86efac').pack(anchor='w')
+
+    if PERF_OVERLAY:
+        create_perf_overlay(right)
@@ -0,0 +1,311 @@
+"""
+activity_tracker.py - Keyboard and Mouse Activity Signals
+pynput listener callbacks only append (time, kind, x, y) into a preallocated
+ring buffer; an aggregator thread drains the rings once a second into
+per-second bins and derives active/idle intervals, typing cadence and mouse
+movement. The signals feed the stress score and user1.last_active.
+"""
+
+import math
+import threading
+import time
+from array import array
+from collections import deque
+from config import ACTIVITY_TIMEOUT, ACTIVITY_WINDOW_SECONDS, ACTIVITY_RING_SIZE, ACTIVITY_STRESS_WEIGHT
+from event_log import get_logger
+from heartbeat_service import get_heartbeat_service
+import instrumentation
+
+
+# Event kinds stored in the ring.
+KEY = 0
+KEY_CORRECTION = 1  # backspace/delete
+MOVE = 2
+CLICK = 3
+SCROLL = 4
+
+BURST_GAP = 2.0  # key gaps longer than this end a typing burst
+MAX_INTERVALS = 256
+MIN_ACTIVE_SECONDS = 30  # activity signals are ignored until there is this much input
+
+logger = get_logger('activity')
+
+
+class EventRing:
+    """Single-producer ring of input events.
+
+    The listener thread writes the slot and then publishes it by bumping
+    `head`; the aggregator reads [tail, head) without a lock. If the
+    producer laps the reader, the overwritten events are counted as dropped.
+    """
+
+    __slots__ = ('mask', 'times', 'kinds', 'xs', 'ys', 'head', 'tail', 'dropped')
+
+    def __init__(self, size=ACTIVITY_RING_SIZE):
+        if size & (size - 1):
+            raise ValueError("Ring size must be a power of two")
+        self.mask = size - 1
+        self.times = array('d', bytes(8 * size))
+        self.kinds = array('b', bytes(size))
+        self.xs = array('i', bytes(4 * size))
+        self.ys = array('i', bytes(4 * size))
+        self.head = 0
+        self.tail = 0
+        self.dropped = 0
+
+    def push(self, kind, x=0, y=0, now=time.monotonic):
+        i = self.head
+        slot = i & self.mask
+        self.times[slot] = now()
+        self.kinds[slot] = kind
+        self.xs[slot] = x
+        self.ys[slot] = y
+        self.head = i + 1
+
+    def drain(self):
+        """Events published since the last drain as (time, kind, x, y) tuples."""
+        head, tail, size = self.head, self.tail, self.mask + 1
+        if head - tail > size:
+            self.dropped += head - tail - size
+            tail = head - size
+        events = []
+        for i in range(tail, head):
+            slot = i & self.mask
+            events.append((self.times[slot], self.kinds[slot], self.xs[slot], self.ys[slot]))
+        # Slots the producer reused while we copied are stale: drop them.
+        overrun = self.head - size - tail
+        if overrun > 0:
+            self.dropped += overrun
+            events = events[overrun:]
+        self.tail = head
+        return events
+
+
+class ActivityBin:
+    """Input counted over one wall-clock second."""
+
+    __slots__ = ('second', 'keys', 'corrections', 'key_gaps', 'key_gap_squares', 'gap_count',
+                 'moves', 'distance', 'clicks', 'scrolls')
+
+    def __init__(self, second):
+        self.second = second
+        self.keys = self.corrections = self.moves = self.clicks = self.scrolls = 0
+        self.key_gaps = self.key_gap_squares = self.distance = 0.0
+        self.gap_count = 0
+
+    @property
+    def events(self):
+        return self.keys + self.corrections + self.moves + self.clicks + self.scrolls
+
+
+class ActivityTracker:
+    """Listener rings plus the aggregator that turns them into signals."""
+
+    def __init__(self, window=ACTIVITY_WINDOW_SECONDS, idle_after=ACTIVITY_TIMEOUT):
+        self.window = window
+        self.idle_after = idle_after
+        self.keyboard_ring = EventRing()
+        self.mouse_ring = EventRing()
+        self.bins = deque(maxlen=window)
+        self.intervals = deque(maxlen=MAX_INTERVALS)  # closed (start, end, active) periods
+        self.user_id = None
+        self._active_since = None
+        self._idle_since = time.time()
+        self._last_event = None
+        self._last_key = None
+        self._last_pos = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._listeners = []
+
+    # ---------- listener side (keep these tiny) ----------
+
+    def on_key(self, key):
+        self.keyboard_ring.push(KEY_CORRECTION if key in _CORRECTION_KEYS else KEY)
+
+    def on_move(self, x, y):
+        self.mouse_ring.push(MOVE, int(x), int(y))
+
+    def on_click(self, x, y, button, pressed):
+        if pressed:
+            self.mouse_ring.push(CLICK, int(x), int(y))
+
+    def on_scroll(self, x, y, dx, dy):
+        self.mouse_ring.push(SCROLL, int(x), int(y))
+
+    # ---------- lifecycle ----------
+
+    def start(self, user_id=None):
+        """Start listening (once) and attribute last_active to user_id."""
+        self.user_id = user_id
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._listeners = _start_listeners(self)
+        self._thread = threading.Thread(target=self._run, name='activity-aggregator', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        for listener in self._listeners:
+            listener.stop()
+        self._listeners = []
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(1.0):
+            try:
+                self.aggregate()
+            except Exception as e:
+                logger.warning("⚠️ Activity aggregation failed: %s", e)
+
+    # ---------- aggregation ----------
+
+    @instrumentation.timed('activity.aggregate')
+    def aggregate(self, now=None):
+        """Fold drained events into per-second bins and update the intervals."""
+        now = time.time() if now is None else now
+        # Ring times are monotonic; shift them onto the wall clock once per pass.
+        offset = now - time.monotonic()
+        events = self.keyboard_ring.drain() + self.mouse_ring.drain()
+        events.sort()
+        with self._lock:
+            current = self.bins[-1] if self.bins else None
+            for stamp, kind, x, y in events:
+                stamp += offset
+                second = int(stamp)
+                if current is None or second > current.second:
+                    current = ActivityBin(second)
+                    self.bins.append(current)
+                if kind == MOVE:
+                    current.moves += 1
+                    if self._last_pos is not None:
+                        current.distance += math.hypot(x - self._last_pos[0], y - self._last_pos[1])
+                    self._last_pos = (x, y)
+                elif kind in (KEY, KEY_CORRECTION):
+                    if kind == KEY:
+                        current.keys += 1
+                    else:
+                        current.corrections += 1
+                    if self._last_key is not None and 0 < stamp - self._last_key <= BURST_GAP:
+                        gap = stamp - self._last_key
+                        current.key_gaps += gap
+                        current.key_gap_squares += gap * gap
+                        current.gap_count += 1
+                    self._last_key = stamp
+                elif kind == CLICK:
+                    current.clicks += 1
+                else:
+                    current.scrolls += 1
+                self._last_event = stamp
+            self._update_intervals(now)
+        if self.user_id is not None and self.is_active(now):
+            # Coalesced in memory; user1 is written once per heartbeat flush.
+            get_heartbeat_service().touch(self.user_id, self._last_event)
+
+    def _update_intervals(self, now):
+        active = self._last_event is not None and now - self._last_event < self.idle_after
+        if active and self._active_since is None:
+            if self._idle_since is not None:
+                self.intervals.append((self._idle_since, self._last_event, False))
+            self._active_since, self._idle_since = self._last_event, None
+        elif not active and self._active_since is not None:
+            idle_from = (self._last_event or now) + self.idle_after
+            self.intervals.append((self._active_since, idle_from, True))
+            self._active_since, self._idle_since = None, idle_from
+
+    # ---------- signals ----------
+
+    def is_active(self, now=None):
+        now = time.time() if now is None else now
+        return self._last_event is not None and now - self._last_event < self.idle_after
+
+    def snapshot(self, now=None):
+        """Activity signals over the window as a dict of floats."""
+        now = time.time() if now is None else now
+        with self._lock:
+            bins = [b for b in self.bins if b.second > now - self.window]
+        keys = sum(b.keys for b in bins)
+        corrections = sum(b.corrections for b in bins)
+        gaps = sum(b.gap_count for b in bins)
+        gap_sum = sum(b.key_gaps for b in bins)
+        cadence_cv = 0.0
+        if gaps > 1:
+            mean = gap_sum / gaps
+            variance = max(sum(b.key_gap_squares for b in bins) / gaps - mean * mean, 0.0)
+            cadence_cv = math.sqrt(variance) / mean if mean else 0.0
+        active_seconds = sum(1 for b in bins if b.events)
+        minutes = self.window / 60
+        return {
+            'active': float(self.is_active(now)),
+            'idle_seconds': now - self._last_event if self._last_event is not None else float(self.window),
+            'active_ratio': active_seconds / self.window,
+            'active_seconds': float(active_seconds),
+            'keys_per_minute': (keys + corrections) / minutes,
+            'correction_rate': corrections / (keys + corrections) if keys + corrections else 0.0,
+            'key_interval': gap_sum / gaps if gaps else 0.0,
+            'cadence_cv': cadence_cv,
+            'mouse_speed': sum(b.distance for b in bins) / active_seconds if active_seconds else 0.0,
+            'clicks_per_minute': sum(b.clicks for b in bins) / minutes,
+            'dropped_events': float(self.keyboard_ring.dropped + self.mouse_ring.dropped),
+        }
+
+    def stress_signal(self, snapshot=None):
+        """0..1 input-stress estimate, or None while there is too little input.
+
+        Frequent corrections and erratic typing rhythm push it up, as does
+        fast, jittery mouse movement.
+        """
+        s = snapshot or self.snapshot()
+        if s['active_seconds'] < MIN_ACTIVE_SECONDS:
+            return None
+        corrections = min(s['correction_rate'] / 0.25, 1.0)
+        rhythm = min(s['cadence_cv'] / 1.5, 1.0)
+        mouse = min(s['mouse_speed'] / 3000.0, 1.0)
+        return 0.45 * corrections + 0.35 * rhythm + 0.2 * mouse
+
+    def blend_stress(self, camera_score, weight=ACTIVITY_STRESS_WEIGHT):
+        """Mix the camera-based stress score with the input signal."""
+        signal = self.stress_signal()
+        if signal is None:
+            return camera_score
+        return (1 - weight) * camera_score + weight * signal
+
+
+# ---------- pynput ----------
+
+try:
+    from pynput import keyboard, mouse
+    _CORRECTION_KEYS = frozenset((keyboard.Key.backspace, keyboard.Key.delete))
+except Exception:  # ImportError, or no display server to hook into
+    keyboard = mouse = None
+    _CORRECTION_KEYS = frozenset()
+
+
+def _start_listeners(tracker):
+    if keyboard is None:
+        logger.warning("⚠️ pynput unavailable, keyboard/mouse activity is not tracked")
+        return []
+    listeners = [keyboard.Listener(on_press=tracker.on_key),
+                 mouse.Listener(on_move=tracker.on_move, on_click=tracker.on_click, on_scroll=tracker.on_scroll)]
+    for listener in listeners:
+        listener.daemon = True
+        listener.start()
+    return listeners
+
+
+_tracker = None
+_tracker_lock = threading.Lock()
+
+
+def get_activity_tracker():
+    """The process-wide tracker (not started until start() is called)."""
+    global _tracker
+    if _tracker is None:
+        with _tracker_lock:
+            if _tracker is None:
+                _tracker = ActivityTracker()
+    return _tracker
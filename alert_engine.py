@@ -0,0 +1,220 @@
+"""
+alert_engine.py - Real-Time Stress Alerts
+Evaluates stress_records as they arrive against a threshold rule with a
+sustained-duration window and hysteresis, and queues raised/cleared alerts
+for the admin UI. Records are pushed by Supabase Realtime into the local
+replica; local writes and sync pulls reach the engine through the same
+replica listener, so nothing polls the server. History pulled in bulk is
+too old to alert on and is skipped.
+"""
+
+import asyncio
+import queue
+import threading
+import time
+from time_buckets import parse_iso
+from config import (STRESS_ALERT_THRESHOLD, ALERT_SUSTAIN_SECONDS, ALERT_HYSTERESIS,
+                    ALERT_MAX_GAP_SECONDS, ALERT_REALTIME)
+from event_log import get_logger, log_event
+from local_store import store
+import instrumentation
+
+
+ALERT_RAISED = 'raised'
+ALERT_CLEARED = 'cleared'
+
+REALTIME_CHANNEL = 'stress-alerts'
+RECONNECT_DELAYS = (1, 2, 5, 10, 30)
+
+logger = get_logger('alerts')
+
+
+def record_time(record):
+    """Epoch seconds of a record's created_at, falling back to now."""
+    epoch = parse_iso(str(record.get('created_at') or ''))
+    return time.time() if epoch != epoch else epoch
+
+
+class Alert:
+    """One raised or cleared alert for a user."""
+
+    __slots__ = ('kind', 'user_id', 'score', 'since', 'at')
+
+    def __init__(self, kind, user_id, score, since, at):
+        self.kind = kind
+        self.user_id = user_id
+        self.score = score
+        self.since = since
+        self.at = at
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class AlertRule:
+    """Raise after the score stays >= threshold for `sustain` seconds; clear
+    only once it falls below `threshold - hysteresis`, so a score hovering
+    around the threshold does not flap."""
+
+    def __init__(self, threshold=STRESS_ALERT_THRESHOLD, sustain=ALERT_SUSTAIN_SECONDS,
+                 hysteresis=ALERT_HYSTERESIS, max_gap=ALERT_MAX_GAP_SECONDS):
+        self.threshold = threshold
+        self.clear_below = threshold - hysteresis
+        self.sustain = sustain
+        self.max_gap = max_gap
+
+
+class _UserState:
+    __slots__ = ('above_since', 'last_seen', 'active')
+
+    def __init__(self):
+        self.above_since = None
+        self.last_seen = None
+        self.active = False
+
+
+class AlertEngine:
+    """Per-user rule state plus the queue the Tk thread drains."""
+
+    def __init__(self, rule=None):
+        self.rule = rule or AlertRule()
+        self.alerts = queue.SimpleQueue()
+        self.event_counts = {}  # user_id -> alerts raised since start
+        self._states = {}
+        self._lock = threading.Lock()
+        self._realtime = None
+
+    def evaluate(self, user_id, score, at):
+        """Feed one sample; return an Alert on a state change, else None."""
+        rule = self.rule
+        key = str(user_id)
+        with self._lock:
+            state = self._states.get(key)
+            if state is None:
+                state = self._states[key] = _UserState()
+            if state.last_seen is not None and at - state.last_seen > rule.max_gap:
+                state.above_since = None
+            state.last_seen = at
+
+            if state.active:
+                if score < rule.clear_below:
+                    state.active = False
+                    state.above_since = None
+                    return Alert(ALERT_CLEARED, user_id, score, None, at)
+                return None
+
+            if score < rule.threshold:
+                state.above_since = None
+                return None
+            if state.above_since is None:
+                state.above_since = at
+            if at - state.above_since >= rule.sustain:
+                state.active = True
+                self.event_counts[key] = self.event_counts.get(key, 0) + 1
+                return Alert(ALERT_RAISED, user_id, score, state.above_since, at)
+            return None
+
+    @instrumentation.timed('alerts.evaluate')
+    def process(self, records):
+        """Evaluate records in time order and queue the resulting alerts.
+
+        Records older than a sustain window plus the allowed gap cannot be
+        part of an episode still under way: they arrive with the replica's
+        first pull or a catch-up after time offline, and are skipped so
+        past episodes do not raise alerts now.
+        """
+        horizon = time.time() - (self.rule.sustain + self.rule.max_gap)
+        for record in sorted(records, key=lambda r: r.get('created_at') or ''):
+            if record.get('user_id') is None:
+                continue
+            at = record_time(record)
+            if at < horizon:
+                continue
+            alert = self.evaluate(record['user_id'], float(record.get('avg_stress_score') or 0), at)
+            if alert is not None:
+                self.alerts.put(alert)
+                log_event('stress_alert', state=alert.kind, user_id=alert.user_id,
+                          score=round(alert.score, 3), since=alert.since)
+
+    def _on_rows(self, table, rows):
+        if table == 'stress_records':
+            self.process(rows)
+
+    def drain(self):
+        """Return every queued alert without blocking (called on the Tk thread)."""
+        pending = []
+        while True:
+            try:
+                pending.append(self.alerts.get_nowait())
+            except queue.Empty:
+                return pending
+
+    def is_active(self, user_id):
+        state = self._states.get(str(user_id))
+        return bool(state and state.active)
+
+    # ---------- sources ----------
+
+    def start(self):
+        """Listen to the replica and, if enabled, to Supabase Realtime."""
+        if store is not None:
+            store.add_listener(self._on_rows)
+            store.start()
+        if ALERT_REALTIME and self._realtime is None:
+            self._realtime = threading.Thread(target=self._run_realtime, name='alerts-realtime', daemon=True)
+            self._realtime.start()
+
+    def _run_realtime(self):
+        try:
+            asyncio.run(self._subscribe_forever())
+        except Exception as e:
+            logger.warning("⚠️ Realtime alerts unavailable, falling back to sync pulls: %s", e)
+
+    def _on_insert(self, payload):
+        data = payload.get('data', payload) if isinstance(payload, dict) else {}
+        record = data.get('record') or data.get('new')
+        if not record:
+            return
+        if store is not None:
+            # The replica notifies listeners (alerts, rollups) once per new row.
+            store.ingest('stress_records', [record])
+        else:
+            self.process([record])
+
+    async def _subscribe_forever(self):
+        from supabase import acreate_client
+        from supabase_client import SUPABASE_URL, SUPABASE_ANON_KEY
+
+        attempt = 0
+        while True:
+            try:
+                client = await acreate_client(SUPABASE_URL, SUPABASE_ANON_KEY)
+                channel = client.channel(REALTIME_CHANNEL)
+                channel.on_postgres_changes('INSERT', schema='public', table='stress_records',
+                                            callback=self._on_insert)
+                await channel.subscribe()
+                logger.info("Subscribed to stress_records inserts")
+                attempt = 0
+                await client.realtime.listen()
+            except ImportError:
+                raise
+            except Exception as e:
+                logger.warning("⚠️ Realtime connection lost: %s", e)
+            delay = RECONNECT_DELAYS[min(attempt, len(RECONNECT_DELAYS) - 1)]
+            attempt += 1
+            await asyncio.sleep(delay)
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_alert_engine():
+    """The process-wide engine, started on first use."""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = AlertEngine()
+                _engine.start()
+    return _engine
@@ -0,0 +1,327 @@
+"""
+analytics_service.py - Shared Read-Only Analytics Service for Admin Dashboards
+Optional standalone service that many admin desktops read dashboard data
+from instead of each one querying Supabase and aggregating client-side. It
+keeps one local replica current through the usual incremental sync, serves
+summaries from its rollups and the heatmap from memory, and caches every
+rendered response until the replica changes. Responses carry a content
+ETag, so a dashboard re-asking for unchanged data gets a bodiless 304.
+
+    python analytics_service.py             # needs OFFLINE_MODE (the replica) and ANALYTICS_TOKEN
+
+Endpoints (JSON over HTTP/1.1, keep-alive, GET only):
+    GET /summary      ?start=&end=&department=&user_id= -> stress summary
+                      (KPI totals, daily/hourly trend, level and emotion counts)
+    GET /departments  -> department names
+    GET /users        ?department= -> users for the dashboard filter
+    GET /heatmap      -> {"names": [...], "matrix": [[% or null] * 168, ...]}
+    GET /health       replica status and cache counters
+
+Every endpoint but /health needs "Authorization: Bearer <ANALYTICS_TOKEN>":
+the answers name users and carry their per-user stress history.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import hmac
+import json
+import math
+import threading
+import urllib.error
+import urllib.request
+from collections import OrderedDict
+from urllib.parse import urlsplit, parse_qsl, urlencode
+from config import (ANALYTICS_HOST, ANALYTICS_PORT, ANALYTICS_TOKEN, ANALYTICS_CACHE_ENTRIES,
+                    ANALYTICS_WARM_SECONDS)
+from event_log import get_logger
+import instrumentation
+
+
+MAX_HEADER_BYTES = 64 * 1024
+CLIENT_CACHE_SIZE = 64
+WARM_PRESETS = ('today', '7d', '30d')  # the dashboard's range buttons, kept computed
+USER_FIELDS = ('id', 'first_name', 'last_name', 'email', 'department')
+
+REASONS = {200: 'OK', 304: 'Not Modified', 400: 'Bad Request', 401: 'Unauthorized', 404: 'Not Found',
+           405: 'Method Not Allowed', 500: 'Internal Server Error'}
+
+logger = get_logger('analytics')
+
+
+def _user_id(value):
+    """Query-string user ids back to the integers stress_records holds."""
+    return int(value) if value.lstrip('-').isdigit() else value
+
+
+def _json_matrix(matrix):
+    return [[None if math.isnan(v) else round(v, 2) for v in row] for row in matrix.tolist()]
+
+
+# ---------- service ----------
+
+class AnalyticsService:
+    """HTTP front end over the replica with a per-query response cache."""
+
+    def __init__(self, token=ANALYTICS_TOKEN, cache_entries=ANALYTICS_CACHE_ENTRIES,
+                 warm_seconds=ANALYTICS_WARM_SECONDS):
+        if not token:
+            raise RuntimeError("the analytics service serves per-user data: set ANALYTICS_TOKEN")
+        # Imported here: stress_queries imports this module's client helpers.
+        import stress_queries
+        from local_store import store
+
+        if store is None:
+            raise RuntimeError("the analytics service reads the local replica: set OFFLINE_MODE = True")
+        self.queries = stress_queries
+        self.store = store
+        self.token = token
+        self.heatmap = None
+        self.cache_entries = cache_entries
+        self.warm_seconds = warm_seconds
+        self.stats = {'requests': 0, 'not_modified': 0, 'cache_hits': 0, 'computed': 0,
+                      'coalesced': 0, 'errors': 0, 'unauthorized': 0}
+        self._cache = OrderedDict()  # (path, params) -> (version, etag, body)
+        self._inflight = {}  # (path, params, version) -> future of (etag, body)
+        self._tasks = []
+        self.routes = {
+            '/summary': (self._summary, lambda: self.store.version),
+            '/departments': (lambda params: self.queries.load_departments(), lambda: self.store.version),
+            '/users': (self._users, lambda: self.store.version),
+            '/heatmap': (self._heatmap, lambda: self.heatmap.version),
+        }
+
+    # ---------- lifecycle ----------
+
+    async def start(self, host=ANALYTICS_HOST, port=ANALYTICS_PORT):
+        await asyncio.to_thread(self._bootstrap)
+        self._tasks = [asyncio.create_task(self._warm())]
+        server = await asyncio.start_server(self._handle, host, port, limit=MAX_HEADER_BYTES)
+        logger.info("Analytics service listening on %s:%s", host, port)
+        return server
+
+    def _bootstrap(self):
+        from heatmap import get_heatmap
+
+        self.store.ensure_synced('user1')
+        self.store.ensure_synced('stress_records')
+        self.heatmap = get_heatmap()
+        # Background pulls keep the rollups and the heatmap current from here on.
+        self.store.start()
+
+    async def _warm(self):
+        """Recompute the preset ranges whenever the replica moves, so the
+        first dashboard after a sync does not pay for them."""
+        warmed = None
+        while True:
+            if self.store.version != warmed:
+                warmed = self.store.version
+                ranges = [self.queries.preset_range(preset) for preset in WARM_PRESETS]
+                ranges += [self.queries.previous_range(*r) for r in ranges]
+                try:
+                    for start, end in ranges:
+                        await self.payload('/summary', (('end', end), ('start', start)))
+                    await self.payload('/departments', ())
+                    await self.payload('/heatmap', ())
+                except Exception as e:
+                    logger.warning("⚠️ Warming the analytics cache failed: %s", e)
+            await asyncio.sleep(self.warm_seconds)
+
+    # ---------- payloads ----------
+
+    def _summary(self, params):
+        if 'start' not in params or 'end' not in params:
+            raise ValueError("start and end are required")
+        user_id = params.get('user_id')
+        return self.queries.query_stress_summary(params['start'], params['end'], department=params.get('department'),
+                                                 user_id=_user_id(user_id) if user_id else None)
+
+    def _users(self, params):
+        users = self.queries.load_department_users(params.get('department'))
+        return [{field: getattr(u, field) for field in USER_FIELDS} for u in users]
+
+    def _heatmap(self, params):
+        names, matrix = self.heatmap.matrix()
+        return {'names': names, 'matrix': _json_matrix(matrix)}
+
+    def _render(self, build, params):
+        with instrumentation.stage('analytics.render'):
+            body = json.dumps(build(params), separators=(',', ':'), default=str).encode()
+        # Content hash: a sync that leaves this answer unchanged keeps its ETag.
+        return f'"{hashlib.blake2b(body, digest_size=12).hexdigest()}"', body
+
+    async def payload(self, path, params):
+        """(etag, body) for a route, from the cache while the data behind it
+        is unchanged. Identical concurrent requests share one computation."""
+        build, version_of = self.routes[path]
+        version = version_of()
+        key = (path, params)
+        cached = self._cache.get(key)
+        if cached is not None and cached[0] == version:
+            self.stats['cache_hits'] += 1
+            self._cache.move_to_end(key)
+            return cached[1], cached[2]
+        flight = (path, params, version)
+        future = self._inflight.get(flight)
+        if future is not None:
+            self.stats['coalesced'] += 1
+            return await asyncio.shield(future)
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[flight] = future
+        try:
+            etag, body = await asyncio.to_thread(self._render, build, dict(params))
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # retrieved here, waiters re-raise it
+            raise
+        else:
+            future.set_result((etag, body))
+        finally:
+            self._inflight.pop(flight, None)
+        self.stats['computed'] += 1
+        self._cache[key] = (version, etag, body)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_entries:
+            self._cache.popitem(last=False)
+        return etag, body
+
+    # ---------- HTTP ----------
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, _ = request_line.decode('latin-1').split(' ', 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get('content-length') or 0)
+                if length:
+                    await reader.readexactly(length)  # nothing here takes a body
+                status, etag, body = await self._route(method, target, headers.get('if-none-match'),
+                                                       headers.get('authorization'))
+                close = headers.get('connection', '').lower() == 'close'
+                self._respond(writer, status, etag, body, close)
+                await writer.drain()
+                if close:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    def _authorized(self, authorization):
+        scheme, _, token = (authorization or '').partition(' ')
+        return scheme.lower() == 'bearer' and hmac.compare_digest(token.strip().encode(), self.token.encode())
+
+    async def _route(self, method, target, if_none_match=None, authorization=None):
+        """(status, etag, body bytes) for one request."""
+        self.stats['requests'] += 1
+        url = urlsplit(target)
+        if method != 'GET':
+            return 405, None, self._error('use GET')
+        if url.path == '/health':
+            return 200, None, json.dumps({
+                'status': self.store.status, 'last_sync': self.store.last_sync,
+                'last_error': self.store.last_error, 'version': self.store.version,
+                'cached': len(self._cache), **self.stats}).encode()
+        if url.path not in self.routes:
+            return 404, None, self._error('not found')
+        if not self._authorized(authorization):
+            self.stats['unauthorized'] += 1
+            return 401, None, self._error('missing or wrong token')
+        params = tuple(sorted((k, v) for k, v in parse_qsl(url.query) if v))
+        try:
+            etag, body = await self.payload(url.path, params)
+        except ValueError as e:
+            return 400, None, self._error(str(e))
+        except Exception as e:
+            self.stats['errors'] += 1
+            logger.error("❌ %s failed: %s", url.path, e)
+            return 500, None, self._error('query failed')
+        if if_none_match and etag in (tag.strip() for tag in if_none_match.split(',')):
+            self.stats['not_modified'] += 1
+            return 304, etag, b''
+        return 200, etag, body
+
+    @staticmethod
+    def _error(message):
+        return json.dumps({'error': message}).encode()
+
+    @staticmethod
+    def _respond(writer, status, etag, body, close=False):
+        head = [f"HTTP/1.1 {status} {REASONS.get(status, '')}", f"Content-Length: {len(body)}",
+                f"Connection: {'close' if close else 'keep-alive'}"]
+        if status != 304:
+            head.append('Content-Type: application/json')
+        if etag:
+            # Clients may keep a copy but must revalidate it on every use.
+            head += [f"ETag: {etag}", 'Cache-Control: no-cache']
+        writer.write(('\r\n'.join(head) + '\r\n\r\n').encode('latin-1') + body)
+
+
+# ---------- client helpers ----------
+
+_client_cache = OrderedDict()  # request URL -> (etag, payload)
+_client_lock = threading.Lock()
+
+
+@instrumentation.timed('analytics.fetch')
+def fetch_payload(url, path, params=None, timeout=30, token=ANALYTICS_TOKEN):
+    """GET one endpoint, revalidating the last copy with If-None-Match.
+
+    An unchanged answer comes back as a 304 and the previously parsed
+    payload (the same object) is returned. Raises urllib.error.URLError
+    when the service is unreachable.
+    """
+    query = urlencode(sorted((k, v) for k, v in (params or {}).items() if v is not None))
+    target = f"{url.rstrip('/')}{path}" + (f"?{query}" if query else '')
+    with _client_lock:
+        cached = _client_cache.get(target)
+    headers = {'Authorization': f"Bearer {token}"} if token else {}
+    if cached:
+        headers['If-None-Match'] = cached[0]
+    request = urllib.request.Request(target, headers=headers)
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            etag, payload = response.headers.get('ETag'), json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        if e.code != 304 or cached is None:
+            raise
+        instrumentation.count('analytics.not_modified')
+        etag, payload = cached
+    if etag:
+        with _client_lock:
+            _client_cache[target] = (etag, payload)
+            _client_cache.move_to_end(target)
+            while len(_client_cache) > CLIENT_CACHE_SIZE:
+                _client_cache.popitem(last=False)
+    return payload
+
+
+async def serve(host=ANALYTICS_HOST, port=ANALYTICS_PORT):
+    service = AnalyticsService()
+    server = await service.start(host, port)
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shared read-only analytics service for admin dashboards.")
+    parser.add_argument('--host', default=ANALYTICS_HOST)
+    parser.add_argument('--port', type=int, default=ANALYTICS_PORT)
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+benchmarks/activity_overhead.py - Cost of Keyboard/Mouse Activity Tracking
+Replays synthetic input through the listener callbacks (a 1 kHz gaming mouse
+plus steady typing) and reports the per-event callback cost and the share of
+one core spent in the callbacks and the once-a-second aggregator.
+
+    python benchmarks/activity_overhead.py --seconds 60
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from activity_tracker import ActivityTracker  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark activity tracking overhead.")
+    parser.add_argument('--seconds', type=int, default=60, help="simulated input duration")
+    parser.add_argument('--mouse-hz', type=int, default=1000)
+    parser.add_argument('--keys-per-second', type=int, default=8)
+    args = parser.parse_args()
+
+    tracker = ActivityTracker()
+    path = [(500 + random.randint(-3, 3), 500 + random.randint(-3, 3)) for _ in range(args.mouse_hz)]
+    key_every = max(args.mouse_hz // args.keys_per_second, 1)
+    callback_time = aggregate_time = 0.0
+    events = 0
+    clock = time.time()
+    for second in range(args.seconds):
+        started = time.perf_counter()
+        for i, (x, y) in enumerate(path):
+            tracker.on_move(x, y)
+            if i % key_every == 0:
+                tracker.on_key('a')
+                events += 1
+        callback_time += time.perf_counter() - started
+        events += len(path)
+
+        # Each pass drains one simulated second of input.
+        started = time.perf_counter()
+        tracker.aggregate(now=clock + second)
+        aggregate_time += time.perf_counter() - started
+
+    total = callback_time + aggregate_time
+    print(f"{events:,} events over {args.seconds} simulated seconds")
+    print(f"callback          {callback_time / events * 1e9:>8.0f} ns/event")
+    print(f"aggregator        {aggregate_time / args.seconds * 1e3:>8.2f} ms/pass")
+    print(f"CPU share         {total / args.seconds * 100:>8.2f} % of one core")
+    print(f"signals           {tracker.snapshot(now=clock + args.seconds)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+benchmarks/blink_tracking.py - Blink Accuracy of Tracked Landmarks
+Counts blinks in recorded videos twice: with the face mesh on every frame
+and with LandmarkTracker detecting every Nth frame. Reports the blink
+counts, face-mesh calls and time per frame, and exits 1 if any video's
+count drifts more than --tolerance from the every-frame baseline.
+
+    python benchmarks/blink_tracking.py clips/*.mp4 --every 4 --tolerance 0.05
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cv2  # noqa: E402
+from landmark_tracker import LandmarkTracker, BlinkCounter, mediapipe_detector  # noqa: E402
+from config import LANDMARK_DETECT_EVERY  # noqa: E402
+
+
+def count_blinks(path, every):
+    """(blinks, face-mesh calls, frames, seconds) for one pass over a video."""
+    capture = cv2.VideoCapture(path)
+    if not capture.isOpened():
+        raise SystemExit(f"Cannot open video: {path}")
+    tracker = LandmarkTracker(mediapipe_detector(), every=every)
+    blinks = BlinkCounter()
+    elapsed = 0.0
+    while True:
+        ok, frame = capture.read()
+        if not ok:
+            break
+        started = time.perf_counter()
+        face = tracker.update(frame)
+        elapsed += time.perf_counter() - started
+        blinks.update(face.ear if face is not None else None)
+    capture.release()
+    return blinks.total, tracker.stats['detections'], tracker.stats['frames'], elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare blink counts with and without landmark tracking.")
+    parser.add_argument('videos', nargs='+')
+    parser.add_argument('--every', type=int, default=LANDMARK_DETECT_EVERY)
+    parser.add_argument('--tolerance', type=float, default=0.05, help="allowed relative blink-count error")
+    args = parser.parse_args()
+
+    failed = False
+    print(f"{'video':<28}{'blinks':>8}{'tracked':>9}{'mesh calls':>14}{'ms/frame':>16}")
+    for path in args.videos:
+        base_blinks, base_calls, frames, base_time = count_blinks(path, 1)
+        blinks, calls, _, tracked_time = count_blinks(path, args.every)
+        error = abs(blinks - base_blinks) / max(base_blinks, 1)
+        ok = error <= args.tolerance
+        failed |= not ok
+        print(f"{os.path.basename(path)[:27]:<28}{base_blinks:>8}{blinks:>9}"
+              f"{base_calls:>7} -> {calls:<6}"
+              f"{base_time / frames * 1000:>7.2f} -> {tracked_time / frames * 1000:<6.2f}"
+              f"{'' if ok else '  ❌ off by %.0f%%' % (error * 100)}")
+    if failed:
+        sys.exit(1)
+    print(f"✅ Blink counts within {args.tolerance:.0%} of every-frame detection")
+
+
+if __name__ == "__main__":
+    main()
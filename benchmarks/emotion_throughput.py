@@ -0,0 +1,75 @@
+"""
+benchmarks/emotion_throughput.py - Emotion Inference Throughput
+Compares per-frame classification (one crop per forward pass, float model)
+with batched passes on the quantized model and with the multi-stream
+batcher, using synthetic face crops.
+
+    python benchmarks/emotion_throughput.py --crops 2000 --streams 4
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from emotion_backend import EmotionClassifier, EmotionBatcher, load_backend  # noqa: E402
+from config import EMOTION_BACKEND, EMOTION_BATCH_SIZE  # noqa: E402
+
+
+def synthetic_crops(n, seed=7):
+    rng = np.random.default_rng(seed)
+    return [rng.integers(0, 256, (side, side, 3), dtype=np.uint8) for side in rng.integers(80, 200, n)]
+
+
+def report(name, n, elapsed, baseline=None):
+    rate = n / elapsed
+    speedup = f"  x{rate / baseline:.1f}" if baseline else ''
+    print(f"{name:<34}{rate:>10,.0f} crops/s{speedup}")
+    return rate
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark emotion inference throughput.")
+    parser.add_argument('--crops', type=int, default=1000)
+    parser.add_argument('--backend', default=EMOTION_BACKEND)
+    parser.add_argument('--threads', type=int, default=2)
+    parser.add_argument('--batch', type=int, default=EMOTION_BATCH_SIZE)
+    parser.add_argument('--streams', type=int, default=4, help="capture threads feeding the batcher")
+    args = parser.parse_args()
+    crops = synthetic_crops(args.crops)
+
+    per_frame = EmotionClassifier(load_backend(args.backend, threads=args.threads, quantize=False), batch_size=1)
+    started = time.perf_counter()
+    for crop in crops:
+        per_frame.classify_one(crop)
+    baseline = report("per-frame, float", len(crops), time.perf_counter() - started)
+
+    batched = EmotionClassifier(load_backend(args.backend, threads=args.threads), batch_size=args.batch)
+    print(f"(quantized model accepts batch {batched.max_batch})")
+    started = time.perf_counter()
+    batched.classify(crops)
+    report(f"batch {args.batch}, quantized", len(crops), time.perf_counter() - started, baseline)
+
+    batcher = EmotionBatcher(batched)
+    share = len(crops) // args.streams
+
+    def stream(part):
+        futures = [batcher.submit(crop) for crop in part]
+        for future in futures:
+            future.result()
+
+    threads = [threading.Thread(target=stream, args=(crops[i * share:(i + 1) * share],)) for i in range(args.streams)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    report(f"{args.streams} streams via batcher", share * args.streams, time.perf_counter() - started, baseline)
+
+
+if __name__ == "__main__":
+    main()
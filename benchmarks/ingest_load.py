@@ -0,0 +1,134 @@
+"""
+benchmarks/ingest_load.py - Load Generator for the Ingestion Service
+Simulates many monitoring clients posting stress samples over keep-alive
+connections and reports throughput, request latency, duplicates and how
+often the service pushed back with 503.
+
+    python benchmarks/ingest_load.py                       # in-process service, local mode
+    python benchmarks/ingest_load.py --url http://host:8765 --agents 500
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import INGEST_CLIENT_TOKEN  # noqa: E402
+from ingestion_service import IngestionService, LocalSink  # noqa: E402
+
+
+LEVELS = ('Low', 'Moderate', 'High')
+EMOTIONS = ('neutral', 'happy', 'sad', 'angry', 'fear', 'surprise')
+
+
+def make_sample(user_id, at):
+    score = min(1.0, max(0.0, random.gauss(0.5, 0.2)))
+    return {
+        'user_id': user_id,
+        'created_at': at.isoformat(),
+        'avg_stress_score': round(score, 3),
+        'stress_level': LEVELS[min(int(score * 3), 2)],
+        'dominant_emotion': random.choice(EMOTIONS),
+    }
+
+
+async def post(reader, writer, host, body, token):
+    writer.write((f"POST /samples HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+                  f"Authorization: Bearer {token}\r\nContent-Length: {len(body)}\r\n\r\n").encode() + body)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode().partition(':')
+        if name.lower() == 'content-length':
+            length = int(value)
+    return status, await reader.readexactly(length)
+
+
+async def agent(user_id, url, token, samples, per_request, interval, duplicate_rate, results):
+    parts = urlsplit(url)
+    reader, writer = await asyncio.open_connection(parts.hostname, parts.port)
+    start = datetime.now() - timedelta(seconds=samples)
+    sent = []
+    try:
+        for i in range(0, samples, per_request):
+            batch = [make_sample(user_id, start + timedelta(seconds=j)) for j in range(i, min(i + per_request, samples))]
+            if sent and random.random() < duplicate_rate:
+                batch.append(random.choice(sent))  # a client retrying an earlier send
+            sent.extend(batch)
+            body = json.dumps(batch).encode()
+            while True:
+                began = time.perf_counter()
+                status, _ = await post(reader, writer, parts.netloc, body, token)
+                results['latency'].append(time.perf_counter() - began)
+                if status != 503:
+                    break
+                results['throttled'] += 1
+                await asyncio.sleep(1)
+            results['samples'] += len(batch) if status == 200 else 0
+            results['errors'] += status != 200
+            if interval:
+                await asyncio.sleep(interval)
+    finally:
+        writer.close()
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+async def run(args):
+    service = server = None
+    url = args.url
+    if url is None:
+        service = IngestionService(LocalSink(), tokens={args.token: 'load-test'}, queue_size=args.queue_size)
+        server = await service.start('127.0.0.1', args.port)
+        url = f"http://127.0.0.1:{args.port}"
+
+    results = {'latency': [], 'samples': 0, 'throttled': 0, 'errors': 0}
+    began = time.perf_counter()
+    await asyncio.gather(*(agent(user_id, url, args.token, args.samples, args.per_request, args.interval,
+                                 args.duplicates, results) for user_id in range(1, args.agents + 1)))
+    elapsed = time.perf_counter() - began
+
+    latency = results['latency']
+    print(f"agents={args.agents} samples/agent={args.samples} per_request={args.per_request}")
+    print(f"accepted {results['samples']} samples in {elapsed:.2f}s -> {results['samples'] / elapsed:,.0f} samples/s")
+    print(f"requests {len(latency)}  p50 {percentile(latency, 0.5) * 1000:.1f} ms  "
+          f"p95 {percentile(latency, 0.95) * 1000:.1f} ms  max {max(latency, default=0) * 1000:.1f} ms")
+    print(f"503 back-offs {results['throttled']}  errors {results['errors']}")
+    if service is not None:
+        print(f"service stats {service.stats}")
+        server.close()
+        await server.wait_closed()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the stress sample ingestion service.")
+    parser.add_argument('--url', help="target a running service instead of an in-process local one")
+    parser.add_argument('--port', type=int, default=8799, help="port for the in-process service")
+    parser.add_argument('--token', default=INGEST_CLIENT_TOKEN or 'load-test', help="client token to send")
+    parser.add_argument('--agents', type=int, default=300)
+    parser.add_argument('--samples', type=int, default=200, help="samples per agent")
+    parser.add_argument('--per-request', type=int, default=10)
+    parser.add_argument('--interval', type=float, default=0.0, help="seconds between an agent's requests")
+    parser.add_argument('--duplicates', type=float, default=0.05, help="chance a request repeats an old sample")
+    parser.add_argument('--queue-size', type=int, default=20000)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
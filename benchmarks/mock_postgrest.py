@@ -0,0 +1,391 @@
+"""
+benchmarks/mock_postgrest.py - Local PostgREST Stand-In for Benchmarks
+Serves a synthetic_data.py SQLite database under /rest/v1 with the subset of
+PostgREST the app's supabase-py calls use: select with column lists,
+eq/neq/gt/gte/lt/lte/like/ilike/in/is filters (and not.), or=(...) with
+nested and(...), order, limit/offset and Range headers, Prefer count=exact,
+inserts/upserts, PATCH, DELETE, return=representation and the
+apply_user_heartbeats RPC. Every request is counted so a benchmark can
+report how many round trips and bytes a page cost.
+
+    python benchmarks/mock_postgrest.py --data bench_data.db --port 54321
+"""
+
+import argparse
+import json
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qsl
+
+TIMESTAMP_COLUMNS = {'created_at', 'updated_at', 'last_active'}
+OPERATORS = {'eq': '=', 'neq': '!=', 'gt': '>', 'gte': '>=', 'lt': '<', 'lte': '<=', 'like': 'LIKE', 'ilike': 'LIKE'}
+RESERVED_PARAMS = {'select', 'order', 'limit', 'offset', 'columns', 'on_conflict'}
+NAME = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+
+class QueryError(ValueError):
+    """Maps to a PostgREST 400 response."""
+
+
+def _stamp(value):
+    """Timestamps are stored and compared as fixed-width UTC ISO text."""
+    if value is None:
+        return None
+    try:
+        parsed = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    except ValueError:
+        return value
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%f+00:00')
+
+
+def _unquote(value):
+    if len(value) >= 2 and value[0] == value[-1] == '"':
+        return value[1:-1].replace('\\"', '"')
+    return value
+
+
+def _split_top(text):
+    """Split on commas outside parentheses and double quotes."""
+    parts, depth, quoted, current = [], 0, False, []
+    for ch in text:
+        if ch == '"':
+            quoted = not quoted
+        elif not quoted and ch == '(':
+            depth += 1
+        elif not quoted and ch == ')':
+            depth -= 1
+        if ch == ',' and depth == 0 and not quoted:
+            parts.append(''.join(current))
+            current = []
+        else:
+            current.append(ch)
+    parts.append(''.join(current))
+    return parts
+
+
+class MockPostgREST:
+    """Threaded HTTP server over one SQLite file."""
+
+    def __init__(self, path, latency_ms=0.0):
+        self.path = path
+        self.latency = latency_ms / 1000
+        self.stats = {'requests': 0, 'rows': 0, 'bytes': 0}
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._columns = {}
+        self._server = None
+
+    # ---------- SQLite ----------
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.create_function('ilike_lower', 1, lambda v: None if v is None else str(v).lower(), deterministic=True)
+            self._local.conn = conn
+        return conn
+
+    def columns(self, table):
+        columns = self._columns.get(table)
+        if columns is None:
+            if not NAME.match(table):
+                raise LookupError(table)
+            columns = [r[1] for r in self._conn().execute(f'PRAGMA table_info("{table}")')]
+            if not columns:
+                raise LookupError(table)
+            self._columns[table] = columns
+        return columns
+
+    def _column(self, table, name):
+        if name not in self.columns(table):
+            raise QueryError(f'column {table}.{name} does not exist')
+        return f'"{name}"'
+
+    # ---------- filters ----------
+
+    def _condition(self, table, column, expression, params):
+        negate = expression.startswith('not.')
+        if negate:
+            expression = expression[4:]
+        op, _, value = expression.partition('.')
+        sql_column = self._column(table, column)
+        if op == 'in':
+            if not (value.startswith('(') and value.endswith(')')):
+                raise QueryError(f'bad in filter: {value}')
+            values = [_unquote(v) for v in _split_top(value[1:-1]) if v != '']
+            if column in TIMESTAMP_COLUMNS:
+                values = [_stamp(v) for v in values]
+            params.extend(values)
+            clause = f"{sql_column} IN ({', '.join('?' * len(values))})" if values else '0'
+        elif op == 'is':
+            keyword = {'null': 'NULL', 'true': '1', 'false': '0'}.get(value.lower())
+            if keyword is None:
+                raise QueryError(f'bad is filter: {value}')
+            clause = f'{sql_column} IS {keyword}'
+        elif op in OPERATORS:
+            value = _unquote(value)
+            if column in TIMESTAMP_COLUMNS and op not in ('like', 'ilike'):
+                value = _stamp(value)
+            if op in ('like', 'ilike'):
+                value = value.replace('*', '%')
+            if op == 'ilike':
+                sql_column, value = f'ilike_lower({sql_column})', value.lower()
+            params.append(value)
+            clause = f'{sql_column} {OPERATORS[op]} ?'
+        else:
+            raise QueryError(f'unsupported operator {op}')
+        return f'NOT ({clause})' if negate else clause
+
+    def _logic(self, table, kind, body, params):
+        """or=(a.eq.1,and(b.gt.2,c.lt.3)) -> SQL."""
+        if not (body.startswith('(') and body.endswith(')')):
+            raise QueryError(f'bad {kind} filter: {body}')
+        clauses = []
+        for term in _split_top(body[1:-1]):
+            head = term.split('(', 1)[0]
+            if head in ('and', 'or', 'not.and', 'not.or'):
+                negate = head.startswith('not.')
+                nested = self._logic(table, head.rsplit('.', 1)[-1], term[len(head):], params)
+                clauses.append(f'NOT {nested}' if negate else nested)
+            else:
+                column, _, expression = term.partition('.')
+                clauses.append(self._condition(table, column, expression, params))
+        return '(' + f' {kind.upper()} '.join(clauses) + ')'
+
+    def _where(self, table, query):
+        clauses, params = [], []
+        for key, value in query:
+            if key in RESERVED_PARAMS:
+                continue
+            if key in ('or', 'and', 'not.or', 'not.and'):
+                clause = self._logic(table, key.rsplit('.', 1)[-1], value, params)
+                clauses.append(f'NOT {clause}' if key.startswith('not.') else clause)
+            else:
+                clauses.append(self._condition(table, key, value, params))
+        return (' WHERE ' + ' AND '.join(clauses) if clauses else ''), params
+
+    def _order(self, table, query):
+        terms = []
+        for key, value in query:
+            if key != 'order':
+                continue
+            for part in value.split(','):
+                bits = part.split('.')
+                direction = 'DESC' if 'desc' in bits[1:] else 'ASC'
+                nulls = ' NULLS FIRST' if 'nullsfirst' in bits[1:] else ' NULLS LAST' if 'nullslast' in bits[1:] else ''
+                terms.append(f'{self._column(table, bits[0])} {direction}{nulls}')
+        return ' ORDER BY ' + ', '.join(terms) if terms else ''
+
+    def _select_list(self, table, query):
+        select = dict(query).get('select', '*')
+        names = [c.strip() for c in select.split(',') if c.strip()]
+        if not names or '*' in names:
+            return '*'
+        return ', '.join(self._column(table, name.split(':')[-1].split('::')[0]) for name in names)
+
+    # ---------- operations ----------
+
+    def select(self, table, query, headers):
+        where, params = self._where(table, query)
+        sql = f'SELECT {self._select_list(table, query)} FROM "{table}"{where}{self._order(table, query)}'
+        options = dict(query)
+        limit, offset = options.get('limit'), options.get('offset')
+        range_header = headers.get('Range')
+        if range_header and limit is None:
+            start, _, end = range_header.partition('-')
+            offset, limit = int(start), (int(end) - int(start) + 1 if end else None)
+        if limit is not None:
+            sql += ' LIMIT ? OFFSET ?'
+            params += [int(limit), int(offset or 0)]
+        elif offset:
+            sql += ' LIMIT -1 OFFSET ?'
+            params.append(int(offset))
+        rows = [dict(r) for r in self._conn().execute(sql, params)]
+        total = '*'
+        if 'count=exact' in headers.get('Prefer', ''):
+            count_where, count_params = self._where(table, query)
+            total = self._conn().execute(f'SELECT COUNT(*) FROM "{table}"{count_where}', count_params).fetchone()[0]
+        first = int(offset or 0)
+        content_range = f'{first}-{first + len(rows) - 1}/{total}' if rows else f'*/{total}'
+        return rows, content_range
+
+    def _prepare(self, table, row):
+        row = {k: (_stamp(v) if k in TIMESTAMP_COLUMNS else v) for k, v in row.items()}
+        for key, value in row.items():
+            if isinstance(value, (dict, list)):
+                row[key] = json.dumps(value)
+            if key not in self.columns(table):
+                if not NAME.match(key):
+                    raise QueryError(f'bad column name {key}')
+                self._conn().execute(f'ALTER TABLE "{table}" ADD COLUMN "{key}"')
+                self._columns.pop(table, None)
+        return row
+
+    def insert(self, table, rows, merge):
+        conn, stored = self._conn(), []
+        verb = 'INSERT OR REPLACE' if merge else 'INSERT'
+        with self._write_lock, conn:
+            for row in rows:
+                row = self._prepare(table, row)
+                names = ', '.join(f'"{k}"' for k in row)
+                cursor = conn.execute(f'{verb} INTO "{table}" ({names}) VALUES ({", ".join("?" * len(row))})',
+                                      list(row.values()))
+                stored.append(dict(conn.execute(f'SELECT * FROM "{table}" WHERE rowid = ?',
+                                                (cursor.lastrowid,)).fetchone()))
+        return stored
+
+    def update(self, table, changes, query):
+        conn = self._conn()
+        with self._write_lock, conn:
+            changes = self._prepare(table, changes)
+            where, params = self._where(table, query)
+            ids = [r[0] for r in conn.execute(f'SELECT rowid FROM "{table}"{where}', params)]
+            assignments = ', '.join(f'"{k}" = ?' for k in changes)
+            conn.executemany(f'UPDATE "{table}" SET {assignments} WHERE rowid = ?',
+                             [list(changes.values()) + [i] for i in ids])
+            return [dict(conn.execute(f'SELECT * FROM "{table}" WHERE rowid = ?', (i,)).fetchone()) for i in ids]
+
+    def delete(self, table, query):
+        conn = self._conn()
+        with self._write_lock, conn:
+            where, params = self._where(table, query)
+            rows = [dict(r) for r in conn.execute(f'SELECT * FROM "{table}"{where}', params)]
+            conn.execute(f'DELETE FROM "{table}"{where}', params)
+        return rows
+
+    def rpc(self, name, args):
+        if name != 'apply_user_heartbeats':
+            raise LookupError(name)
+        conn, changed = self._conn(), 0
+        with self._write_lock, conn:
+            for update in args.get('updates') or []:
+                changed += conn.execute(
+                    'UPDATE user1 SET last_active = MAX(COALESCE(last_active, ?), ?) WHERE CAST(id AS TEXT) = ?',
+                    (_stamp(update.get('last_active')), _stamp(update.get('last_active')),
+                     str(update.get('id')))).rowcount
+        return changed
+
+    # ---------- HTTP ----------
+
+    def _count(self, rows, size):
+        with self._stats_lock:
+            self.stats['requests'] += 1
+            self.stats['rows'] += rows
+            self.stats['bytes'] += size
+
+    def snapshot(self):
+        with self._stats_lock:
+            return dict(self.stats)
+
+    def start(self, host='127.0.0.1', port=0):
+        """Serve in a background thread; returns the base URL."""
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def _body(self):
+                return json.loads(self.raw) if self.raw else None
+
+            def _send(self, status, payload, extra=None):
+                body = b'' if payload is None else json.dumps(payload, separators=(',', ':')).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                for key, value in (extra or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(body)
+                mock._count(len(payload) if isinstance(payload, list) else 0, len(body))
+
+            def _handle(self, method):
+                # Always drain the body: DELETEs carry "{}" and the connection is kept alive.
+                length = int(self.headers.get('Content-Length') or 0)
+                self.raw = self.rfile.read(length) if length else b''
+                if mock.latency:
+                    time.sleep(mock.latency)
+                url = urlsplit(self.path)
+                query = parse_qsl(url.query, keep_blank_values=True)
+                parts = url.path.strip('/').split('/')
+                if parts[:2] != ['rest', 'v1'] or len(parts) not in (3, 4):
+                    return self._send(404, {'message': f'no route {url.path}'})
+                prefer = self.headers.get('Prefer', '')
+                try:
+                    if len(parts) == 4 and parts[2] == 'rpc':
+                        if method != 'POST':
+                            return self._send(405, {'message': 'use POST'})
+                        return self._send(200, mock.rpc(parts[3], self._body() or {}))
+                    table = parts[2]
+                    mock.columns(table)
+                    if method == 'GET':
+                        rows, content_range = mock.select(table, query, self.headers)
+                        return self._send(200, rows, {'Content-Range': content_range})
+                    if method == 'POST':
+                        body = self._body()
+                        rows = mock.insert(table, body if isinstance(body, list) else [body],
+                                           'merge-duplicates' in prefer)
+                    elif method == 'PATCH':
+                        rows = mock.update(table, self._body() or {}, query)
+                    elif method == 'DELETE':
+                        rows = mock.delete(table, query)
+                    else:
+                        return self._send(405, {'message': f'{method} not supported'})
+                    if 'return=representation' in prefer:
+                        return self._send(201 if method == 'POST' else 200, rows)
+                    return self._send(201 if method == 'POST' else 204, None)
+                except LookupError as e:
+                    return self._send(404, {'code': '42P01', 'message': f'relation or function {e} does not exist'})
+                except (QueryError, sqlite3.Error, ValueError) as e:
+                    return self._send(400, {'code': 'PGRST100', 'message': str(e)})
+
+            def do_GET(self):
+                self._handle('GET')
+
+            def do_POST(self):
+                self._handle('POST')
+
+            def do_PATCH(self):
+                self._handle('PATCH')
+
+            def do_DELETE(self):
+                self._handle('DELETE')
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name='mock-postgrest', daemon=True).start()
+        return f'http://{host}:{self._server.server_address[1]}'
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a synthetic database over a PostgREST-style API.")
+    parser.add_argument('--data', default='bench_data.db')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=54321)
+    parser.add_argument('--latency-ms', type=float, default=0.0, help="added to every request")
+    args = parser.parse_args()
+    url = MockPostgREST(args.data, args.latency_ms).start(args.host, args.port)
+    print(f"Serving {args.data} at {url}/rest/v1 (SUPABASE_URL={url})")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
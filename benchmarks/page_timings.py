@@ -0,0 +1,352 @@
+"""
+benchmarks/page_timings.py - End-to-End Page Timings Against a Mock Backend
+Generates a synthetic dataset, serves it through mock_postgrest.py and
+points the app at it (SUPABASE_URL), then drives the real Tk pages:
+
+    login                   Sign In click -> admin dashboard fully painted
+    admin_dashboard         open -> every KPI and chart painted (run 1 cold, then warm)
+    admin_panel.open        open with the full user list
+    admin_panel.keystroke   one character typed into the search box
+    admin_panel.scroll      one page down in the user table
+    profile.user / .admin   open the profile page
+
+"Painted" means the Tk queue is drained and no "⏳" placeholder is left.
+Needs a display: run under xvfb-run, or the script starts Xvfb itself
+when DISPLAY is unset. Results (timings, backend round trips and bytes,
+instrumentation stages) are written as JSON; --compare prints the change
+against an earlier run.
+
+    python benchmarks/page_timings.py --users 10000 --records 1000000 --output after.json --compare before.json
+"""
+
+import argparse
+import importlib
+import importlib.machinery
+import importlib.util
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mock_postgrest import MockPostgREST  # noqa: E402
+from synthetic_data import generate, ADMIN_EMAIL, ADMIN_PASSWORD  # noqa: E402
+
+
+LOADING_MARK = '⏳'
+SCREEN = (1600, 1000)
+
+
+# ---------- environment ----------
+
+def start_xvfb():
+    """Start Xvfb on a free display and export DISPLAY; returns the process."""
+    xvfb = shutil.which('Xvfb')
+    if xvfb is None:
+        sys.exit("No DISPLAY and Xvfb not found: install xvfb or run under xvfb-run -a")
+    read_fd, write_fd = os.pipe()
+    process = subprocess.Popen([xvfb, '-displayfd', str(write_fd), '-screen', '0', f'{SCREEN[0]}x{SCREEN[1]}x24',
+                                '-nolisten', 'tcp'], pass_fds=(write_fd,),
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    os.close(write_fd)
+    with os.fdopen(read_fd) as f:
+        display = f.readline().strip()
+    if not display:
+        sys.exit("Xvfb did not start")
+    os.environ['DISPLAY'] = f':{display}'
+    return process
+
+
+def configure(url, workdir, mode):
+    """Point the app at the mock and at throwaway local files. Must run
+    before any app module is imported: they read config at import time."""
+    os.environ['SUPABASE_URL'] = url
+    import config
+
+    config.OFFLINE_MODE = mode == 'replica'
+    config.LOCAL_DB_PATH = os.path.join(workdir, 'local_cache.db')
+    config.CHART_CACHE_DIR = os.path.join(workdir, 'chart_cache')
+    config.REPORTS_FOLDER = os.path.join(workdir, 'reports')
+    config.ALERT_REALTIME = False  # the mock has no Realtime endpoint
+    config.INGEST_SERVICE_URL = None
+    config.PERF_ENABLED = True
+    config.PERF_DUMP_FILE = None
+
+
+def alias_packages():
+    """The pages import `pages.*` and `components.*`, which only resolve to
+    Pages/ and Compnents/ on case-insensitive file systems."""
+    for name, folder in (('pages', 'Pages'), ('components', 'Compnents')):
+        if importlib.util.find_spec(name) is None:
+            spec = importlib.machinery.ModuleSpec(name, None, is_package=True)
+            package = importlib.util.module_from_spec(spec)
+            package.__path__ = [os.path.join(ROOT, folder)]
+            sys.modules[name] = package
+
+
+class BenchApp:
+    """What the pages use of the application object: a root window,
+    clear_window() and the signed-in user."""
+
+    def __init__(self, root):
+        self.root = root
+        self.current_user = None
+        self.current_user_type = None
+
+    def clear_window(self):
+        for widget in self.root.winfo_children():
+            widget.destroy()
+
+    def toggle_monitoring(self):
+        pass  # the camera loop is not part of this benchmark
+
+
+# ---------- measuring ----------
+
+def walk(widget):
+    yield widget
+    for child in widget.winfo_children():
+        yield from walk(child)
+
+
+def find(root, kind, accept=lambda w: True):
+    return next((w for w in walk(root) if isinstance(w, kind) and accept(w)), None)
+
+
+def is_loading(root):
+    for widget in walk(root):
+        try:
+            if str(widget.cget('text')).startswith(LOADING_MARK):
+                return True
+        except Exception:
+            continue  # widgets without a text option
+    return False
+
+
+def wait_painted(root, timeout):
+    """Pump Tk until the page has no loading placeholder left. False on timeout."""
+    deadline = time.perf_counter() + timeout
+    while True:
+        root.update()
+        if not is_loading(root):
+            root.update_idletasks()
+            return True
+        if time.perf_counter() > deadline:
+            return False
+        time.sleep(0.002)
+
+
+class Recorder:
+    """Wall time, backend round trips and instrumentation stages per step."""
+
+    def __init__(self, mock):
+        self.mock = mock
+        self.steps = {}
+
+    def measure(self, name, action):
+        import instrumentation
+
+        before = self.mock.snapshot()
+        started = time.perf_counter()
+        finished = action() is not False
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        after = self.mock.snapshot()
+        step = self.steps.setdefault(name, {'runs_ms': [], 'requests': [], 'bytes': [], 'timeouts': 0, 'stages': {}})
+        step['runs_ms'].append(round(elapsed_ms, 2))
+        step['requests'].append(after['requests'] - before['requests'])
+        step['bytes'].append(after['bytes'] - before['bytes'])
+        step['timeouts'] += not finished
+        step['stages'] = instrumentation.snapshot()['stages']
+        return elapsed_ms
+
+    def close_step(self):
+        import instrumentation
+
+        instrumentation.reset()
+
+    def results(self):
+        out = {}
+        for name, step in self.steps.items():
+            runs = step['runs_ms']
+            out[name] = dict(step, first_ms=runs[0], median_ms=round(statistics.median(runs), 2),
+                             min_ms=min(runs), max_ms=max(runs))
+        return out
+
+
+# ---------- scenarios ----------
+
+def bench_login(app, recorder, args):
+    from pages.login_page import show_login, select_user_type, login
+
+    show_login(app)
+    select_user_type(app, 'admin')
+    app.root.update()
+
+    def sign_in():
+        login(app, ADMIN_EMAIL, ADMIN_PASSWORD)
+        return app.current_user_type == 'admin' and wait_painted(app.root, args.timeout)
+
+    recorder.measure('login', sign_in)
+    recorder.close_step()
+
+
+def bench_dashboard(app, recorder, args):
+    from pages.admin_dashboard_page import show_admin_dashboard
+
+    for _ in range(args.repeat):
+        recorder.measure('admin_dashboard', lambda: (show_admin_dashboard(app), wait_painted(app.root, args.timeout))[1])
+    recorder.close_step()
+
+
+def bench_panel(app, recorder, args):
+    import tkinter as tk
+    from pages.admin_panel_page import show_admin_panel
+
+    recorder.measure('admin_panel.open', lambda: (show_admin_panel(app), app.root.update())[1])
+    recorder.close_step()
+
+    entry = find(app.root, tk.Entry)
+    for ch in args.search:
+        recorder.measure('admin_panel.keystroke', lambda: (entry.insert('end', ch), app.root.update())[1])
+    recorder.measure('admin_panel.clear_search', lambda: (entry.delete(0, 'end'), app.root.update())[1])
+    recorder.close_step()
+
+    canvas = find(app.root, tk.Canvas, lambda c: bool(c.cget('yscrollcommand')))
+    for _ in range(args.scroll_steps):
+        recorder.measure('admin_panel.scroll', lambda: (canvas.yview_scroll(1, 'pages'), app.root.update())[1])
+    recorder.close_step()
+
+
+def bench_profile(app, recorder, args):
+    from pages.profile_page import show_profile
+    from local_store import db
+    from records import User
+
+    admin = app.current_user
+    user = User.from_row(db.table('user1').select('*').eq('email', args.profile_email).execute().data[0])
+    for label, current, is_admin in (('profile.user', user, False), ('profile.admin', admin, True)):
+        app.current_user, app.current_user_type = current, 'admin' if is_admin else 'user'
+        for _ in range(args.repeat):
+            recorder.measure(label, lambda: (show_profile(app, is_admin), wait_painted(app.root, args.timeout))[1])
+        recorder.close_step()
+    app.current_user, app.current_user_type = admin, 'admin'
+
+
+SCENARIOS = {'login': bench_login, 'dashboard': bench_dashboard, 'panel': bench_panel, 'profile': bench_profile}
+
+
+# ---------- reporting ----------
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_table(steps, previous=None):
+    print(f"\n{'step':<26}{'first ms':>10}{'median ms':>11}{'requests':>10}{'KB':>9}" + ('  vs before' if previous else ''))
+    for name, step in steps.items():
+        line = (f"{name:<26}{step['first_ms']:>10.1f}{step['median_ms']:>11.1f}"
+                f"{step['requests'][0]:>10}{step['bytes'][0] / 1024:>9.0f}")
+        if step['timeouts']:
+            line += f"  ({step['timeouts']} timed out)"
+        old = (previous or {}).get(name)
+        if old:
+            line += f"  {old['median_ms']:.1f} -> {step['median_ms']:.1f} ms ({step['median_ms'] / max(old['median_ms'], 1e-9):.2f}x)"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the real Tk pages against a mock Supabase backend.")
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--records', type=int, default=100_000)
+    parser.add_argument('--days', type=int, default=90)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--data', help="reuse (or create) this dataset instead of a temporary one")
+    parser.add_argument('--mode', choices=('replica', 'direct'), default='replica',
+                        help="replica: OFFLINE_MODE SQLite replica (default); direct: every read hits the backend")
+    parser.add_argument('--latency-ms', type=float, default=0.0, help="simulated network latency per request")
+    parser.add_argument('--pages', nargs='+', choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument('--repeat', type=int, default=3, help="opens per page; the first is cold")
+    parser.add_argument('--search', default='alex', help="characters typed into the admin panel search")
+    parser.add_argument('--scroll-steps', type=int, default=10)
+    parser.add_argument('--profile-email', default='alex.1@example.com')
+    parser.add_argument('--timeout', type=float, default=600, help="seconds to wait for a page to paint")
+    parser.add_argument('--output', default='page_timings.json')
+    parser.add_argument('--compare', help="earlier results JSON to compare against")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='page_timings_')
+    data = args.data or os.path.join(workdir, 'backend.db')
+    setup = {}
+    if not os.path.exists(data):
+        print(f"Generating {args.users:,} users / {args.records:,} records...")
+        setup['generate_s'] = round(generate(data, args.users, args.records, args.days, seed=args.seed), 2)
+    mock = MockPostgREST(data, args.latency_ms)
+    url = mock.start()
+
+    xvfb = start_xvfb() if not os.environ.get('DISPLAY') else None
+    try:
+        configure(url, workdir, args.mode)
+        alias_packages()
+        import tkinter as tk
+        import session_memory
+        import local_store
+
+        if local_store.store is not None:
+            started = time.perf_counter()
+            local_store.store.sync_once()
+            setup['replica_sync_s'] = round(time.perf_counter() - started, 2)
+            setup['replica_sync_requests'] = mock.snapshot()['requests']
+
+        root = tk.Tk()
+        root.geometry(f'{SCREEN[0]}x{SCREEN[1]}+0+0')
+        app = BenchApp(root)
+        session_memory.install(app)
+        recorder = Recorder(mock)
+        recorder.close_step()
+        # Every later page needs a signed-in admin.
+        for name in ['login'] + [p for p in args.pages if p != 'login']:
+            print(f"Running {name}...")
+            SCENARIOS[name](app, recorder, args)
+        root.destroy()
+    finally:
+        if xvfb is not None:
+            xvfb.terminate()
+        mock.stop()
+
+    results = {
+        'benchmark': 'page_timings',
+        'commit': git_commit(),
+        'created': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'params': {k: v for k, v in vars(args).items() if k not in ('output', 'compare', 'data')},
+        'setup': setup,
+        'steps': recorder.results(),
+        'backend': mock.snapshot(),
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    previous = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            previous = json.load(f)['steps']
+    print_table(results['steps'], previous)
+    print(f"\nSetup: {setup}\nWrote {args.output}")
+    if not args.data:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+benchmarks/record_memory.py - Memory of Stress Records as Dicts vs Columns
+Builds N synthetic stress_records and compares the traced allocation of a
+list of response dicts with a StressRecordBatch parsed from the same JSON.
+
+    python benchmarks/record_memory.py --records 1000000
+"""
+
+import argparse
+import gc
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from records import StressRecordBatch  # noqa: E402
+
+
+def synthetic_json(n, users=500):
+    start = datetime(2026, 1, 1)
+    levels, emotions = ('Low', 'Moderate', 'High'), ('Neutral', 'Happy', 'Sad', 'Angry', 'Fear')
+    return json.dumps([{
+        'id': i,
+        'user_id': random.randrange(users),
+        'created_at': (start + timedelta(seconds=i * 30)).isoformat(),
+        'avg_stress_score': round(random.random(), 4),
+        'stress_level': random.choice(levels),
+        'dominant_emotion': random.choice(emotions),
+    } for i in range(n)])
+
+
+def measure(label, build):
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = build()
+    elapsed = time.perf_counter() - started
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<26}{current / 1e6:>9.1f} MB held{peak / 1e6:>9.1f} MB peak{elapsed:>8.2f} s")
+    return result, current
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare record memory: dicts vs StressRecordBatch.")
+    parser.add_argument('--records', type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    text = synthetic_json(args.records)
+    rows, dict_bytes = measure("list of dicts", lambda: json.loads(text))
+    del rows
+    batch, batch_bytes = measure("StressRecordBatch", lambda: StressRecordBatch.from_json(text))
+    print(f"{len(batch):,} records, {dict_bytes / max(batch_bytes, 1):.0f}x smaller")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+"""
+benchmarks/soak_test.py - Long-Session Memory Soak Test
+Runs the app's per-frame components (presence gate, tracked face mesh,
+blink rule, optional emotion inference, session buffers, periodic chart
+pages) against a recorded video, looping it for hours, and samples process
+RSS. Fails (exit code 1) if RSS keeps growing after the warm-up period.
+Synthetic frames contain no face, so without --video the tracker never
+hands a face to the blink, emotion and buffer stages; pass a recorded
+session for a meaningful result.
+
+    python benchmarks/soak_test.py --video shift.mp4 --hours 8
+    python benchmarks/soak_test.py --hours 0.5 --fps 0 --ui   # synthetic frames, Tk pages
+"""
+
+import argparse
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cv2  # noqa: E402
+from session_memory import SessionBuffers, track_figure, dispose_page  # noqa: E402
+from presence_gate import PresenceGate  # noqa: E402
+from landmark_tracker import LandmarkTracker, BlinkCounter, mediapipe_detector  # noqa: E402
+from config import LANDMARK_DETECT_EVERY  # noqa: E402
+
+
+def rss_mb():
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / 1e6
+    except ImportError:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1e6
+
+
+class FrameSource:
+    """A video file looped forever, or synthetic frames without one."""
+
+    def __init__(self, path=None, size=(480, 640)):
+        self.capture = cv2.VideoCapture(path) if path else None
+        if self.capture is not None and not self.capture.isOpened():
+            raise SystemExit(f"Cannot open video: {path}")
+        self.rng = np.random.default_rng(3)
+        self.size = size
+        self.frames = 0
+
+    def read(self):
+        self.frames += 1
+        if self.capture is None:
+            return self.rng.integers(0, 256, (*self.size, 3), dtype=np.uint8)
+        ok, frame = self.capture.read()
+        if not ok:
+            self.capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ok, frame = self.capture.read()
+        return frame
+
+
+def build_pipeline(use_emotion, every=LANDMARK_DETECT_EVERY):
+    """Per-frame step: presence gate, LandmarkTracker (face mesh every
+    `every` frames), BlinkCounter and, with use_emotion, the emotion model on
+    the face ROI. Without it the stress score is recorded as 0."""
+    gate = PresenceGate()
+    tracker = LandmarkTracker(mediapipe_detector(), every=every)
+    blinks = BlinkCounter()
+    classifier = neutral = None
+    if use_emotion:
+        from emotion_backend import get_emotion_classifier, EMOTION_LABELS
+        classifier = get_emotion_classifier()
+        neutral = EMOTION_LABELS.index('Neutral')
+
+    def process(frame, session, now):
+        if not gate.admit(frame):
+            return
+        face = tracker.update(frame)
+        gate.report(face is not None)
+        ear = face.ear if face is not None else None
+        if blinks.update(ear):
+            session.blinks.add(now)
+        if face is None:
+            return
+        session.ear.append(now, ear)
+        emotion, score = 'Neutral', 0.0
+        x, y, w, h = face.roi
+        crop = frame[max(y, 0):y + h, max(x, 0):x + w]
+        if classifier is not None and crop.size:
+            emotion, probabilities = classifier.classify_one(crop)
+            score = 1.0 - float(probabilities[neutral])
+        session.emotions.add(now, emotion)
+        session.stress.append(now, score)
+
+    return process
+
+
+def render_page(root, session):
+    """One dashboard visit: a Tk page with a chart, torn down on the next visit."""
+    from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+    from matplotlib.figure import Figure
+    import tkinter as tk
+
+    dispose_page()
+    for widget in root.winfo_children():
+        widget.destroy()
+    frame = tk.Frame(root)
+    frame.pack(fill='both', expand=True)
+    times, values = session.stress.series()
+    fig = Figure(figsize=(6, 3))
+    fig.add_subplot(111).plot(times - times[0] if len(times) else times, values)
+    canvas = track_figure(FigureCanvasTkAgg(fig, frame))
+    canvas.draw()
+    canvas.get_tk_widget().pack(fill='both', expand=True)
+    root.update()
+
+
+def render_offscreen(session):
+    """Headless stand-in for a dashboard visit."""
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=(6, 3))
+    times, values = session.stress.series()
+    fig.add_subplot(111).plot(times, values)
+    FigureCanvasAgg(fig).draw()
+    fig.clear()
+
+
+def growth_mb(samples, warmup):
+    """Least-squares RSS growth (MB) over the post-warm-up part of the run."""
+    points = [(t, rss) for t, rss in samples if t >= warmup]
+    if len(points) < 3:
+        return 0.0
+    t = np.array([p[0] for p in points])
+    rss = np.array([p[1] for p in points])
+    slope = np.polyfit(t, rss, 1)[0]
+    return float(slope * (t[-1] - t[0]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Soak-test memory over a long monitoring session.")
+    parser.add_argument('--video', help="recorded session to loop (synthetic frames if omitted)")
+    parser.add_argument('--hours', type=float, default=8.0)
+    parser.add_argument('--fps', type=float, default=30.0, help="frame rate to replay at; 0 = as fast as possible")
+    parser.add_argument('--emotion', action='store_true', help="run emotion inference on the face crop")
+    parser.add_argument('--every', type=int, default=LANDMARK_DETECT_EVERY, help="face mesh on every Nth frame")
+    parser.add_argument('--ui', action='store_true', help="build real Tk pages (needs a display)")
+    parser.add_argument('--page-seconds', type=float, default=60.0, help="interval between dashboard visits")
+    parser.add_argument('--sample-seconds', type=float, default=30.0)
+    parser.add_argument('--warmup-minutes', type=float, default=10.0)
+    parser.add_argument('--max-growth-mb', type=float, default=20.0)
+    args = parser.parse_args()
+
+    source = FrameSource(args.video)
+    session = SessionBuffers()
+    process = build_pipeline(args.emotion, args.every)
+    root = None
+    if args.ui:
+        import tkinter as tk
+        root = tk.Tk()
+
+    duration = args.hours * 3600
+    warmup = min(args.warmup_minutes * 60, duration / 4)
+    frame_time = 1.0 / args.fps if args.fps else 0.0
+    started = time.monotonic()
+    next_page = next_sample = 0.0
+    samples = []
+    while True:
+        elapsed = time.monotonic() - started
+        if elapsed >= duration:
+            break
+        process(source.read(), session, time.time())
+        if elapsed >= next_page:
+            render_page(root, session) if root is not None else render_offscreen(session)
+            next_page = elapsed + args.page_seconds
+        if elapsed >= next_sample:
+            samples.append((elapsed, rss_mb()))
+            print(f"{elapsed / 60:>7.1f} min  {source.frames:>10,} frames  {samples[-1][1]:>8.1f} MB RSS  "
+                  f"history {len(session.stress)} pts / {session.stress.compactions} compactions", flush=True)
+            next_sample = elapsed + args.sample_seconds
+        if frame_time:
+            time.sleep(max(0.0, frame_time - (time.monotonic() - started - elapsed)))
+
+    growth = growth_mb(samples, warmup)
+    print(f"RSS growth after warm-up: {growth:+.1f} MB (limit {args.max_growth_mb} MB)")
+    if growth > args.max_growth_mb:
+        print("❌ Memory is not flat")
+        sys.exit(1)
+    print("✅ Memory stayed flat")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""
+benchmarks/synthetic_data.py - Synthetic user1 / admins / stress_records
+Writes a SQLite database in the layout mock_postgrest.py serves: 1k-100k
+users across departments and 10k-10M stress samples over the last --days.
+Samples follow office hours (weekday mornings to early evening), each user
+has a baseline stress level with a department offset and an afternoon /
+early-week bump, and dominant_emotion is drawn from a distribution that
+shifts from Neutral/Happy towards Sad/Angry/Fear as stress rises.
+
+    python benchmarks/synthetic_data.py --users 10000 --records 1000000 --out bench_data.db
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import time
+from datetime import datetime, timezone
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from emotion_backend import EMOTION_LABELS  # noqa: E402
+from rollups import HIGH_STRESS_SCORE  # noqa: E402
+from time_buckets import now as zone_now  # noqa: E402
+
+
+CHUNK = 200_000
+MEDIUM_STRESS_SCORE = 0.4
+USER_PASSWORD = 'password'
+ADMIN_EMAIL, ADMIN_PASSWORD = 'admin@example.com', 'admin'
+
+# (name, share of employees, stress offset)
+DEPARTMENTS = (('Engineering', 0.30, 0.00), ('Sales', 0.18, 0.08), ('Support', 0.16, 0.10),
+               ('Finance', 0.10, 0.05), ('Marketing', 0.10, -0.02), ('Operations', 0.10, 0.04),
+               ('HR', 0.06, -0.05))
+FIRST_NAMES = ('Alex', 'Sam', 'Jordan', 'Taylor', 'Morgan', 'Casey', 'Riley', 'Jamie', 'Avery', 'Quinn',
+               'Priya', 'Wei', 'Fatima', 'Mateo', 'Olga', 'Kwame', 'Yuki', 'Lena', 'Omar', 'Ines')
+LAST_NAMES = ('Smith', 'Garcia', 'Chen', 'Okafor', 'Novak', 'Kim', 'Patel', 'Silva', 'Müller', 'Haddad',
+              'Johansson', 'Nguyen', 'Rossi', 'Kowalski', 'Tanaka', 'Mensah', 'Dubois', 'Ivanova')
+
+# Share of each EMOTION_LABELS entry for a calm and for a highly stressed sample.
+CALM_EMOTIONS = (0.58, 0.22, 0.06, 0.05, 0.03, 0.02, 0.02, 0.02)
+STRESSED_EMOTIONS = (0.34, 0.04, 0.06, 0.18, 0.18, 0.06, 0.10, 0.04)
+# Share of samples per local hour (office hours, lunch dip) and per weekday.
+HOUR_WEIGHTS = np.array([0, 0, 0, 0, 0, 0, 1, 3, 8, 12, 12, 11, 7, 10, 12, 12, 10, 7, 4, 2, 1, 1, 0, 0], float)
+WEEKDAY_WEIGHTS = np.array([1.0, 1.0, 1.0, 1.0, 0.9, 0.08, 0.04])
+
+SCHEMA = (
+    'CREATE TABLE user1 (id INTEGER PRIMARY KEY, first_name TEXT, last_name TEXT, email TEXT, phone TEXT, '
+    'password TEXT, role TEXT, department TEXT, status TEXT, stress_events INTEGER, last_active TEXT, '
+    'created_at TEXT, updated_at TEXT)',
+    'CREATE TABLE admins (id INTEGER PRIMARY KEY, name TEXT, email TEXT, password TEXT, number TEXT, bio TEXT, '
+    'created_at TEXT, updated_at TEXT)',
+    'CREATE TABLE stress_records (id INTEGER PRIMARY KEY, user_id INTEGER, created_at TEXT, '
+    'avg_stress_score REAL, stress_level TEXT, dominant_emotion TEXT)',
+)
+INDEXES = (
+    'CREATE INDEX idx_user1_email ON user1 (email)',
+    'CREATE INDEX idx_admins_email ON admins (email)',
+    'CREATE INDEX idx_stress_records_created_at ON stress_records (created_at, id)',
+    'CREATE INDEX idx_stress_records_user_id ON stress_records (user_id, created_at)',
+)
+
+
+def stamp(epoch_us):
+    """Fixed-width UTC ISO strings (as PostgREST returns timestamptz), so
+    text comparison orders them correctly."""
+    text = np.datetime_as_string(np.asarray(epoch_us).astype('datetime64[us]'), unit='us')
+    return np.char.add(text, '+00:00')
+
+
+def user_rows(rng, n, now):
+    departments = rng.choice(len(DEPARTMENTS), n, p=[d[1] for d in DEPARTMENTS])
+    created = stamp(int(now.timestamp() * 1e6) - rng.integers(30, 3 * 365, n) * 86_400_000_000)
+    for i in range(n):
+        first, last = FIRST_NAMES[i % len(FIRST_NAMES)], LAST_NAMES[(i // len(FIRST_NAMES)) % len(LAST_NAMES)]
+        yield (i + 1, first, last, f'{first.lower()}.{i + 1}@example.com', f'+1-555-{i % 10000:04d}',
+               USER_PASSWORD, 'Admin' if i % 97 == 0 else 'User', DEPARTMENTS[departments[i]][0],
+               'Inactive' if i % 23 == 0 else 'Active', 0, None, str(created[i]), None), departments[i]
+
+
+def record_chunks(rng, count, departments, days, now):
+    """Yield lists of stress_records tuples, CHUNK at a time."""
+    users = len(departments)
+    # Some people run the monitor all day, others rarely.
+    activity = rng.lognormal(0, 1, users)
+    activity /= activity.sum()
+    baseline = rng.beta(2.2, 4.0, users) + np.array([DEPARTMENTS[d][2] for d in departments])
+    calm, stressed = np.array(CALM_EMOTIONS), np.array(STRESSED_EMOTIONS)
+
+    end_day = np.datetime64(now.date(), 'D')
+    start_day = end_day - np.timedelta64(days - 1, 'D')
+    calendar = np.arange(start_day, end_day + 1)
+    day_weights = WEEKDAY_WEIGHTS[(calendar.view('int64') - 4) % 7]  # 1970-01-01 was a Thursday
+    day_weights /= day_weights.sum()
+    hour_weights = HOUR_WEIGHTS / HOUR_WEIGHTS.sum()
+    # Office hours are local to DISPLAY_TIMEZONE; stored stamps are UTC.
+    utc_offset_us = int(zone_now().utcoffset().total_seconds() * 1e6)
+
+    next_id = 1
+    for start in range(0, count, CHUNK):
+        n = min(CHUNK, count - start)
+        user = rng.choice(users, n, p=activity)
+        day = rng.choice(len(calendar), n, p=day_weights)
+        hour = rng.choice(24, n, p=hour_weights)
+        micros = (calendar[day].astype('datetime64[us]').view('int64') - utc_offset_us
+                  + hour * 3_600_000_000 + rng.integers(0, 3_600_000_000, n))
+        weekday = (calendar[day].view('int64') - 4) % 7
+        score = (baseline[user] + 0.06 * (hour >= 14) + 0.04 * (weekday <= 1)
+                 + rng.normal(0, 0.12, n)).clip(0, 1).round(4)
+        level = np.where(score >= HIGH_STRESS_SCORE, 'High', np.where(score >= MEDIUM_STRESS_SCORE, 'Medium', 'Low'))
+        # Inverse-CDF draw from the calm/stressed mix for each sample.
+        mix = calm + np.outer(score, stressed - calm)
+        emotion = (rng.random((n, 1)) > np.cumsum(mix, axis=1)).sum(axis=1).clip(0, len(EMOTION_LABELS) - 1)
+        labels = np.array(EMOTION_LABELS)[emotion]
+        ids = np.arange(next_id, next_id + n)
+        next_id += n
+        yield list(zip(ids.tolist(), (user + 1).tolist(), stamp(micros).tolist(), score.tolist(),
+                       level.tolist(), labels.tolist()))
+
+
+def generate(path, users=1000, records=100_000, days=90, admins=3, seed=0):
+    """(Re)create the database at path; returns seconds taken."""
+    started = time.perf_counter()
+    if os.path.exists(path):
+        os.remove(path)
+    rng = np.random.default_rng(seed)
+    now = datetime.now(timezone.utc)
+    conn = sqlite3.connect(path)
+    conn.execute('PRAGMA journal_mode=OFF')
+    conn.execute('PRAGMA synchronous=OFF')
+    for statement in SCHEMA:
+        conn.execute(statement)
+
+    rows, departments = zip(*user_rows(rng, users, now))
+    conn.executemany(f"INSERT INTO user1 VALUES ({', '.join('?' * 13)})", rows)
+    created = now.isoformat()
+    conn.executemany('INSERT INTO admins VALUES (?, ?, ?, ?, ?, ?, ?, ?)', [
+        (i + 1, f'Admin {i + 1}', ADMIN_EMAIL if i == 0 else f'admin{i + 1}@example.com', ADMIN_PASSWORD,
+         '', '', created, None) for i in range(admins)])
+
+    for chunk in record_chunks(rng, records, np.array(departments), days, now):
+        conn.executemany('INSERT INTO stress_records VALUES (?, ?, ?, ?, ?, ?)', chunk)
+    for statement in INDEXES:
+        conn.execute(statement)
+    # Mirror what the heartbeat service and the stress_records trigger keep current on user1.
+    conn.execute('CREATE TEMP TABLE activity (user_id INTEGER PRIMARY KEY, latest TEXT, events INTEGER)')
+    conn.execute(f'INSERT INTO activity SELECT user_id, MAX(created_at), SUM(avg_stress_score >= {HIGH_STRESS_SCORE}) '
+                 'FROM stress_records GROUP BY user_id')
+    conn.execute('UPDATE user1 SET last_active = a.latest, stress_events = a.events '
+                 'FROM activity a WHERE a.user_id = user1.id')
+    conn.commit()
+    conn.close()
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic Stress Monitor database.")
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--records', type=int, default=100_000)
+    parser.add_argument('--days', type=int, default=90)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', default='bench_data.db')
+    args = parser.parse_args()
+    seconds = generate(args.out, args.users, args.records, args.days, seed=args.seed)
+    print(f"{args.users:,} users, {args.records:,} records -> {args.out} in {seconds:.1f}s "
+          f"({os.path.getsize(args.out) / 1e6:.0f} MB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+benchmarks/wire_format.py - Sample Upload Size and Cost: JSON vs sample_codec
+Builds client-sized batches of stress samples (one user reporting every few
+seconds) and compares bytes per sample, client encode time and service
+decode time for the current JSON body, gzip'd JSON and the binary batch
+format with each compression.
+
+    python benchmarks/wire_format.py --batch 1 10 100 500
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import zlib
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sample_codec import encode_samples, decode_samples, zstandard  # noqa: E402
+from config import SAMPLE_SCORE_SCALE  # noqa: E402
+
+
+LEVELS = ('Low', 'Moderate', 'High')
+EMOTIONS = ('Neutral', 'Happiness', 'Surprise', 'Sadness', 'Anger', 'Disgust', 'Fear', 'Contempt')
+
+
+def make_batch(size, interval):
+    at = datetime(2026, 3, 2, 9, tzinfo=timezone.utc) + timedelta(microseconds=random.randrange(10 ** 6))
+    user_id = random.randrange(1, 5000)
+    batch = []
+    for _ in range(size):
+        score = min(1.0, max(0.0, random.gauss(0.45, 0.2)))
+        batch.append({
+            'user_id': user_id,
+            'created_at': at.isoformat(),
+            'avg_stress_score': score,
+            'stress_level': LEVELS[min(int(score * 3), 2)],
+            'dominant_emotion': random.choice(EMOTIONS),
+        })
+        at += timedelta(seconds=interval + random.uniform(-0.2, 0.2))
+    return batch
+
+
+def json_body(batch):
+    return json.dumps(batch, default=str).encode()
+
+
+FORMATS = [
+    ('json', json_body, json.loads),
+    ('json+zlib', lambda b: zlib.compress(json_body(b), 6), lambda d: json.loads(zlib.decompress(d))),
+    ('binary', lambda b: encode_samples(b, None), decode_samples),
+    ('binary+zlib', lambda b: encode_samples(b, 'zlib'), decode_samples),
+]
+if zstandard is not None:
+    FORMATS.append(('binary+zstd', lambda b: encode_samples(b, 'zstd'), decode_samples))
+
+
+def timed(fn, items, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        results = [fn(item) for item in items]
+        best = min(best, time.perf_counter() - started)
+    return results, best
+
+
+def check_round_trip(batch):
+    rows = decode_samples(encode_samples(batch))
+    for sent, got in zip(batch, rows):
+        assert got['user_id'] == sent['user_id'] and got['dominant_emotion'] == sent['dominant_emotion']
+        assert datetime.fromisoformat(got['created_at']) == datetime.fromisoformat(sent['created_at'])
+        assert abs(got['avg_stress_score'] - sent['avg_stress_score']) <= 0.5 / SAMPLE_SCORE_SCALE + 1e-12
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare sample upload encodings.")
+    parser.add_argument('--batch', type=int, nargs='+', default=[1, 10, 100, 500], help="samples per request")
+    parser.add_argument('--samples', type=int, default=50_000, help="samples encoded per batch size")
+    parser.add_argument('--interval', type=float, default=5.0, help="seconds between a client's samples")
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    if zstandard is None:
+        print("zstandard not installed: skipping binary+zstd (pip install zstandard)")
+    for size in args.batch:
+        batches = [make_batch(size, args.interval) for _ in range(max(args.samples // size, 1))]
+        samples = size * len(batches)
+        check_round_trip(batches[0])
+        print(f"\n{size} samples per request ({samples:,} samples)")
+        print(f"{'format':<14}{'bytes/sample':>13}{'vs json':>9}{'encode µs/sample':>18}{'decode µs/sample':>18}")
+        baseline = None
+        for name, encode, decode in FORMATS:
+            bodies, encode_seconds = timed(encode, batches, args.repeat)
+            _, decode_seconds = timed(decode, bodies, args.repeat)
+            per_sample = sum(map(len, bodies)) / samples
+            baseline = baseline or per_sample
+            print(f"{name:<14}{per_sample:>13.1f}{per_sample / baseline:>8.0%}"
+                  f"{encode_seconds / samples * 1e6:>18.2f}{decode_seconds / samples * 1e6:>18.2f}")
+
+
+if __name__ == "__main__":
+    main()
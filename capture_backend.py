@@ -0,0 +1,255 @@
+"""
+capture_backend.py - Tuned Camera Capture
+Opens the webcam through the platform's native API (V4L2, DirectShow,
+AVFoundation), negotiates MJPEG at a modest resolution with a one-frame
+driver buffer, and grabs/decodes on a dedicated thread so the monitoring
+loop always gets the freshest frame. Tracks delivered FPS and frame age,
+and validates the requested FPS against what the device really delivers.
+"""
+
+import sys
+import threading
+import time
+from collections import deque
+from config import FPS, CAMERA_INDEX, CAMERA_API, CAMERA_FOURCC, CAMERA_WIDTH, CAMERA_HEIGHT, CAMERA_BUFFER_SIZE
+from event_log import get_logger
+import instrumentation
+
+try:
+    import cv2
+except ImportError:  # pragma: no cover - listed in requirements.txt
+    cv2 = None
+
+
+RATE_WINDOW = 64  # frames used for the delivered-FPS estimate
+
+logger = get_logger('capture')
+
+
+def _api_preference(name):
+    if name == 'auto':
+        name = {'linux': 'v4l2', 'win32': 'dshow', 'darwin': 'avfoundation'}.get(sys.platform, 'any')
+    return {
+        'v4l2': cv2.CAP_V4L2,
+        'dshow': cv2.CAP_DSHOW,
+        'msmf': cv2.CAP_MSMF,
+        'avfoundation': cv2.CAP_AVFOUNDATION,
+        'any': cv2.CAP_ANY,
+    }[name]
+
+
+def _fourcc_name(value):
+    value = int(value)
+    return ''.join(chr((value >> 8 * i) & 0xFF) for i in range(4)).strip('\x00') or '?'
+
+
+class CameraCapture:
+    """Drop-in for cv2.VideoCapture in the monitoring loop: read() returns
+    the newest decoded frame, never a stale one from the driver queue."""
+
+    def __init__(self, source=CAMERA_INDEX, fps=FPS, width=CAMERA_WIDTH, height=CAMERA_HEIGHT,
+                 fourcc=CAMERA_FOURCC, api=CAMERA_API, buffer_size=CAMERA_BUFFER_SIZE):
+        if cv2 is None:
+            raise RuntimeError("OpenCV is not installed")
+        self.source = source
+        self.requested = {'fps': fps, 'width': width, 'height': height, 'fourcc': fourcc}
+        self.negotiated = {}
+        self.api = api
+        self.buffer_size = buffer_size
+        self._capture = None
+        self._frame = None
+        self._stamp = 0.0
+        self._sequence = 0
+        self._read_sequence = 0
+        self._arrivals = deque(maxlen=RATE_WINDOW)
+        self._ages = deque(maxlen=RATE_WINDOW)
+        self._dropped = 0
+        self._cond = threading.Condition()
+        self._device_lock = threading.Lock()  # VideoCapture is not thread-safe
+        self._stop = threading.Event()
+        self._thread = None
+
+    # ---------- lifecycle ----------
+
+    def open(self):
+        if isinstance(self.source, int):
+            self._capture = cv2.VideoCapture(self.source, _api_preference(self.api))
+        else:
+            self._capture = cv2.VideoCapture(self.source)  # recorded video
+        if not self._capture.isOpened():
+            raise RuntimeError(f"Cannot open camera {self.source!r}")
+        self._negotiate()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='camera-capture', daemon=True)
+        self._thread.start()
+        return self
+
+    def _negotiate(self):
+        cap, wanted = self._capture, self.requested
+        # FOURCC first: many drivers only offer the larger sizes/rates once MJPEG is selected.
+        if wanted['fourcc']:
+            cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*wanted['fourcc']))
+        if wanted['width'] and wanted['height']:
+            cap.set(cv2.CAP_PROP_FRAME_WIDTH, wanted['width'])
+            cap.set(cv2.CAP_PROP_FRAME_HEIGHT, wanted['height'])
+        if wanted['fps']:
+            cap.set(cv2.CAP_PROP_FPS, wanted['fps'])
+        if self.buffer_size:
+            cap.set(cv2.CAP_PROP_BUFFERSIZE, self.buffer_size)
+        self.negotiated = {
+            'fourcc': _fourcc_name(cap.get(cv2.CAP_PROP_FOURCC)),
+            'width': int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            'height': int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+            'fps': cap.get(cv2.CAP_PROP_FPS) or None,
+            'buffer_size': int(cap.get(cv2.CAP_PROP_BUFFERSIZE)) or None,
+            'backend': cap.getBackendName(),
+        }
+        if wanted['fourcc'] and self.negotiated['fourcc'] != wanted['fourcc']:
+            logger.warning("⚠️ Camera refused %s, using %s", wanted['fourcc'], self.negotiated['fourcc'])
+        logger.info("Camera %s via %s: %s %dx%d @ %s fps", self.source, self.negotiated['backend'],
+                    self.negotiated['fourcc'], self.negotiated['width'], self.negotiated['height'],
+                    self.negotiated['fps'])
+
+    def release(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
+        if self._capture is not None:
+            self._capture.release()
+            self._capture = None
+        with self._cond:
+            self._cond.notify_all()
+
+    def isOpened(self):
+        return self._capture is not None and self._thread is not None
+
+    # ---------- capture thread ----------
+
+    def _run(self):
+        cap = self._capture
+        # Recorded video replays at its own frame rate, like a live camera.
+        interval = 0.0 if isinstance(self.source, int) else 1.0 / (self.negotiated['fps'] or FPS)
+        due = time.monotonic()
+        while not self._stop.is_set():
+            if interval:
+                due += interval
+                time.sleep(max(0.0, due - time.monotonic()))
+            with self._device_lock, instrumentation.stage(instrumentation.STAGE_CAPTURE):
+                ok = cap.grab()  # dequeue from the driver
+                frame = cap.retrieve()[1] if ok else None  # MJPEG decode happens here
+                if frame is None and not isinstance(self.source, int):
+                    cap.set(cv2.CAP_PROP_POS_FRAMES, 0)  # loop recorded video
+            if frame is None:
+                if isinstance(self.source, int):
+                    time.sleep(0.01)
+                continue
+            now = time.monotonic()
+            with self._cond:
+                if self._sequence > self._read_sequence:
+                    self._dropped += 1
+                self._frame, self._stamp = frame, now
+                self._sequence += 1
+                self._arrivals.append(now)
+                self._cond.notify_all()
+
+    # ---------- consumer side ----------
+
+    def read(self, timeout=1.0):
+        """(ok, frame) with a frame the caller has not seen yet.
+
+        Waits up to `timeout` for the next one, like VideoCapture.read().
+        """
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self._sequence == self._read_sequence or self._stop.is_set():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or self._stop.is_set():
+                    return False, None
+                self._cond.wait(remaining)
+            self._read_sequence = self._sequence
+            frame, age = self._frame, time.monotonic() - self._stamp
+        self._ages.append(age)
+        instrumentation.record('capture_age', age)
+        return True, frame
+
+    def set(self, prop, value):
+        """Pass-through so PresenceGate can lower/raise the camera rate."""
+        if prop == cv2.CAP_PROP_FPS:
+            self.requested['fps'] = value
+            self._arrivals.clear()
+        with self._device_lock:
+            return self._capture.set(prop, value) if self._capture is not None else False
+
+    def get(self, prop):
+        with self._device_lock:
+            return self._capture.get(prop) if self._capture is not None else 0.0
+
+    # ---------- measurements ----------
+
+    @property
+    def delivered_fps(self):
+        """Frames per second actually arriving from the device (None until measured)."""
+        arrivals = list(self._arrivals)
+        if len(arrivals) < 8:
+            return None
+        return (len(arrivals) - 1) / (arrivals[-1] - arrivals[0])
+
+    @property
+    def fps(self):
+        """The rate the loop should pace itself to: the requested FPS, capped
+        by what the device negotiated and what it has actually delivered."""
+        rates = [r for r in (self.requested['fps'], self.negotiated.get('fps'), self.delivered_fps) if r]
+        return min(rates) if rates else FPS
+
+    def validate_fps(self, settle=2.0):
+        """Wait up to `settle` seconds for a rate measurement, warn if the
+        device falls short of the requested FPS, and return the usable rate."""
+        deadline = time.monotonic() + settle
+        while self.delivered_fps is None and time.monotonic() < deadline:
+            time.sleep(0.05)
+        delivered, wanted = self.delivered_fps, self.requested['fps']
+        if delivered is not None and wanted and delivered < wanted * 0.9:
+            logger.warning("⚠️ Camera delivers %.1f fps, below the requested %s; pacing to %.1f",
+                           delivered, wanted, delivered)
+        return self.fps
+
+    def stats(self):
+        ages = sorted(self._ages)
+        return {
+            **{f'negotiated_{k}': v for k, v in self.negotiated.items()},
+            'requested_fps': self.requested['fps'],
+            'delivered_fps': self.delivered_fps,
+            'latency_ms': sum(ages) / len(ages) * 1000 if ages else None,
+            'latency_p95_ms': ages[int(len(ages) * 0.95)] * 1000 if ages else None,
+            'frames': self._sequence,
+            'dropped': self._dropped,
+        }
+
+
+def main():
+    """Probe a camera: print what was negotiated and what it delivers."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Probe the camera capture settings.")
+    parser.add_argument('--source', default=str(CAMERA_INDEX), help="camera index or video file")
+    parser.add_argument('--fps', type=float, default=FPS)
+    parser.add_argument('--fourcc', default=CAMERA_FOURCC)
+    parser.add_argument('--seconds', type=float, default=5.0)
+    args = parser.parse_args()
+
+    source = int(args.source) if args.source.isdigit() else args.source
+    capture = CameraCapture(source, fps=args.fps, fourcc=args.fourcc or None).open()
+    try:
+        capture.validate_fps()
+        deadline = time.monotonic() + args.seconds
+        while time.monotonic() < deadline:
+            capture.read()
+        for key, value in capture.stats().items():
+            print(f"{key:<24}{value:.2f}" if isinstance(value, float) else f"{key:<24}{value}")
+    finally:
+        capture.release()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+chart_cache.py - Rendered Chart Bitmap Cache
+Charts are drawn with the Agg backend off the UI thread into PNG bytes and
+cached in memory and on disk, keyed by a fingerprint of the aggregated data
+they plot and the pixel size they are drawn at. Both tiers are LRU with a
+byte cap.
+"""
+
+import hashlib
+import io
+import json
+import os
+import threading
+from collections import OrderedDict
+from config import CHART_CACHE_DIR, CHART_CACHE_MEMORY_BYTES, CHART_CACHE_DISK_BYTES
+from event_log import get_logger
+import instrumentation
+
+
+# Bump when chart styling changes so old bitmaps are not shown.
+STYLE_VERSION = 1
+
+logger = get_logger('chart_cache')
+
+
+def fingerprint(kind, data, size):
+    """Cache key for one chart: kind, its input data and its (width, height)."""
+    payload = json.dumps([STYLE_VERSION, kind, data, list(size)], sort_keys=True, default=str)
+    return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+
+@instrumentation.timed('chart.render_png')
+def render_png(draw, size, dpi=100):
+    """Draw into a fresh Agg figure of `size` pixels and return PNG bytes.
+
+    Agg figures are independent objects, so this is safe off the Tk thread.
+    """
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    width, height = size
+    fig = Figure(figsize=(width / dpi, height / dpi), dpi=dpi)
+    draw(fig)
+    buffer = io.BytesIO()
+    FigureCanvasAgg(fig).print_png(buffer)
+    fig.clear()
+    return buffer.getvalue()
+
+
+class ChartCache:
+    """PNG bytes by fingerprint: an in-memory LRU in front of a disk LRU."""
+
+    def __init__(self, folder=CHART_CACHE_DIR, memory_bytes=CHART_CACHE_MEMORY_BYTES,
+                 disk_bytes=CHART_CACHE_DISK_BYTES):
+        self.folder = folder
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self.stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0}
+        self._memory = OrderedDict()
+        self._memory_used = 0
+        self._lock = threading.Lock()
+        os.makedirs(folder, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.folder, f'{key}.png')
+
+    def get(self, key):
+        with self._lock:
+            png = self._memory.get(key)
+            if png is not None:
+                self._memory.move_to_end(key)
+                self.stats['memory_hits'] += 1
+                return png
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                png = f.read()
+            os.utime(path)  # mtime doubles as the disk tier's last-used time
+        except OSError:
+            self.stats['misses'] += 1
+            return None
+        self.stats['disk_hits'] += 1
+        self._remember(key, png)
+        return png
+
+    def put(self, key, png):
+        self._remember(key, png)
+        try:
+            tmp = self._path(key) + '.tmp'
+            with open(tmp, 'wb') as f:
+                f.write(png)
+            os.replace(tmp, self._path(key))
+            self._trim_disk()
+        except OSError as e:
+            logger.warning("⚠️ Could not write chart cache entry: %s", e)
+
+    def _remember(self, key, png):
+        with self._lock:
+            old = self._memory.pop(key, None)
+            if old is not None:
+                self._memory_used -= len(old)
+            self._memory[key] = png
+            self._memory_used += len(png)
+            while self._memory_used > self.memory_bytes and len(self._memory) > 1:
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_used -= len(evicted)
+
+    def _trim_disk(self):
+        entries = []
+        for entry in os.scandir(self.folder):
+            if entry.name.endswith('.png'):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.disk_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._memory_used = 0
+        for entry in os.scandir(self.folder):
+            if entry.name.endswith('.png'):
+                os.remove(entry.path)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_chart_cache():
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ChartCache()
+    return _cache
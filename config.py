@@ -15,6 +15,7 @@ COLORS = {
     'accent_green': '#22c55e',
     'accent_red': '#ef4444',
     'accent_purple': '#7c3aed',
+    'accent_orange': '#f97316',
     'border': '#475569'
 }
 
@@ -23,13 +24,28 @@ LEFT_EYE = [362, 385, 387, 263, 373, 380]
 RIGHT_EYE = [33, 160, 158, 133, 153, 144]
 EAR_THRESHOLD = 0.25
 CONSEC_FRAMES = 3
+LANDMARK_DETECT_EVERY = 4  # full face mesh on every Nth frame, optical flow in between
+LANDMARK_MIN_CONFIDENCE = 0.7  # share of anchor points that must track cleanly
+LANDMARK_MAX_FB_ERROR = 1.0  # forward-backward flow error (px) for a point to count
+LANDMARK_EYE_CHANGE = 12.0  # mean gray-level change in the eye patches that forces a re-detect
 
 # Calibration Settings
 CALIBRATION_DURATION = 10  # seconds
 
 # Stress Detection Settings
 STRESS_ALERT_THRESHOLD = 0.9  # 90%
-FPS = 32
+FPS = 32  # requested camera rate; capped at what the device actually delivers
+
+# Camera Capture
+CAMERA_INDEX = 0
+CAMERA_API = "auto"  # "v4l2", "dshow", "msmf", "avfoundation", "any"; auto picks the native one
+CAMERA_FOURCC = "MJPG"  # compressed transfer; None keeps the driver default (often raw YUYV)
+CAMERA_WIDTH = 640  # the face mesh gains nothing from more pixels
+CAMERA_HEIGHT = 480
+CAMERA_BUFFER_SIZE = 1  # driver queue depth: 1 = always the freshest frame
+
+# Time Zone
+DISPLAY_TIMEZONE = "Asia/Colombo"  # charts, rollups and reports bucket days/hours here
 
 # Window Settings
 WINDOW_WIDTH = 1400
@@ -38,7 +54,108 @@ WINDOW_TITLE = "Stress Monitor v1.0"
 
 # Activity Timeout
 ACTIVITY_TIMEOUT = 5  # seconds
+ACTIVITY_WINDOW_SECONDS = 300  # per-second input bins kept for the activity signals
+ACTIVITY_RING_SIZE = 1 << 14  # raw events buffered per listener between aggregator passes
+ACTIVITY_STRESS_WEIGHT = 0.2  # share of the stress score taken from keyboard/mouse signals
+
+# Presence Gate
+PRESENCE_GATE = True  # idle the face mesh while nobody is at the desk
+IDLE_FPS = 2  # camera rate after ACTIVITY_TIMEOUT without a face
+PRESENCE_DIFF_SIZE = (80, 60)  # grayscale frame size used for motion differencing
+PRESENCE_PIXEL_DELTA = 20  # per-pixel change (0-255) that counts as motion
+PRESENCE_MOTION_RATIO = 0.01  # share of changed pixels that wakes the pipeline
+PRESENCE_FACE_CHECK_SECONDS = 2.0  # Haar face check interval while idle and still
+
+# Charts
+CHART_DOWNSAMPLE = "lttb"  # "lttb" keeps line shape, "minmax" keeps every peak
+CHART_LABEL_MAX_POINTS = 31  # per-point markers and value labels only up to this many points
+HISTORY_DAYS = 365  # span of the per-user history view; also how far back a new replica pulls records
+HEATMAP_DAYS = 91  # department x weekday/hour heatmap covers the last quarter
+HEATMAP_REFRESH_MS = 5000  # how often the dashboard checks the heatmap for synced records
+CHART_CACHE_DIR = "chart_cache"  # rendered dashboard chart bitmaps, keyed by data + size
+CHART_CACHE_MEMORY_BYTES = 32 * 1024 * 1024  # in-memory LRU cap
+CHART_CACHE_DISK_BYTES = 200 * 1024 * 1024  # on-disk LRU cap
 
 # Report Settings
 REPORTS_FOLDER = "reports"
-LOG_FILE = "blink_log.txt"
\ No newline at end of file
+REPORT_WORKERS = None  # process pool size, None = one per CPU
+REPORT_CHUNK_SIZE = 25  # employees per worker task
+
+# Data Export
+EXPORT_FOLDER = "exports"
+EXPORT_PAGE_SIZE = 5000  # rows per keyset page read from Supabase or the replica
+EXPORT_PART_ROWS = 1_000_000  # rows per CSV/Parquet part file; resume restarts the open part
+
+# Long Sessions
+LONG_SESSION_MODE = True  # dispose figures/images on page change, bounded per-frame history
+SESSION_HISTORY_POINTS = 4096  # stress/EAR samples kept; older history is downsampled to fit
+SESSION_EVENT_CAPACITY = 8192  # recent blink/emotion events kept (totals are exact)
+
+# Signal Recording
+RECORD_SIGNALS = False  # append per-frame landmarks/EAR/emotions/stress for later re-scoring
+RECORDINGS_FOLDER = "recordings"
+RECORD_BLOCK_FRAMES = 256  # frames buffered in memory before a block is queued for disk
+RECORD_FLUSH_SECONDS = 2.0  # partial blocks are written at least this often
+
+# Event Log Settings
+LOG_FILE = "blink_log.jsonl"  # line-delimited JSON, rotated into gzip segments
+LOG_LEVEL = "INFO"
+LOG_CONSOLE_LEVEL = "WARNING"  # None turns console output off
+LOG_MAX_BYTES = 5 * 1024 * 1024  # rotate when the live file reaches this size
+LOG_ROTATE_SECONDS = 3600  # ...or when it is this old
+LOG_BACKUP_COUNT = 48  # compressed segments kept on disk
+
+# Offline-First Local Replica
+OFFLINE_MODE = True  # read from the local SQLite replica, replicate writes in background
+LOCAL_DB_PATH = "local_cache.db"
+SYNC_INTERVAL = 15  # seconds between background sync rounds
+SYNC_PAGE_SIZE = 500  # rows per Supabase request while syncing
+
+
+# Performance Instrumentation
+PERF_ENABLED = False  # per-stage timers; no-ops when off
+PERF_OVERLAY = False  # show the timing card on the user dashboard (turns the timers on)
+PERF_DUMP_FILE = "perf_dump.jsonl"
+PERF_DUMP_INTERVAL = 60  # seconds between snapshot lines
+
+# Real-Time Stress Alerts
+ALERT_SUSTAIN_SECONDS = 60  # score must stay at/above STRESS_ALERT_THRESHOLD this long
+ALERT_HYSTERESIS = 0.1  # alert clears only once the score drops below threshold minus this
+ALERT_MAX_GAP_SECONDS = 600  # samples further apart than this do not count as sustained
+ALERT_REALTIME = True  # subscribe to Supabase Realtime inserts; False relies on sync pulls only
+
+# User Heartbeats
+HEARTBEAT_FLUSH_SECONDS = 30  # coalesced last_active writes to user1 (stress_events is counted by a server trigger)
+HEARTBEAT_BATCH_SIZE = 500  # users per apply_user_heartbeats call
+
+# Ingestion Service
+INGEST_HOST = "127.0.0.1"  # loopback only; bind a LAN address to accept other desktops
+INGEST_PORT = 8765
+INGEST_SERVICE_URL = None  # e.g. "http://10.0.0.5:8765"; clients then send stress_records there
+INGEST_TOKENS = {}  # token -> client name accepted by the service; it will not start without one
+INGEST_CLIENT_TOKEN = None  # this desktop's token, sent as "Authorization: Bearer <token>"
+INGEST_BATCH_SIZE = 500  # rows per bulk insert
+INGEST_FLUSH_SECONDS = 1.0  # max wait before a partial batch is written
+INGEST_QUEUE_SIZE = 20000  # samples buffered before clients are told to back off
+INGEST_DEDUPE_WINDOW = 200000  # recent (user_id, created_at) keys remembered
+INGEST_ROLLUP_DAYS = 35  # history loaded into the in-memory rollups at start
+INGEST_WIRE_FORMAT = "binary"  # "binary" (sample_codec batches) or "json" for POST /samples
+INGEST_WIRE_COMPRESSION = "zstd"  # "zstd" (needs zstandard, else zlib), "zlib" or None
+SAMPLE_SCORE_SCALE = 1000  # avg_stress_score sent in steps of 1/this (at most 65534)
+
+# Analytics Service
+ANALYTICS_HOST = "127.0.0.1"  # loopback only; bind a LAN address to serve other desktops
+ANALYTICS_PORT = 8766
+ANALYTICS_TOKEN = None  # shared secret, sent as "Authorization: Bearer <token>"; the service will not start without it
+ANALYTICS_SERVICE_URL = None  # e.g. "http://10.0.0.5:8766"; with OFFLINE_MODE off, dashboards read from it
+ANALYTICS_CACHE_ENTRIES = 512  # rendered responses kept, one per distinct query
+ANALYTICS_WARM_SECONDS = 15  # how often the preset ranges are recomputed after the replica changes
+
+# Emotion Inference
+EMOTION_MODEL_PATH = "models/emotion-ferplus-8.onnx"  # FER+ model from the ONNX model zoo
+EMOTION_CACHE_DIR = "models/cache"  # quantized/converted copies, reused across runs
+EMOTION_BACKEND = "auto"  # "onnxruntime", "opencv" or "auto" (first one installed)
+EMOTION_QUANTIZE = True  # int8 dynamic quantization (onnxruntime only)
+EMOTION_THREADS = 2  # CPU threads for one forward pass
+EMOTION_BATCH_SIZE = 8  # face crops per forward pass
+EMOTION_BATCH_WAIT_MS = 15  # how long a partial batch waits for more crops
@@ -0,0 +1,69 @@
+"""
+downsample.py - Time-Series Reduction for Charts
+Cuts long series down to roughly one point per horizontal pixel before
+they reach matplotlib. LTTB (Largest-Triangle-Three-Buckets) keeps the
+visual shape of a line; min/max decimation keeps every peak and is the
+cheaper choice for very dense data.
+"""
+
+import numpy as np
+from config import CHART_DOWNSAMPLE
+
+
+def lttb(x, y, n_out):
+    """Indices of the n_out points LTTB keeps (always including both ends)."""
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    # Bucket edges for the n - 2 interior points; buckets differ in size by at most one.
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    # Mean of every bucket, for the "next bucket" vertex of the triangle.
+    counts = np.diff(edges)
+    mean_x = np.add.reduceat(x[1:n - 1], edges[:-1] - 1) / counts
+    mean_y = np.add.reduceat(y[1:n - 1], edges[:-1] - 1) / counts
+    mean_x = np.append(mean_x[1:], x[-1])
+    mean_y = np.append(mean_y[1:], y[-1])
+
+    keep = np.empty(n_out, np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        bx, by = x[lo:hi], y[lo:hi]
+        # Twice the triangle area (a, candidate, next-bucket mean); the sign does not matter.
+        area = np.abs((x[a] - mean_x[i]) * (by - y[a]) - (x[a] - bx) * (mean_y[i] - y[a]))
+        a = lo + int(area.argmax())
+        keep[i + 1] = a
+    return keep
+
+
+def minmax(x, y, n_out):
+    """Indices of each bucket's minimum and maximum, in time order."""
+    n = len(x)
+    buckets = max(n_out // 2, 1)
+    if n <= n_out or n < 2 * buckets:
+        return np.arange(n)
+    size = n // buckets
+    body = y[:buckets * size].reshape(buckets, size)
+    base = np.arange(buckets) * size
+    pair = np.stack([base + body.argmin(axis=1), base + body.argmax(axis=1)], axis=1)
+    pair.sort(axis=1)
+    keep = np.unique(np.concatenate([[0], pair.ravel(), np.arange(buckets * size, n)[-1:]]))
+    return keep
+
+
+METHODS = {'lttb': lttb, 'minmax': minmax}
+
+
+def fit_to_width(x, y, width_px, method=CHART_DOWNSAMPLE):
+    """(x, y) reduced to about width_px points, NaNs dropped. Short series
+    come back unchanged (as float arrays)."""
+    x = np.asarray(x, np.float64)
+    y = np.asarray(y, np.float64)
+    finite = np.isfinite(y)
+    if not finite.all():
+        x, y = x[finite], y[finite]
+    if len(x) <= width_px:
+        return x, y
+    keep = METHODS[method](x, y, int(width_px))
+    return x[keep], y[keep]
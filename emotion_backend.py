@@ -0,0 +1,286 @@
+"""
+emotion_backend.py - Batched CPU Emotion Inference
+Pluggable ONNX Runtime / OpenCV DNN backend for facial emotion
+classification. The model is converted once (dynamic batch dimension, int8
+dynamic quantization) and the result cached on disk; face crops from one or
+several capture streams are classified in shared forward passes through a
+preallocated input tensor.
+"""
+
+import concurrent.futures
+import hashlib
+import os
+import queue
+import threading
+import time
+import numpy as np
+from config import (EMOTION_MODEL_PATH, EMOTION_CACHE_DIR, EMOTION_BACKEND, EMOTION_QUANTIZE,
+                    EMOTION_THREADS, EMOTION_BATCH_SIZE, EMOTION_BATCH_WAIT_MS)
+from event_log import get_logger
+import instrumentation
+
+try:
+    import cv2
+except ImportError:  # pragma: no cover - listed in requirements.txt
+    cv2 = None
+
+
+# FER+ output order; the input is one 64x64 grayscale channel in 0..255.
+EMOTION_LABELS = ('Neutral', 'Happy', 'Surprise', 'Sad', 'Angry', 'Disgust', 'Fear', 'Contempt')
+INPUT_SIZE = 64
+
+logger = get_logger('emotion')
+
+
+# ---------- model conversion cache ----------
+
+def _file_digest(path):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()[:12]
+
+
+def _make_batch_dynamic(source, target):
+    """Rewrite a batch-1 model so the batch dimension is symbolic."""
+    import onnx
+    from onnx import numpy_helper
+
+    model = onnx.load(source)
+    for value in list(model.graph.input) + list(model.graph.output):
+        dims = value.type.tensor_type.shape.dim
+        if dims:
+            dims[0].ClearField('dim_value')
+            dims[0].dim_param = 'N'
+    # Flatten-style reshapes often hard-code the batch as 1; let it be inferred.
+    initializers = {init.name: init for init in model.graph.initializer}
+    for node in model.graph.node:
+        if node.op_type == 'Reshape' and len(node.input) > 1 and node.input[1] in initializers:
+            shape = numpy_helper.to_array(initializers[node.input[1]]).copy()
+            if shape.ndim == 1 and len(shape) > 1 and shape[0] == 1 and -1 not in shape[1:]:
+                shape[0] = -1
+                initializers[node.input[1]].CopyFrom(numpy_helper.from_array(shape, node.input[1]))
+    onnx.save(model, target)
+
+
+def prepare_model(model_path=EMOTION_MODEL_PATH, quantize=EMOTION_QUANTIZE, cache_dir=EMOTION_CACHE_DIR):
+    """Return the path of the converted model, building it on first use.
+
+    Cached files are keyed by the source model's hash, so replacing the model
+    invalidates them. Each step is skipped if its tool is not installed.
+    """
+    if not os.path.exists(model_path):
+        raise FileNotFoundError(f"Emotion model not found: {model_path}")
+    os.makedirs(cache_dir, exist_ok=True)
+    stem = f"{os.path.splitext(os.path.basename(model_path))[0]}.{_file_digest(model_path)}"
+    dynamic = os.path.join(cache_dir, f"{stem}.dyn.onnx")
+    quantized = os.path.join(cache_dir, f"{stem}.dyn.q8.onnx")
+
+    if quantize and os.path.exists(quantized):
+        return quantized
+    if not os.path.exists(dynamic):
+        try:
+            _make_batch_dynamic(model_path, dynamic)
+            logger.info("Cached batch-dynamic emotion model at %s", dynamic)
+        except ImportError:
+            dynamic = model_path
+        except Exception as e:
+            logger.warning("⚠️ Could not make the emotion model batch-dynamic: %s", e)
+            dynamic = model_path
+    if not quantize:
+        return dynamic
+    try:
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+        quantize_dynamic(dynamic, quantized, weight_type=QuantType.QUInt8)
+        logger.info("Cached int8 emotion model at %s", quantized)
+        return quantized
+    except ImportError:
+        return dynamic
+    except Exception as e:
+        logger.warning("⚠️ Emotion model quantization failed, using float weights: %s", e)
+        return dynamic
+
+
+# ---------- backends ----------
+
+class OnnxRuntimeBackend:
+    name = 'onnxruntime'
+    supports_quantized = True
+
+    def __init__(self, model_path, threads):
+        import onnxruntime as ort
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = threads
+        options.inter_op_num_threads = 1
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(model_path, options, providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def run(self, batch):
+        return self.session.run(None, {self.input_name: batch})[0]
+
+
+class OpenCVBackend:
+    name = 'opencv'
+    supports_quantized = False  # ConvInteger/MatMulInteger are not implemented by cv2.dnn
+
+    def __init__(self, model_path, threads):
+        if cv2 is None:
+            raise ImportError("opencv-python is not installed")
+        cv2.setNumThreads(threads)
+        self.net = cv2.dnn.readNetFromONNX(model_path)
+        self.net.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
+        self.net.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
+
+    def run(self, batch):
+        self.net.setInput(batch)
+        return self.net.forward()
+
+
+BACKENDS = {'onnxruntime': OnnxRuntimeBackend, 'opencv': OpenCVBackend}
+
+
+def load_backend(name=EMOTION_BACKEND, model_path=EMOTION_MODEL_PATH, threads=EMOTION_THREADS,
+                 quantize=EMOTION_QUANTIZE):
+    """Instantiate the named backend, or the first installed one for 'auto'."""
+    names = list(BACKENDS) if name == 'auto' else [name]
+    errors = []
+    for candidate in names:
+        backend_cls = BACKENDS[candidate]
+        try:
+            path = prepare_model(model_path, quantize and backend_cls.supports_quantized)
+            backend = backend_cls(path, threads)
+            logger.info("Emotion backend: %s (%s)", candidate, os.path.basename(path))
+            return backend
+        except ImportError as e:
+            errors.append(f"{candidate}: {e}")
+    raise ImportError(f"No emotion backend available ({'; '.join(errors)})")
+
+
+# ---------- classifier ----------
+
+class EmotionClassifier:
+    """Classifies lists of BGR or grayscale face crops in batches."""
+
+    def __init__(self, backend=None, batch_size=EMOTION_BATCH_SIZE):
+        self.backend = backend or load_backend()
+        self.batch_size = batch_size
+        # Reused for every call: no per-frame tensor allocations.
+        self._input = np.zeros((batch_size, 1, INPUT_SIZE, INPUT_SIZE), np.float32)
+        self._gray = np.empty((INPUT_SIZE, INPUT_SIZE), np.uint8)
+        self._lock = threading.Lock()
+        self.max_batch = self._probe_batch()
+
+    def _probe_batch(self):
+        """Largest batch the model accepts: batch_size, or 1 for fixed-batch models."""
+        if self.batch_size < 2:
+            return 1
+        try:
+            self.backend.run(self._input[:2])
+            return self.batch_size
+        except Exception as e:
+            logger.warning("⚠️ Emotion model only takes batch 1, running crops one by one: %s", e)
+            return 1
+
+    def _fill(self, i, crop):
+        gray = crop if crop.ndim == 2 else cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY)
+        cv2.resize(gray, (INPUT_SIZE, INPUT_SIZE), dst=self._gray, interpolation=cv2.INTER_AREA)
+        self._input[i, 0] = self._gray
+
+    def _forward(self, n):
+        if n <= self.max_batch:
+            return self.backend.run(self._input[:n])
+        return np.concatenate([self.backend.run(self._input[i:i + 1]) for i in range(n)])
+
+    @staticmethod
+    def _decode(scores):
+        scores = scores.reshape(len(scores), -1)
+        exp = np.exp(scores - scores.max(axis=1, keepdims=True))
+        probs = exp / exp.sum(axis=1, keepdims=True)
+        return [(EMOTION_LABELS[row.argmax()], row) for row in probs]
+
+    def classify(self, crops):
+        """Return [(label, probabilities)] for each crop, in order."""
+        results = []
+        with self._lock:
+            for start in range(0, len(crops), self.batch_size):
+                chunk = crops[start:start + self.batch_size]
+                for i, crop in enumerate(chunk):
+                    self._fill(i, crop)
+                with instrumentation.stage(instrumentation.STAGE_EMOTION):
+                    scores = self._forward(len(chunk))
+                results.extend(self._decode(scores))
+        instrumentation.count('emotion.crops', len(crops))
+        return results
+
+    def classify_one(self, crop):
+        return self.classify([crop])[0]
+
+
+class EmotionBatcher:
+    """Merges crops submitted from several capture threads into shared
+    forward passes; a partial batch waits at most `wait_ms`."""
+
+    def __init__(self, classifier=None, wait_ms=EMOTION_BATCH_WAIT_MS):
+        self.classifier = classifier or get_emotion_classifier()
+        self.wait = wait_ms / 1000
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='emotion-batcher', daemon=True)
+        self._thread.start()
+
+    def submit(self, crop):
+        """Queue one crop; the returned Future resolves to (label, probabilities)."""
+        future = concurrent.futures.Future()
+        self._queue.put((crop, future))
+        return future
+
+    def _run(self):
+        batch_size = self.classifier.batch_size
+        while True:
+            items = [self._queue.get()]
+            deadline = time.monotonic() + self.wait
+            while len(items) < batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    items.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            instrumentation.count('emotion.batches')
+            try:
+                results = self.classifier.classify([crop for crop, _ in items])
+            except Exception as e:
+                for _, future in items:
+                    future.set_exception(e)
+                continue
+            for (_, future), result in zip(items, results):
+                future.set_result(result)
+
+
+_classifier = None
+_batcher = None
+_singleton_lock = threading.Lock()
+
+
+def get_emotion_classifier():
+    """Process-wide classifier; the model is loaded (and converted) once."""
+    global _classifier
+    if _classifier is None:
+        with _singleton_lock:
+            if _classifier is None:
+                _classifier = EmotionClassifier()
+    return _classifier
+
+
+def get_emotion_batcher():
+    """Process-wide batcher shared by every capture stream."""
+    global _batcher
+    if _batcher is None:
+        classifier = get_emotion_classifier()
+        with _singleton_lock:
+            if _batcher is None:
+                _batcher = EmotionBatcher(classifier)
+    return _batcher
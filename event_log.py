@@ -0,0 +1,237 @@
+"""
+event_log.py - Structured Blink/Stress Event Log
+Line-delimited JSON records written through a background queue listener,
+rotated by size and age into gzip segments, with an indexed session reader.
+"""
+
+import atexit
+import glob
+import gzip
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import shutil
+import threading
+import time
+import uuid
+from config import (LOG_FILE, LOG_LEVEL, LOG_CONSOLE_LEVEL, LOG_MAX_BYTES,
+                    LOG_ROTATE_SECONDS, LOG_BACKUP_COUNT)
+
+
+LOGGER_NAME = 'stress_monitor'
+EVENT_LOGGER_NAME = f'{LOGGER_NAME}.events'
+
+SESSION_ID = uuid.uuid4().hex[:12]
+
+_listener = None
+_setup_lock = threading.Lock()
+
+
+def _index_path(log_file):
+    return f"{os.path.splitext(log_file)[0]}.index.json"
+
+
+class JsonLineFormatter(logging.Formatter):
+    """One compact JSON object per line: t, lvl, src, sid, msg and event fields."""
+
+    def format(self, record):
+        entry = {
+            't': round(record.created, 3),
+            'lvl': record.levelname,
+            'src': record.name,
+            'sid': getattr(record, 'session', SESSION_ID),
+        }
+        event = getattr(record, 'event', None)
+        if event:
+            entry.update(event)
+        else:
+            entry['msg'] = record.getMessage()
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, separators=(',', ':'), default=str)
+
+
+class SegmentRotatingHandler(logging.handlers.RotatingFileHandler):
+    """Rotate on size or age, gzip the closed segment and index its sessions.
+
+    Runs only on the queue listener thread, so compression never touches the
+    capture thread.
+    """
+
+    def __init__(self, filename, max_bytes, rotate_seconds, backup_count):
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8', delay=True)
+        self.rotate_seconds = rotate_seconds
+        self.opened_at = time.time()
+        self.sessions = {}
+
+    def emit(self, record):
+        super().emit(record)
+        session = getattr(record, 'session', SESSION_ID)
+        first, last, count = self.sessions.get(session, (record.created, record.created, 0))
+        self.sessions[session] = (first, record.created, count + 1)
+
+    def shouldRollover(self, record):
+        if self.rotate_seconds and time.time() - self.opened_at >= self.rotate_seconds \
+                and os.path.exists(self.baseFilename) and os.path.getsize(self.baseFilename) > 0:
+            return True
+        return super().shouldRollover(record)
+
+    def doRollover(self):
+        if self.stream:
+            self.stream.close()
+            self.stream = None
+        if os.path.exists(self.baseFilename) and os.path.getsize(self.baseFilename) > 0:
+            root, ext = os.path.splitext(self.baseFilename)
+            now = time.time()
+            stamp = f"{time.strftime('%Y%m%dT%H%M%S', time.localtime(now))}{int(now * 1000) % 1000:03d}"
+            segment, n = f"{root}.{stamp}{ext}.gz", 0
+            while os.path.exists(segment):
+                n += 1
+                segment = f"{root}.{stamp}-{n:02d}{ext}.gz"
+            with open(self.baseFilename, 'rb') as src, gzip.open(segment, 'wb', compresslevel=6) as dst:
+                shutil.copyfileobj(src, dst)
+            os.remove(self.baseFilename)
+            self._index_segment(segment)
+            self._prune()
+        self.sessions = {}
+        self.opened_at = time.time()
+        self.stream = self._open()
+
+    def _load_index(self):
+        try:
+            with open(_index_path(self.baseFilename), encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_index(self, index):
+        tmp = _index_path(self.baseFilename) + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(index, f)
+        os.replace(tmp, _index_path(self.baseFilename))
+
+    def _index_segment(self, segment):
+        index = self._load_index()
+        index[os.path.basename(segment)] = {sid: list(span) for sid, span in self.sessions.items()}
+        self._save_index(index)
+
+    def _prune(self):
+        if not self.backupCount:
+            return
+        root, ext = os.path.splitext(self.baseFilename)
+        segments = sorted(glob.glob(f"{glob.escape(root)}.*{ext}.gz"))
+        expired = segments[:-self.backupCount]
+        if expired:
+            index = self._load_index()
+            for segment in expired:
+                os.remove(segment)
+                index.pop(os.path.basename(segment), None)
+            self._save_index(index)
+
+
+def setup_logging(log_file=LOG_FILE, level=LOG_LEVEL, console_level=LOG_CONSOLE_LEVEL):
+    """Attach the queue handler to the app logger (idempotent)."""
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            return logging.getLogger(LOGGER_NAME)
+
+        handlers = [SegmentRotatingHandler(log_file, LOG_MAX_BYTES, LOG_ROTATE_SECONDS, LOG_BACKUP_COUNT)]
+        handlers[0].setFormatter(JsonLineFormatter())
+        if console_level:
+            console = logging.StreamHandler()
+            console.setLevel(console_level)
+            console.setFormatter(logging.Formatter('%(levelname)s %(name)s: %(message)s'))
+            handlers.append(console)
+
+        log_queue = queue.SimpleQueue()
+        logger = logging.getLogger(LOGGER_NAME)
+        logger.setLevel(level)
+        logger.propagate = False
+        logger.addHandler(logging.handlers.QueueHandler(log_queue))
+
+        _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+        _listener.start()
+        atexit.register(shutdown_logging)
+        return logger
+
+
+def shutdown_logging():
+    """Drain the queue and close the log file."""
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            _listener.stop()
+            for handler in _listener.handlers:
+                handler.close()
+            _listener = None
+
+
+def get_logger(name):
+    """Return a child of the app logger, e.g. get_logger('admin_dashboard')."""
+    setup_logging()
+    return logging.getLogger(f'{LOGGER_NAME}.{name}')
+
+
+def log_event(kind, level=logging.INFO, **fields):
+    """Record a structured timeline event such as a blink or stress sample."""
+    setup_logging()
+    logger = logging.getLogger(EVENT_LOGGER_NAME)
+    if logger.isEnabledFor(level):
+        fields['kind'] = kind
+        logger.log(level, kind, extra={'event': fields, 'session': SESSION_ID})
+
+
+class EventLogReader:
+    """Replays sessions from the live log file and its gzip segments."""
+
+    def __init__(self, log_file=LOG_FILE):
+        self.log_file = log_file
+        root, ext = os.path.splitext(log_file)
+        self.segment_pattern = f"{glob.escape(root)}.*{ext}.gz"
+
+    def _index(self):
+        try:
+            with open(_index_path(self.log_file), encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def sessions(self):
+        """Return {session_id: (first_t, last_t, count)} for rotated segments."""
+        merged = {}
+        for spans in self._index().values():
+            for sid, (first, last, count) in spans.items():
+                if sid in merged:
+                    f0, l0, c0 = merged[sid]
+                    merged[sid] = (min(f0, first), max(l0, last), c0 + count)
+                else:
+                    merged[sid] = (first, last, count)
+        return merged
+
+    def _segments_for(self, session_id):
+        """Only the segments whose index entry lists the session are opened."""
+        index = self._index()
+        directory = os.path.dirname(self.log_file)
+        for segment in sorted(glob.glob(self.segment_pattern)):
+            name = os.path.basename(segment)
+            if name not in index or session_id in index[name]:
+                yield os.path.join(directory, name) if directory else name
+
+    def replay(self, session_id=SESSION_ID, kinds=None):
+        """Yield a session's records in time order, optionally only some kinds."""
+        needle = f'"sid":"{session_id}"'
+        sources = [gzip.open(s, 'rt', encoding='utf-8') for s in self._segments_for(session_id)]
+        if os.path.exists(self.log_file):
+            sources.append(open(self.log_file, encoding='utf-8'))
+        for source in sources:
+            with source:
+                for line in source:
+                    # Cheap substring test before paying for json.loads.
+                    if needle not in line:
+                        continue
+                    entry = json.loads(line)
+                    if kinds is None or entry.get('kind') in kinds:
+                        yield entry
@@ -0,0 +1,276 @@
+"""
+exporter.py - Streaming CSV/Parquet Export of stress_records
+Pages through stress_records for a date range (and optional department) with
+a keyset cursor on (created_at, id), from the local replica (when it holds
+the whole range) or Supabase, and writes fixed-size CSV or Parquet part files. Memory stays at one page; a
+checkpoint after every finished part lets an interrupted export resume.
+
+    python exporter.py --start 2026-01-01 --end 2026-06-30 --format parquet
+"""
+
+import argparse
+import csv
+import json
+import os
+import threading
+from datetime import datetime
+import numpy as np
+from config import EXPORT_FOLDER, EXPORT_PAGE_SIZE, EXPORT_PART_ROWS, OFFLINE_MODE
+from event_log import get_logger
+from time_buckets import parse_iso, parse_iso_array, epoch_bounds, utc_bounds
+import instrumentation
+
+
+EXPORT_FORMATS = ('csv', 'parquet')
+EXPORT_COLUMNS = ('id', 'user_id', 'department', 'created_at', 'avg_stress_score',
+                  'stress_level', 'dominant_emotion')
+CHECKPOINT_FILE = '_checkpoint.json'
+
+logger = get_logger('exporter')
+
+
+# ---------- page sources ----------
+
+def _department_map():
+    from local_store import db
+
+    rows = db.table('user1').select('id, department').execute().data or []
+    return {str(r['id']): r.get('department') or '' for r in rows}
+
+
+def _local_pages(start, end, department, cursor, page_size):
+    """Keyset pages from the replica; the (created_epoch, user_id, ...) index
+    serves the range scan. Cursors stay (created_at, id), as for Supabase."""
+    from local_store import store
+
+    store.ensure_synced('stress_records')
+    where = 's.created_epoch >= ? AND s.created_epoch < ?'
+    params = list(epoch_bounds(start, end))
+    if department:
+        where += ' AND u.department = ?'
+        params.append(department)
+    while True:
+        keyset, keyset_params = '', []
+        if cursor:
+            keyset = ' AND (s.created_epoch, s.id) > (?, ?)'
+            keyset_params = [parse_iso(str(cursor[0])), str(cursor[1])]
+        rows = store.query(
+            f"SELECT s.id, s.user_id, COALESCE(u.department, ''), s.created_at, s.avg_stress_score, "
+            f"s.stress_level, s.dominant_emotion FROM stress_records s "
+            f"LEFT JOIN user1 u ON u.id = CAST(s.user_id AS TEXT) "
+            f"WHERE {where}{keyset} ORDER BY s.created_epoch, s.id LIMIT ?",
+            params + keyset_params + [page_size])
+        if not rows:
+            return
+        yield rows
+        cursor = (rows[-1][3], rows[-1][0])
+        if len(rows) < page_size:
+            return
+
+
+def _remote_pages(start, end, department, cursor, page_size):
+    """Keyset pages from Supabase: no OFFSET, so page N costs the same as page 1."""
+    from supabase_client import supabase
+
+    departments = _department_map()
+    user_ids = [uid for uid, dept in departments.items() if dept == department] if department else None
+    if user_ids == []:
+        return
+    start, end = utc_bounds(start, end)
+    while True:
+        query = (supabase.table('stress_records')
+                 .select(', '.join(c for c in EXPORT_COLUMNS if c != 'department'))
+                 .gte('created_at', start).lt('created_at', end))
+        if user_ids is not None:
+            query = query.in_('user_id', user_ids)
+        if cursor:
+            stamp, row_id = cursor
+            query = query.or_(f'created_at.gt."{stamp}",and(created_at.eq."{stamp}",id.gt.{row_id})')
+        data = query.order('created_at').order('id').limit(page_size).execute().data or []
+        if not data:
+            return
+        yield [(r['id'], r.get('user_id'), departments.get(str(r.get('user_id')), ''), r.get('created_at'),
+                r.get('avg_stress_score'), r.get('stress_level'), r.get('dominant_emotion')) for r in data]
+        cursor = (data[-1]['created_at'], data[-1]['id'])
+        if len(data) < page_size:
+            return
+
+
+def iter_pages(start, end, department=None, cursor=None, page_size=EXPORT_PAGE_SIZE):
+    """Yield lists of EXPORT_COLUMNS tuples after `cursor` ((created_at, id) or None)."""
+    source = _remote_pages
+    if OFFLINE_MODE:
+        from local_store import store
+
+        store.ensure_synced('stress_records')
+        if store.covers('stress_records', utc_bounds(start, end)[0]):
+            source = _local_pages
+        else:
+            logger.info("Export from %s starts before the local replica's history; reading Supabase", start)
+    yield from source(start, end, department, cursor, page_size)
+
+
+# ---------- part writers ----------
+
+class _CsvPart:
+    def __init__(self, path):
+        self.file = open(path, 'w', newline='', encoding='utf-8')
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(EXPORT_COLUMNS)
+
+    def write(self, rows):
+        self.writer.writerows(rows)
+
+    def close(self):
+        self.file.close()
+
+
+class _ParquetPart:
+    """One row group per page through pyarrow's streaming writer."""
+
+    def __init__(self, path):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("Parquet export needs pyarrow (pip install pyarrow)")
+        self.pa = pa
+        self.schema = pa.schema([
+            ('id', pa.string()), ('user_id', pa.string()), ('department', pa.string()),
+            ('created_at', pa.timestamp('us', tz='UTC')), ('avg_stress_score', pa.float64()),
+            ('stress_level', pa.string()), ('dominant_emotion', pa.string()),
+        ])
+        self.writer = pq.ParquetWriter(path, self.schema, compression='zstd')
+
+    def write(self, rows):
+        ids, users, departments, stamps, scores, levels, emotions = zip(*rows)
+        micros = np.round(parse_iso_array(stamps) * 1e6)
+        valid = ~np.isnan(micros)
+        pa = self.pa
+        self.writer.write_table(pa.table([
+            pa.array([str(v) for v in ids]),
+            pa.array([None if v is None else str(v) for v in users]),
+            pa.array(departments, pa.string()),
+            pa.array(np.where(valid, micros, 0).astype(np.int64), pa.timestamp('us', tz='UTC'), mask=~valid),
+            pa.array(scores, pa.float64()),
+            pa.array(levels, pa.string()),
+            pa.array(emotions, pa.string()),
+        ], schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+
+_WRITERS = {'csv': _CsvPart, 'parquet': _ParquetPart}
+
+
+# ---------- checkpointed export ----------
+
+def export_path(start, end, department=None, fmt='csv', folder=EXPORT_FOLDER):
+    """Directory holding the part files of one export."""
+    name = f"stress_records_{start}_{end}"
+    if department:
+        name += '_' + ''.join(ch if ch.isalnum() else '-' for ch in department)
+    return os.path.join(folder, f"{name}_{fmt}")
+
+
+def load_checkpoint(path):
+    try:
+        with open(os.path.join(path, CHECKPOINT_FILE), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _save_checkpoint(path, state):
+    target = os.path.join(path, CHECKPOINT_FILE)
+    with open(target + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+    os.replace(target + '.tmp', target)
+
+
+@instrumentation.timed('export.stress_records')
+def export_stress_records(start, end, department=None, fmt='csv', folder=EXPORT_FOLDER,
+                          part_rows=EXPORT_PART_ROWS, page_size=EXPORT_PAGE_SIZE,
+                          on_progress=None, cancel=None):
+    """Export [start, end) local days to part files; returns the checkpoint state.
+
+    An unfinished export with the same filters resumes after its last
+    completed part. Setting the `cancel` event stops after the current page;
+    the finished parts and checkpoint are kept for the next run.
+    """
+    if fmt not in _WRITERS:
+        raise ValueError(f"Unknown export format: {fmt}")
+    path = export_path(start, end, department, fmt, folder)
+    os.makedirs(path, exist_ok=True)
+    params = {'start': start, 'end': end, 'department': department, 'format': fmt,
+              'source': 'local' if OFFLINE_MODE else 'supabase'}
+    state = load_checkpoint(path)
+    if not state or state.get('params') != params or state.get('complete'):
+        state = {'params': params, 'cursor': None, 'parts': [], 'rows': 0, 'complete': False,
+                 'started_at': datetime.now().isoformat()}
+    elif state['parts'] or state['cursor']:
+        logger.info("Resuming export %s after %d rows", path, state['rows'])
+
+    cancel = cancel or threading.Event()
+    part, part_path, part_count, cursor = None, None, 0, state['cursor']
+
+    def finish_part():
+        nonlocal part, part_count
+        part.close()
+        os.replace(part_path + '.tmp', part_path)
+        state['parts'].append(os.path.basename(part_path))
+        state['rows'] += part_count
+        state['cursor'] = cursor
+        _save_checkpoint(path, state)
+        part, part_count = None, 0
+
+    try:
+        for rows in iter_pages(start, end, department, state['cursor'], page_size):
+            while rows:
+                if part is None:
+                    part_path = os.path.join(path, f"part-{len(state['parts']):05d}.{fmt}")
+                    part = _WRITERS[fmt](part_path + '.tmp')
+                chunk, rows = rows[:part_rows - part_count], rows[part_rows - part_count:]
+                part.write(chunk)
+                part_count += len(chunk)
+                cursor = (chunk[-1][3], chunk[-1][0])
+                if part_count >= part_rows:
+                    finish_part()
+            if on_progress:
+                on_progress(state['rows'] + part_count)
+            if cancel.is_set():
+                break
+        if part is not None:
+            finish_part()
+        if not cancel.is_set():
+            state['complete'] = True
+            _save_checkpoint(path, state)
+            logger.info("Exported %d stress_records to %s", state['rows'], path)
+    finally:
+        if part is not None:
+            # Interrupted mid-part: drop it, the checkpoint points before it.
+            part.close()
+            os.remove(part_path + '.tmp')
+    state['path'] = path
+    return state
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export stress_records to CSV or Parquet parts.")
+    parser.add_argument('--start', required=True, help="First day, YYYY-MM-DD")
+    parser.add_argument('--end', required=True, help="Last day (inclusive), YYYY-MM-DD")
+    parser.add_argument('--department')
+    parser.add_argument('--format', choices=EXPORT_FORMATS, default='csv')
+    parser.add_argument('--folder', default=EXPORT_FOLDER)
+    args = parser.parse_args()
+
+    from stress_queries import parse_custom_range
+    start, end = parse_custom_range(args.start, args.end)
+    state = export_stress_records(start, end, args.department, args.format, args.folder,
+                                  on_progress=lambda n: print(f"\r{n:,} rows", end='', flush=True))
+    print(f"\n✅ {state['rows']:,} rows in {len(state['parts'])} part(s) under {state['path']}")
+
+
+if __name__ == "__main__":
+    main()
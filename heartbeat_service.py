@@ -0,0 +1,149 @@
+"""
+heartbeat_service.py - Coalesced last_active Updates
+Keeps per-user activity touches in memory and writes them to user1 on an
+interval as one apply_user_heartbeats RPC per batch: straight to Supabase,
+or through the local replica's outbox, which also applies the batch to the
+replica until the next pull.
+
+Touches come from the activity tracker (keyboard/mouse activity) and from
+the ingestion service (observe() on each accepted batch). user1.stress_events
+is not written here: the stress_records trigger in sql/user1_heartbeats.sql
+counts it on the server for every insert.
+"""
+
+import json
+import threading
+import time
+from datetime import datetime, timezone
+from config import HEARTBEAT_FLUSH_SECONDS, HEARTBEAT_BATCH_SIZE
+from alert_engine import record_time
+from event_log import get_logger
+from time_buckets import parse_iso
+import instrumentation
+
+
+HEARTBEAT_RPC = 'apply_user_heartbeats'  # defined in sql/user1_heartbeats.sql
+
+logger = get_logger('heartbeats')
+
+
+def write_heartbeats(updates):
+    """Apply [{'id', 'last_active'}]; last_active only ever moves forward,
+    so clients flushing at the same time never move it back."""
+    from local_store import store, db
+
+    if store is None:
+        db.rpc(HEARTBEAT_RPC, {'updates': updates}).execute()
+        return
+    rows = []
+    for update in updates:
+        found = store.query('SELECT data FROM user1 WHERE id = ?', (str(update['id']),))
+        if not found:
+            continue
+        row = json.loads(found[0][0])
+        if update['last_active'] and not parse_iso(update['last_active']) <= parse_iso(row.get('last_active') or ''):
+            row['last_active'] = update['last_active']
+            rows.append(row)
+    store.local_rpc('user1', HEARTBEAT_RPC, {'updates': updates}, rows)
+
+
+class HeartbeatService:
+    """In-memory coalescing of user1 activity.
+
+    A thousand samples from one user between flushes become a single row
+    update.
+    """
+
+    def __init__(self, writer=None, interval=HEARTBEAT_FLUSH_SECONDS, batch_size=HEARTBEAT_BATCH_SIZE):
+        self.writer = writer or write_heartbeats
+        self.interval = interval
+        self.batch_size = batch_size
+        self.stats = {'touches': 0, 'flushes': 0, 'rows_written': 0, 'failures': 0}
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    # ---------- producers ----------
+
+    def touch(self, user_id, at=None):
+        """Record activity at epoch `at` (default now)."""
+        at = time.time() if at is None else at
+        with self._lock:
+            self._touch_locked(user_id, at)
+            self.stats['touches'] += 1
+
+    def _touch_locked(self, user_id, at):
+        latest = self._pending.get(user_id)
+        if latest is None or at > latest:
+            self._pending[user_id] = at
+
+    def observe(self, records):
+        """Touch each record's user at the record's time."""
+        for record in records:
+            user_id = record.get('user_id')
+            if user_id is not None:
+                self.touch(user_id, record_time(record))
+
+    # ---------- flushing ----------
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='heartbeats', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop the flush loop and write whatever is still pending."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        self.flush()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.flush()
+
+    @instrumentation.timed('heartbeats.flush')
+    def flush(self):
+        """Write every pending user in batches; failed ones are merged back."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+        updates = [{'id': user_id, 'last_active': datetime.fromtimestamp(at, timezone.utc).isoformat()}
+                   for user_id, at in pending.items()]
+        written = 0
+        for i in range(0, len(updates), self.batch_size):
+            batch = updates[i:i + self.batch_size]
+            try:
+                self.writer(batch)
+                written += len(batch)
+            except Exception as e:
+                self.stats['failures'] += 1
+                logger.warning("⚠️ Heartbeat write of %d users failed, retrying next flush: %s", len(batch), e)
+                self._merge_back(batch, pending)
+        self.stats['flushes'] += 1
+        self.stats['rows_written'] += written
+        return written
+
+    def _merge_back(self, batch, pending):
+        with self._lock:
+            for update in batch:
+                self._touch_locked(update['id'], pending[update['id']])
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_heartbeat_service():
+    """The process-wide service, flushing in the background from first use."""
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                _service = HeartbeatService().start()
+    return _service
@@ -0,0 +1,205 @@
+"""
+heatmap.py - Department x Weekday/Hour Stress Matrix
+Dense NumPy sums and counts per (department, local day, local hour) over the
+last HEATMAP_DAYS days. Built once from the replica, then updated in place
+from the store listener as stress_records sync, so the dashboard heatmap is
+one imshow of an array that is always current. Without a replica the
+matrix is polled from the analytics service instead.
+"""
+
+import threading
+import time
+from datetime import date, timedelta
+import numpy as np
+from config import HEATMAP_DAYS, HEATMAP_REFRESH_MS, ANALYTICS_SERVICE_URL
+from event_log import get_logger
+from time_buckets import local_day, local_hour, epoch_bounds, now as zone_now
+import instrumentation
+
+
+NO_DEPARTMENT = ''
+WEEKDAYS = ('Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun')
+
+logger = get_logger('heatmap')
+
+
+class StressHeatmap:
+    """sums/counts shaped (departments, days, 24); row order is first-seen,
+    matrix() returns them sorted by name."""
+
+    def __init__(self, store, days=HEATMAP_DAYS):
+        self.store = store
+        self.days = days
+        self.version = 0  # bumped on every change; the UI redraws when it moves
+        self.departments = []
+        self._index = {}
+        self._department_of = None
+        self._lock = threading.Lock()
+        self.first_day = zone_now().date() - timedelta(days=days - 1)
+        self.sums = np.zeros((0, days, 24))
+        self.counts = np.zeros((0, days, 24), np.int64)
+        store.add_listener(self._on_rows)
+        store.add_change_listener(self._on_change)
+        self.rebuild()
+
+    # ---------- building ----------
+
+    @instrumentation.timed('heatmap.rebuild')
+    def rebuild(self):
+        """Reload the window from the replica (start-up, or repair)."""
+        with self._lock:
+            self.first_day = zone_now().date() - timedelta(days=self.days - 1)
+            end = self.first_day + timedelta(days=self.days)
+            rows = self.store.query(
+                "SELECT COALESCE(u.department, ''), local_day(s.created_at) AS day, "
+                "local_hour(s.created_at) AS hour, SUM(s.avg_stress_score), COUNT(*) "
+                "FROM stress_records s LEFT JOIN user1 u ON u.id = CAST(s.user_id AS TEXT) "
+                "WHERE s.created_epoch >= ? AND s.created_epoch < ? GROUP BY 1, 2, 3 HAVING hour != ''",
+                epoch_bounds(self.first_day.isoformat(), end.isoformat()))
+            self.sums[:] = 0
+            self.counts[:] = 0
+            self._add(rows)
+
+    def _on_rows(self, table, rows):
+        if table == 'stress_records':
+            self.add_records(rows)
+
+    def _on_change(self, table):
+        if table == 'user1':
+            self._department_of = None
+
+    def add_records(self, records):
+        """Fold newly synced stress_records into the matrix."""
+        departments = self._departments()
+        cells = {}
+        for record in records:
+            stamp = record.get('created_at')
+            day, hour = local_day(stamp), local_hour(stamp)
+            if not hour:
+                continue
+            key = (departments.get(str(record.get('user_id')), NO_DEPARTMENT), day, hour)
+            cell = cells.get(key)
+            if cell is None:
+                cells[key] = [float(record.get('avg_stress_score') or 0), 1]
+            else:
+                cell[0] += float(record.get('avg_stress_score') or 0)
+                cell[1] += 1
+        if cells:
+            with self._lock:
+                self._advance()
+                self._add([(*key, total, n) for key, (total, n) in cells.items()])
+
+    def _departments(self):
+        if self._department_of is None:
+            self._department_of = {row_id: dept or NO_DEPARTMENT
+                                   for row_id, dept in self.store.query('SELECT id, department FROM user1')}
+        return self._department_of
+
+    def _row(self, department):
+        row = self._index.get(department)
+        if row is None:
+            row = self._index[department] = len(self.departments)
+            self.departments.append(department)
+            self.sums = np.concatenate([self.sums, np.zeros((1, self.days, 24))])
+            self.counts = np.concatenate([self.counts, np.zeros((1, self.days, 24), np.int64)])
+        return row
+
+    def _add(self, rows):
+        # Caller holds the lock. rows: (department, 'YYYY-MM-DD', 'HH', score_sum, count)
+        if not rows:
+            return
+        departments, days, hours, sums, counts = zip(*rows)
+        index = np.array([self._row(d or NO_DEPARTMENT) for d in departments])
+        offsets = np.array([(date.fromisoformat(d) - self.first_day).days for d in days])
+        hours = np.array(hours, np.int64)
+        inside = (offsets >= 0) & (offsets < self.days)
+        cell = (index[inside], offsets[inside], hours[inside])
+        np.add.at(self.sums, cell, np.array(sums, np.float64)[inside])
+        np.add.at(self.counts, cell, np.array(counts, np.int64)[inside])
+        self.version += 1
+
+    def _advance(self):
+        """Slide the window so it ends today, dropping the oldest days."""
+        shift = (zone_now().date() - (self.first_day + timedelta(days=self.days - 1))).days
+        if shift <= 0:
+            return
+        shift = min(shift, self.days)
+        self.sums[:, :self.days - shift] = self.sums[:, shift:]
+        self.counts[:, :self.days - shift] = self.counts[:, shift:]
+        self.sums[:, self.days - shift:] = 0
+        self.counts[:, self.days - shift:] = 0
+        self.first_day += timedelta(days=shift)
+        self.version += 1
+
+    # ---------- reads ----------
+
+    def matrix(self):
+        """(department names, (departments, 7 * 24) mean stress % by weekday
+        and hour, NaN where there is no data)."""
+        with self._lock:
+            self._advance()
+            weekday = (self.first_day.weekday() + np.arange(self.days)) % 7
+            sums = np.zeros((len(self.departments), 7, 24))
+            counts = np.zeros((len(self.departments), 7, 24))
+            for day in range(7):
+                sums[:, day] = self.sums[:, weekday == day].sum(axis=1)
+                counts[:, day] = self.counts[:, weekday == day].sum(axis=1)
+            names = list(self.departments)
+        order = sorted(range(len(names)), key=lambda i: names[i].lower())
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = np.where(counts > 0, sums / counts * 100, np.nan)
+        return [names[i] or 'Unassigned' for i in order], means[order].reshape(len(order), 7 * 24)
+
+
+class RemoteHeatmap:
+    """The analytics service's matrix, refreshed by a background poll so
+    the dashboard's update loop never waits on the network."""
+
+    def __init__(self, url, interval=HEATMAP_REFRESH_MS / 1000):
+        self.url = url
+        self.version = 0
+        self._payload = None
+        self.refresh()
+        threading.Thread(target=self._poll, args=(interval,), name='heatmap-poll', daemon=True).start()
+
+    def refresh(self):
+        from analytics_service import fetch_payload
+
+        payload = fetch_payload(self.url, '/heatmap')
+        # A 304 hands back the very same object: nothing changed.
+        if payload is not self._payload:
+            self._payload = payload
+            self.version += 1
+
+    def _poll(self, interval):
+        while True:
+            time.sleep(interval)
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.warning("⚠️ Heatmap refresh from the analytics service failed: %s", e)
+
+    def matrix(self):
+        """Same shape as StressHeatmap.matrix()."""
+        payload = self._payload
+        names = payload['names']
+        return names, np.array(payload['matrix'], np.float64).reshape(len(names), 7 * 24)
+
+
+_heatmap = None
+_heatmap_lock = threading.Lock()
+
+
+def get_heatmap():
+    """The process-wide matrix over the local replica (or the analytics
+    service's copy without one), or None with neither."""
+    global _heatmap
+    from local_store import store
+
+    if store is None and not ANALYTICS_SERVICE_URL:
+        return None
+    if _heatmap is None:
+        with _heatmap_lock:
+            if _heatmap is None:
+                _heatmap = StressHeatmap(store) if store is not None else RemoteHeatmap(ANALYTICS_SERVICE_URL)
+    return _heatmap
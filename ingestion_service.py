@@ -0,0 +1,581 @@
+"""
+ingestion_service.py - Asyncio Ingestion Service for Stress Samples
+Optional standalone service that monitoring clients send stress_records to
+instead of writing to Supabase one row at a time. Samples are validated,
+deduplicated on (user_id, created_at), queued with backpressure and written
+in bulk inserts; the service also keeps in-memory daily/hourly rollups that
+the admin dashboard can read.
+
+    python ingestion_service.py              # writes to Supabase
+    python ingestion_service.py --local      # no Supabase, for testing
+
+Endpoints (JSON over HTTP/1.1, keep-alive):
+    POST /samples   one sample or a list -> {"rows": [...], "errors": [...]}
+                    (JSON, or a sample_codec batch with its Content-Type);
+                    errors are validation failures ("kind": "invalid") that
+                    resending will not fix. 503 when the queue is full or
+                    the database cannot be written: resend the whole batch.
+    GET  /rollups   ?start=&end=&department=&user_id= -> dashboard summary
+    GET  /health    queue depth and counters
+
+/samples and /rollups need "Authorization: Bearer <token>" with one of the
+per-client INGEST_TOKENS; unknown clients are refused before anything is
+decoded or queued.
+"""
+
+import argparse
+import asyncio
+import hmac
+import itertools
+import json
+import math
+import time
+import urllib.request
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from urllib.parse import urlsplit, parse_qs, urlencode
+from config import (INGEST_HOST, INGEST_PORT, INGEST_BATCH_SIZE, INGEST_FLUSH_SECONDS, INGEST_QUEUE_SIZE,
+                    INGEST_DEDUPE_WINDOW, INGEST_ROLLUP_DAYS, INGEST_WIRE_FORMAT, INGEST_TOKENS,
+                    INGEST_CLIENT_TOKEN)
+from event_log import get_logger
+from rollups import accumulate, NO_DEPARTMENT
+from sample_codec import CONTENT_TYPE as BATCH_CONTENT_TYPE, encode_samples, decode_samples
+from time_buckets import parse_iso, local_day, local_hour, now as zone_now
+import instrumentation
+
+
+MAX_BODY_BYTES = 8 * 1024 * 1024
+RETRY_AFTER_SECONDS = 1
+INSERT_RETRIES = 3
+DEPARTMENT_REFRESH_SECONDS = 300
+HOURLY_KEEP_DAYS = 2
+FETCH_PAGE_SIZE = 1000
+
+REASONS = {200: 'OK', 400: 'Bad Request', 401: 'Unauthorized', 404: 'Not Found', 405: 'Method Not Allowed',
+           413: 'Payload Too Large', 503: 'Service Unavailable'}
+
+logger = get_logger('ingestion')
+
+
+class StoreUnavailable(Exception):
+    """The bulk insert kept failing; the samples were not stored."""
+
+
+# ---------- validation ----------
+
+def validate_sample(sample):
+    """Return (normalized sample, None) or (None, error message)."""
+    if not isinstance(sample, dict):
+        return None, "sample must be an object"
+    user_id = sample.get('user_id')
+    if user_id in (None, '') or isinstance(user_id, (bool, dict, list)):
+        return None, "user_id is required"
+    score = sample.get('avg_stress_score')
+    if isinstance(score, bool) or not isinstance(score, (int, float)) or not 0 <= score <= 1:
+        return None, "avg_stress_score must be a number between 0 and 1"
+    created_at = sample.get('created_at') or datetime.now(timezone.utc).isoformat()
+    if math.isnan(parse_iso(str(created_at))):
+        return None, "created_at must be an ISO timestamp"
+    clean = {}
+    for key, value in sample.items():
+        if key == 'id':
+            continue  # the database assigns ids
+        if isinstance(value, (dict, list)):
+            return None, f"{key} must be a scalar"
+        clean[key] = value
+    clean['avg_stress_score'] = float(score)
+    clean['created_at'] = str(created_at)
+    return clean, None
+
+
+def sample_key(sample):
+    return str(sample['user_id']), sample['created_at']
+
+
+# ---------- sinks ----------
+
+class SupabaseSink:
+    """Bulk inserts into stress_records; rows come back with their ids."""
+
+    def __init__(self):
+        from supabase_client import supabase
+        self.client = supabase
+
+    def insert(self, samples):
+        return self.client.table('stress_records').insert(samples).execute().data or []
+
+    def departments(self):
+        rows = self.client.table('user1').select('id, department').execute().data or []
+        return {str(r['id']): r.get('department') or NO_DEPARTMENT for r in rows}
+
+    def heartbeats(self, updates):
+        from heartbeat_service import HEARTBEAT_RPC
+        self.client.rpc(HEARTBEAT_RPC, {'updates': updates}).execute()
+
+    def history(self, since):
+        rows, start = [], 0
+        while True:
+            page = (self.client.table('stress_records')
+                    .select('user_id, created_at, avg_stress_score, stress_level, dominant_emotion')
+                    .gte('created_at', since).order('created_at')
+                    .range(start, start + FETCH_PAGE_SIZE - 1).execute().data or [])
+            rows.extend(page)
+            if len(page) < FETCH_PAGE_SIZE:
+                return rows
+            start += FETCH_PAGE_SIZE
+
+
+class LocalSink:
+    """Stand-in for Supabase: assigns ids and keeps nothing but a count."""
+
+    def __init__(self, departments=None):
+        self._ids = itertools.count(1)
+        self._departments = departments or {}
+        self.inserted = 0
+
+    def insert(self, samples):
+        self.inserted += len(samples)
+        return [dict(sample, id=next(self._ids)) for sample in samples]
+
+    def departments(self):
+        return dict(self._departments)
+
+    def heartbeats(self, updates):
+        pass
+
+    def history(self, since):
+        return []
+
+
+# ---------- in-memory rollups ----------
+
+class MemoryRollups:
+    """Per-user and per-department day (and recent hour) aggregates, in the
+    same layout as the SQLite rollups so summaries match on both paths."""
+
+    def __init__(self):
+        self.departments = {}
+        self.user_days, self.dept_days = {}, {}
+        self.user_labels, self.dept_labels = {}, {}
+        self.dept_active = {}
+        self.user_hours, self.dept_hours = {}, {}
+        self._active = set()
+
+    @staticmethod
+    def _merge_days(target, source):
+        for key, (score_sum, count, score_max, high) in source.items():
+            agg = target.get(key)
+            if agg is None:
+                target[key] = [score_sum, count, score_max, high]
+            else:
+                agg[0] += score_sum
+                agg[1] += count
+                agg[2] = max(agg[2], score_max)
+                agg[3] += high
+
+    @instrumentation.timed('ingest.rollups')
+    def add(self, records):
+        user_days, dept_days, user_labels, dept_labels = accumulate(records, self.departments)
+        self._merge_days(self.user_days, {(str(u), d): v for (u, d), v in user_days.items()})
+        self._merge_days(self.dept_days, dept_days)
+        for target, source, convert in ((self.user_labels, user_labels, str), (self.dept_labels, dept_labels, None)):
+            for (key, day, kind, label), n in source.items():
+                key = (convert(key) if convert else key, day, kind, label)
+                target[key] = target.get(key, 0) + n
+        for record in records:
+            user_id, stamp = str(record.get('user_id')), record.get('created_at')
+            day, hour = local_day(stamp), local_hour(stamp)
+            if not day:
+                continue
+            department = self.departments.get(user_id, NO_DEPARTMENT)
+            if (user_id, day) not in self._active:
+                self._active.add((user_id, day))
+                self.dept_active[(department, day)] = self.dept_active.get((department, day), 0) + 1
+            score = float(record.get('avg_stress_score') or 0)
+            for bucket, key in ((self.user_hours, (user_id, day, hour)), (self.dept_hours, (department, day, hour))):
+                agg = bucket.setdefault(key, [0.0, 0])
+                agg[0] += score
+                agg[1] += 1
+
+    def prune(self, keep_days=INGEST_ROLLUP_DAYS):
+        """Drop day buckets older than keep_days and hour buckets older than two days."""
+        day_cutoff = (zone_now() - timedelta(days=keep_days)).strftime('%Y-%m-%d')
+        hour_cutoff = (zone_now() - timedelta(days=HOURLY_KEEP_DAYS)).strftime('%Y-%m-%d')
+        # Every bucket key carries the day in position 1.
+        for bucket, cutoff in ((self.user_days, day_cutoff), (self.dept_days, day_cutoff),
+                               (self.user_labels, day_cutoff), (self.dept_labels, day_cutoff),
+                               (self.dept_active, day_cutoff),
+                               (self.user_hours, hour_cutoff), (self.dept_hours, hour_cutoff)):
+            for key in [k for k in bucket if k[1] < cutoff]:
+                del bucket[key]
+        self._active = {k for k in self._active if k[1] >= day_cutoff}
+
+    def summary(self, start, end, department=None, user_id=None):
+        """Same shape as RollupStore.summary, plus hourly for one-day ranges."""
+        if user_id is not None:
+            key, days, labels, hours = str(user_id), self.user_days, self.user_labels, self.user_hours
+            active = None
+            total_users = 1
+        else:
+            key, days, labels, hours = department, self.dept_days, self.dept_labels, self.dept_hours
+            active = self.dept_active
+            if department is not None:
+                total_users = sum(1 for d in self.departments.values() if d == department)
+            else:
+                total_users = len(self.departments)
+
+        def wanted(k, day):
+            return start <= day < end and (key is None or k == key)
+
+        per_day = {}
+        for (k, day), (score_sum, count, score_max, high) in days.items():
+            if wanted(k, day):
+                agg = per_day.setdefault(day, [0.0, 0, 0.0, 0, 0])
+                agg[0] += score_sum
+                agg[1] += count
+                agg[2] = max(agg[2], score_max)
+                agg[3] += high
+                agg[4] += active.get((k, day), 0) if active is not None else 1
+        levels, emotions = {}, {}
+        for (k, day, kind, label), n in labels.items():
+            if wanted(k, day):
+                target = levels if kind == 'level' else emotions
+                target[label] = target.get(label, 0) + n
+        hourly = {}
+        if (datetime.strptime(end, '%Y-%m-%d') - datetime.strptime(start, '%Y-%m-%d')).days <= 1:
+            for (k, day, hour), (score_sum, count) in hours.items():
+                if wanted(k, day) and hour:
+                    agg = hourly.setdefault(hour, [0.0, 0])
+                    agg[0] += score_sum
+                    agg[1] += count
+
+        rows = per_day.values()
+        return {
+            'sessions': sum(r[1] for r in rows),
+            'score_sum': sum(r[0] for r in rows),
+            'max_score': max((r[2] for r in rows), default=0.0),
+            'high_stress_count': sum(r[3] for r in rows),
+            'active_users': sum(r[4] for r in rows) / len(per_day) if per_day else 0,
+            'total_users': total_users,
+            'daily': {day: int(r[0] / r[1] * 100) for day, r in sorted(per_day.items()) if r[1]},
+            'hourly': {f"{h}:00": int(s / c * 100) for h, (s, c) in sorted(hourly.items()) if c},
+            'levels': levels,
+            'emotions': emotions,
+        }
+
+
+# ---------- service ----------
+
+class IngestionService:
+    """HTTP front end, bounded queue and batch writer."""
+
+    def __init__(self, sink, tokens=INGEST_TOKENS, batch_size=INGEST_BATCH_SIZE, flush_seconds=INGEST_FLUSH_SECONDS,
+                 queue_size=INGEST_QUEUE_SIZE, dedupe_window=INGEST_DEDUPE_WINDOW):
+        if not tokens:
+            raise RuntimeError("the ingestion service writes stress_records: set INGEST_TOKENS")
+        self.sink = sink
+        self.tokens = dict(tokens)
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.queue_size = queue_size
+        self.dedupe_window = dedupe_window
+        self.rollups = MemoryRollups()
+        # One writer for every user's last_active. Imported
+        # here: heartbeat_service -> alert_engine -> local_store -> this module.
+        from heartbeat_service import HeartbeatService
+        self.heartbeats = HeartbeatService(writer=sink.heartbeats)
+        self.stats = {'received': 0, 'inserted': 0, 'duplicates': 0, 'invalid': 0,
+                      'throttled': 0, 'batches': 0, 'failed_batches': 0, 'unauthorized': 0}
+        self._queue = None
+        self._seen = OrderedDict()  # sample key -> stored row
+        self._inflight = {}  # sample key -> future of the stored row
+        self._tasks = []
+
+    # ---------- lifecycle ----------
+
+    async def start(self, host=INGEST_HOST, port=INGEST_PORT):
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        await self._load_rollups()
+        self.heartbeats.start()
+        self._tasks = [asyncio.create_task(self._batcher()), asyncio.create_task(self._maintenance())]
+        server = await asyncio.start_server(self._handle, host, port, limit=MAX_BODY_BYTES)
+        logger.info("Ingestion service listening on %s:%s", host, port)
+        return server
+
+    async def _load_rollups(self):
+        try:
+            self.rollups.departments = await asyncio.to_thread(self.sink.departments)
+            since = (zone_now() - timedelta(days=INGEST_ROLLUP_DAYS)).strftime('%Y-%m-%d')
+            history = await asyncio.to_thread(self.sink.history, since)
+            self.rollups.add(history)
+            logger.info("Loaded %d historical records into the rollups", len(history))
+        except Exception as e:
+            logger.warning("⚠️ Could not seed rollups, starting empty: %s", e)
+
+    async def _maintenance(self):
+        while True:
+            await asyncio.sleep(DEPARTMENT_REFRESH_SECONDS)
+            try:
+                self.rollups.departments = await asyncio.to_thread(self.sink.departments)
+            except Exception as e:
+                logger.warning("⚠️ Department refresh failed: %s", e)
+            self.rollups.prune()
+
+    # ---------- ingest ----------
+
+    async def submit(self, samples):
+        """Queue samples; returns (rows, errors) once they are stored.
+
+        rows[i] is the stored row for samples[i] (the earlier row for a
+        duplicate) or None if it was invalid. Raises asyncio.QueueFull when
+        the batch does not fit and StoreUnavailable when the database could
+        not take it, so callers can tell clients to back off and resend;
+        resent samples that did get stored come back as duplicates.
+        """
+        self.stats['received'] += len(samples)
+        rows, errors, waits = [None] * len(samples), [], []
+        fresh, repeats = {}, []  # key -> (index, sample); repeats within this request
+        for i, raw in enumerate(samples):
+            sample, error = validate_sample(raw)
+            if error:
+                self.stats['invalid'] += 1
+                errors.append({'index': i, 'kind': 'invalid', 'error': error})
+                continue
+            key = sample_key(sample)
+            if key in self._seen:
+                self.stats['duplicates'] += 1
+                rows[i] = self._seen[key]
+            elif key in self._inflight:
+                self.stats['duplicates'] += 1
+                waits.append((i, self._inflight[key]))
+            elif key in fresh:
+                self.stats['duplicates'] += 1
+                repeats.append((i, key))
+            else:
+                fresh[key] = (i, sample)
+
+        if self._queue.qsize() + len(fresh) > self.queue_size:
+            self.stats['throttled'] += len(fresh)
+            raise asyncio.QueueFull()
+        loop = asyncio.get_running_loop()
+        for key, (i, sample) in fresh.items():
+            future = loop.create_future()
+            self._inflight[key] = future
+            self._queue.put_nowait((key, sample, future))
+            waits.append((i, future))
+        waits.extend((i, self._inflight[key]) for i, key in repeats)
+
+        failure = None
+        for i, future in waits:
+            try:
+                rows[i] = await asyncio.shield(future)
+            except StoreUnavailable as e:
+                failure = e
+        if failure is not None:
+            raise failure
+        return rows, errors
+
+    async def _batcher(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.flush_seconds
+            while len(batch) < self.batch_size:
+                # Take whatever is already queued without waiting per item.
+                while len(batch) < self.batch_size and not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                remaining = deadline - loop.time()
+                if len(batch) >= self.batch_size or remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            await self._flush(batch)
+
+    async def _flush(self, batch):
+        samples = [sample for _, sample, _ in batch]
+        error = None
+        for attempt in range(INSERT_RETRIES):
+            try:
+                started = time.perf_counter()
+                stored = await asyncio.to_thread(self.sink.insert, samples)
+                instrumentation.record('ingest.bulk_insert', time.perf_counter() - started)
+                break
+            except Exception as e:
+                error = e
+                logger.warning("⚠️ Bulk insert of %d samples failed (attempt %d): %s", len(samples), attempt + 1, e)
+                await asyncio.sleep(2 ** attempt)
+        else:
+            self.stats['failed_batches'] += 1
+            for key, _, future in batch:
+                self._inflight.pop(key, None)
+                if not future.done():
+                    future.set_exception(StoreUnavailable(f"insert failed: {error}"))
+                    future.exception()  # retrieved here, waiters re-raise it
+            return
+
+        self.stats['batches'] += 1
+        self.stats['inserted'] += len(stored)
+        # Rows without a returned representation fall back to the sample sent.
+        stored = list(stored) + samples[len(stored):]
+        for (key, _, future), row in zip(batch, stored):
+            self._inflight.pop(key, None)
+            self._seen[key] = row
+            if not future.done():
+                future.set_result(row)
+        while len(self._seen) > self.dedupe_window:
+            self._seen.popitem(last=False)
+        self.rollups.add(stored)
+        self.heartbeats.observe(stored)
+
+    # ---------- HTTP ----------
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, _ = request_line.decode('latin-1').split(' ', 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get('content-length') or 0)
+                if length > MAX_BODY_BYTES:
+                    self._respond(writer, 413, {'error': 'body too large'}, close=True)
+                    await writer.drain()
+                    break
+                body = await reader.readexactly(length) if length else b''
+                status, payload, extra = await self._route(method, target, body, headers.get('content-type', ''),
+                                                          headers.get('authorization'))
+                close = headers.get('connection', '').lower() == 'close'
+                self._respond(writer, status, payload, extra, close)
+                await writer.drain()
+                if close:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    def _client(self, authorization):
+        """Name of the client the bearer token belongs to, or None."""
+        scheme, _, token = (authorization or '').partition(' ')
+        if scheme.lower() != 'bearer':
+            return None
+        token = token.strip().encode()
+        # Every token is compared, in constant time, so timing says nothing about which one was close.
+        matches = [name for known, name in self.tokens.items() if hmac.compare_digest(token, known.encode())]
+        return matches[0] if matches else None
+
+    async def _route(self, method, target, body, content_type='', authorization=None):
+        url = urlsplit(target)
+        if url.path in ('/samples', '/rollups') and self._client(authorization) is None:
+            self.stats['unauthorized'] += 1
+            return 401, {'error': 'missing or unknown client token'}, None
+        if url.path == '/samples':
+            if method != 'POST':
+                return 405, {'error': 'use POST'}, None
+            binary = content_type.startswith(BATCH_CONTENT_TYPE)
+            try:
+                if binary:
+                    with instrumentation.stage('ingest.decode_batch'):
+                        payload = decode_samples(body)
+                else:
+                    payload = json.loads(body or b'null')
+            except ValueError as e:
+                return 400, {'error': str(e) if binary else 'invalid JSON'}, None
+            samples = payload if isinstance(payload, list) else [payload]
+            try:
+                rows, errors = await self.submit(samples)
+            except asyncio.QueueFull:
+                return 503, {'error': 'ingest queue full, retry later'}, {'Retry-After': str(RETRY_AFTER_SECONDS)}
+            except StoreUnavailable:
+                return 503, {'error': 'database unavailable, retry later'}, {'Retry-After': str(RETRY_AFTER_SECONDS)}
+            return 200, {'rows': rows, 'errors': errors}, None
+        if url.path == '/rollups' and method == 'GET':
+            query = {k: v[0] for k, v in parse_qs(url.query).items()}
+            if 'start' not in query or 'end' not in query:
+                return 400, {'error': 'start and end are required'}, None
+            return 200, self.rollups.summary(query['start'], query['end'], department=query.get('department'),
+                                             user_id=query.get('user_id')), None
+        if url.path == '/health' and method == 'GET':
+            return 200, dict(self.stats, queued=self._queue.qsize(), inflight=len(self._inflight),
+                             heartbeats=self.heartbeats.stats), None
+        return 404, {'error': 'not found'}, None
+
+    @staticmethod
+    def _respond(writer, status, payload, extra=None, close=False):
+        body = json.dumps(payload, separators=(',', ':'), default=str).encode()
+        head = [f"HTTP/1.1 {status} {REASONS.get(status, '')}", 'Content-Type: application/json',
+                f"Content-Length: {len(body)}", f"Connection: {'close' if close else 'keep-alive'}"]
+        head += [f"{k}: {v}" for k, v in (extra or {}).items()]
+        writer.write(('\r\n'.join(head) + '\r\n\r\n').encode('latin-1') + body)
+
+
+# ---------- client helpers ----------
+
+def _auth_headers(token):
+    return {'Authorization': f"Bearer {token}"} if token else {}
+
+
+def post_samples(url, samples, timeout=30, wire=INGEST_WIRE_FORMAT, token=INGEST_CLIENT_TOKEN):
+    """Send samples to a running service; returns (rows, errors).
+
+    wire="binary" sends a sample_codec batch, falling back to JSON for
+    batches the codec cannot carry. Raises urllib.error.HTTPError (503 when
+    the service is shedding load or cannot reach the database).
+    """
+    body, content_type = None, 'application/json'
+    if wire == 'binary':
+        try:
+            body, content_type = encode_samples(samples), BATCH_CONTENT_TYPE
+        except ValueError:
+            pass  # e.g. an unparseable created_at: JSON lets the service report it per row
+    if body is None:
+        body = json.dumps(samples, default=str).encode()
+    request = urllib.request.Request(f"{url.rstrip('/')}/samples", data=body,
+                                     headers={'Content-Type': content_type, **_auth_headers(token)}, method='POST')
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        result = json.loads(response.read())
+    return result['rows'], result['errors']
+
+
+def fetch_summary(url, start, end, department=None, user_id=None, timeout=30, token=INGEST_CLIENT_TOKEN):
+    """Read a dashboard summary from the service's in-memory rollups."""
+    params = {'start': start, 'end': end}
+    if department is not None:
+        params['department'] = department
+    if user_id is not None:
+        params['user_id'] = user_id
+    request = urllib.request.Request(f"{url.rstrip('/')}/rollups?{urlencode(params)}", headers=_auth_headers(token))
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return json.loads(response.read())
+
+
+async def serve(local=False, host=INGEST_HOST, port=INGEST_PORT):
+    service = IngestionService(LocalSink() if local else SupabaseSink())
+    server = await service.start(host, port)
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batching ingestion service for stress samples.")
+    parser.add_argument('--host', default=INGEST_HOST)
+    parser.add_argument('--port', type=int, default=INGEST_PORT)
+    parser.add_argument('--local', action='store_true', help="run without Supabase (ids assigned in memory)")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.local, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+"""
+instrumentation.py - Hot-Path Timers and Counters
+Per-stage latency histograms for the capture pipeline, database calls and
+chart rendering. Disabled by default; when off every hook is a no-op.
+"""
+
+import json
+import threading
+import time
+from functools import wraps
+from config import PERF_ENABLED, PERF_DUMP_FILE, PERF_DUMP_INTERVAL
+
+
+# Stage names shared by the monitoring pipeline, pages and overlay.
+STAGE_CAPTURE = 'capture'
+STAGE_FACE_MESH = 'face_mesh'
+STAGE_EAR = 'ear'
+STAGE_EMOTION = 'emotion'
+STAGE_PRESENCE = 'presence'
+STAGE_LANDMARK_FLOW = 'landmark_flow'
+STAGE_TK_RENDER = 'tk_render'
+
+# Bucket i holds samples in [2^(i-1), 2^i) microseconds, so 32 buckets
+# cover 1 us to ~35 minutes.
+BUCKETS = 32
+
+enabled = PERF_ENABLED
+
+_stages = {}
+_counters = {}
+_lock = threading.Lock()
+
+
+class StageHistogram:
+    """Log2 latency histogram. Updates are unlocked; a lost increment under
+    contention is an acceptable price for staying off the hot path's critical
+    section."""
+
+    __slots__ = ('name', 'buckets', 'count', 'total_us', 'max_us')
+
+    def __init__(self, name):
+        self.name = name
+        self.buckets = [0] * BUCKETS
+        self.count = 0
+        self.total_us = 0
+        self.max_us = 0
+
+    def add(self, elapsed_us):
+        self.buckets[min(elapsed_us.bit_length(), BUCKETS - 1)] += 1
+        self.count += 1
+        self.total_us += elapsed_us
+        if elapsed_us > self.max_us:
+            self.max_us = elapsed_us
+
+    def percentile(self, fraction):
+        """Upper bound of the bucket holding the given fraction of samples, in ms."""
+        if not self.count:
+            return 0.0
+        target = fraction * self.count
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if seen >= target:
+                return min((1 << i), self.max_us) / 1000
+        return self.max_us / 1000
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'mean_ms': round(self.total_us / self.count / 1000, 3) if self.count else 0.0,
+            'p50_ms': round(self.percentile(0.5), 3),
+            'p95_ms': round(self.percentile(0.95), 3),
+            'max_ms': round(self.max_us / 1000, 3),
+        }
+
+
+def _histogram(name):
+    hist = _stages.get(name)
+    if hist is None:
+        with _lock:
+            hist = _stages.setdefault(name, StageHistogram(name))
+    return hist
+
+
+class _Timer:
+    __slots__ = ('hist', 'start')
+
+    def __init__(self, hist):
+        self.hist = hist
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self.hist.add((time.perf_counter_ns() - self.start) // 1000)
+        return False
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+def stage(name):
+    """Context manager timing one pass through a stage: `with stage('ear'):`."""
+    if not enabled:
+        return _NULL_TIMER
+    return _Timer(_histogram(name))
+
+
+def timed(name):
+    """Decorator form of stage()."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return func(*args, **kwargs)
+            with _Timer(_histogram(name)):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def record(name, elapsed_s):
+    """Add an externally measured duration (seconds) to a stage."""
+    if enabled:
+        _histogram(name).add(int(elapsed_s * 1_000_000))
+
+
+def count(name, n=1):
+    """Bump a plain event counter, e.g. dropped frames."""
+    if not enabled:
+        return
+    if name in _counters:
+        _counters[name] += n
+    else:
+        with _lock:
+            _counters[name] = _counters.get(name, 0) + n
+
+
+def snapshot():
+    """Return {'stages': {name: summary}, 'counters': {...}} at this instant."""
+    # New stages and counters are added under the lock; copy them under it
+    # so a first sample on another thread cannot resize the dicts mid-copy.
+    with _lock:
+        stages = sorted(_stages.items())
+        counters = dict(_counters)
+    return {
+        'time': time.time(),
+        'stages': {name: hist.summary() for name, hist in stages},
+        'counters': counters,
+    }
+
+
+def reset():
+    with _lock:
+        _stages.clear()
+        _counters.clear()
+
+
+def set_enabled(value):
+    """Toggle collection at runtime; hooks check the flag on every call."""
+    global enabled
+    enabled = bool(value)
+    if enabled:
+        start_dumper()
+
+
+# ---------- periodic dump ----------
+
+_dumper = None
+
+
+def _dump_loop(path, interval):
+    while True:
+        time.sleep(interval)
+        if not enabled:
+            continue
+        try:
+            with open(path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(snapshot(), separators=(',', ':')) + '\n')
+        except OSError:
+            pass
+
+
+def start_dumper(path=PERF_DUMP_FILE, interval=PERF_DUMP_INTERVAL):
+    """Append a snapshot line to the dump file every `interval` seconds."""
+    global _dumper
+    if _dumper is None and path and interval:
+        _dumper = threading.Thread(target=_dump_loop, args=(path, interval), name='perf-dump', daemon=True)
+        _dumper.start()
+
+
+if enabled:
+    start_dumper()
@@ -0,0 +1,193 @@
+"""
+landmark_tracker.py - Eye Landmark Tracking Between Face-Mesh Detections
+Runs the full MediaPipe face mesh on every Nth frame and carries the
+LEFT_EYE/RIGHT_EYE landmarks and the face ROI across the frames in between
+with pyramidal Lucas-Kanade optical flow. A forward-backward check scores
+each tracked frame; low confidence, or an eye region that suddenly changes
+(the start of a blink), triggers an immediate re-detection.
+"""
+
+import numpy as np
+from config import (LEFT_EYE, RIGHT_EYE, EAR_THRESHOLD, CONSEC_FRAMES, LANDMARK_DETECT_EVERY,
+                    LANDMARK_MIN_CONFIDENCE, LANDMARK_MAX_FB_ERROR, LANDMARK_EYE_CHANGE)
+from event_log import get_logger
+import instrumentation
+
+try:
+    import cv2
+except ImportError:  # pragma: no cover - listed in requirements.txt
+    cv2 = None
+
+
+EYE_POINTS = tuple(LEFT_EYE) + tuple(RIGHT_EYE)
+# Rigid points (nose bridge, forehead, chin, cheeks) that anchor the ROI and
+# confidence score; eyelids alone move too much to judge the track by.
+ANCHOR_POINTS = (1, 4, 6, 168, 197, 10, 152, 234, 454, 50, 280)
+TRACKED_POINTS = EYE_POINTS + ANCHOR_POINTS
+N_EYE = len(EYE_POINTS)
+
+logger = get_logger('landmarks')
+
+
+def eye_aspect_ratio(eye):
+    """EAR of six (x, y) points ordered like LEFT_EYE/RIGHT_EYE."""
+    vertical = np.linalg.norm(eye[1] - eye[5]) + np.linalg.norm(eye[2] - eye[4])
+    horizontal = np.linalg.norm(eye[0] - eye[3])
+    return float(vertical / (2.0 * horizontal)) if horizontal else 0.0
+
+
+class TrackedFace:
+    """Eye landmarks and face ROI for one frame."""
+
+    __slots__ = ('eyes', 'roi', 'detected', 'confidence')
+
+    def __init__(self, eyes, roi, detected, confidence):
+        self.eyes = eyes  # (12, 2) pixels: LEFT_EYE then RIGHT_EYE
+        self.roi = roi  # (x, y, w, h) pixels
+        self.detected = detected  # True when this frame came from the face mesh
+        self.confidence = confidence
+
+    @property
+    def ear(self):
+        return (eye_aspect_ratio(self.eyes[:6]) + eye_aspect_ratio(self.eyes[6:])) / 2.0
+
+
+class BlinkCounter:
+    """EAR_THRESHOLD / CONSEC_FRAMES blink rule, shared by the live loop and
+    the accuracy benchmark."""
+
+    def __init__(self, threshold=EAR_THRESHOLD, consec_frames=CONSEC_FRAMES):
+        self.threshold = threshold
+        self.consec_frames = consec_frames
+        self.closed = 0
+        self.total = 0
+
+    def update(self, ear):
+        """Feed one EAR sample (None = no face); True when a blink completes."""
+        if ear is not None and ear < self.threshold:
+            self.closed += 1
+            return False
+        blinked = self.closed >= self.consec_frames
+        self.total += blinked
+        self.closed = 0
+        return blinked
+
+
+def mediapipe_detector():
+    """Face mesh callable: BGR frame -> (468, 2) pixel landmarks or None."""
+    import mediapipe as mp
+
+    mesh = mp.solutions.face_mesh.FaceMesh(max_num_faces=1, refine_landmarks=False,
+                                           min_detection_confidence=0.5, min_tracking_confidence=0.5)
+
+    def detect(frame):
+        h, w = frame.shape[:2]
+        results = mesh.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+        if not results.multi_face_landmarks:
+            return None
+        landmarks = results.multi_face_landmarks[0].landmark
+        return np.array([(p.x * w, p.y * h) for p in landmarks], np.float32)
+
+    return detect
+
+
+class LandmarkTracker:
+    """Face mesh every `every` frames, optical flow in between.
+
+    update(frame) returns a TrackedFace, or None when no face is visible.
+    """
+
+    def __init__(self, detector=None, every=LANDMARK_DETECT_EVERY):
+        if cv2 is None:
+            raise RuntimeError("OpenCV is not installed")
+        self.detector = detector or mediapipe_detector()
+        self.every = max(1, every)
+        self.stats = {'frames': 0, 'detections': 0, 'redetects': 0}
+        self._lk = dict(winSize=(21, 21), maxLevel=3,
+                        criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 20, 0.03))
+        self._gray = None
+        self._roi = None
+        self._points = None  # (len(TRACKED_POINTS), 1, 2) float32 for calcOpticalFlowPyrLK
+        self._eye_reference = None
+        self._since_detect = 0
+
+    def reset(self):
+        self._points = None
+
+    def update(self, frame):
+        self.stats['frames'] += 1
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        face = None
+        if self._points is not None and self._since_detect < self.every:
+            face = self._track(gray)
+            if face is None:
+                self.stats['redetects'] += 1
+        if face is None:
+            face = self._detect(frame, gray)
+        self._gray = gray
+        return face
+
+    def _detect(self, frame, gray):
+        self.stats['detections'] += 1
+        self._since_detect = 1
+        with instrumentation.stage(instrumentation.STAGE_FACE_MESH):
+            landmarks = self.detector(frame)
+        if landmarks is None:
+            self._points = None
+            return None
+        points = landmarks[list(TRACKED_POINTS)].astype(np.float32)
+        self._points = points.reshape(-1, 1, 2)
+        self._eye_reference = self._eye_patch(gray, points[:N_EYE])
+        self._roi = _bounds(landmarks)
+        return TrackedFace(points[:N_EYE].copy(), self._roi, True, 1.0)
+
+    def _track(self, gray):
+        with instrumentation.stage(instrumentation.STAGE_LANDMARK_FLOW):
+            forward, status, _ = cv2.calcOpticalFlowPyrLK(self._gray, gray, self._points, None, **self._lk)
+            backward, back_status, _ = cv2.calcOpticalFlowPyrLK(gray, self._gray, forward, None, **self._lk)
+        error = np.linalg.norm((backward - self._points).reshape(-1, 2), axis=1)
+        good = (status.ravel() == 1) & (back_status.ravel() == 1) & (error < LANDMARK_MAX_FB_ERROR)
+        confidence = float(good[N_EYE:].mean())
+        if confidence < LANDMARK_MIN_CONFIDENCE or not good[:N_EYE].all():
+            return None
+        points = forward.reshape(-1, 2)
+        # Lids closing barely move the flow points but change the patch a lot.
+        patch = self._eye_patch(gray, points[:N_EYE])
+        if patch is None or self._eye_reference is None or \
+                np.abs(patch - self._eye_reference).mean() > LANDMARK_EYE_CHANGE:
+            return None
+        # The ROI moves with the median shift of the rigid anchors.
+        anchors = good[N_EYE:]
+        before = self._points.reshape(-1, 2)[N_EYE:][anchors]
+        dx, dy = np.median(points[N_EYE:][anchors] - before, axis=0)
+        x, y, w, h = self._roi
+        self._roi = (int(round(x + dx)), int(round(y + dy)), w, h)
+        self._points = forward
+        self._since_detect += 1
+        return TrackedFace(points[:N_EYE].copy(), self._roi, False, confidence)
+
+    @staticmethod
+    def _eye_patch(gray, eyes):
+        """Both eye regions resampled to a fixed 16x8 grid each, as float32."""
+        patches = []
+        for eye in (eyes[:6], eyes[6:]):
+            x0, y0 = eye.min(axis=0)
+            x1, y1 = eye.max(axis=0)
+            pad = (x1 - x0) * 0.25
+            x0, x1 = int(max(x0 - pad, 0)), int(min(x1 + pad, gray.shape[1]))
+            y0, y1 = int(max(y0 - pad, 0)), int(min(y1 + pad, gray.shape[0]))
+            if x1 - x0 < 2 or y1 - y0 < 2:
+                return None
+            patches.append(cv2.resize(gray[y0:y1, x0:x1], (16, 8), interpolation=cv2.INTER_AREA))
+        return np.concatenate(patches).astype(np.float32)
+
+    @property
+    def detection_ratio(self):
+        """Share of frames that needed the full face mesh."""
+        return self.stats['detections'] / self.stats['frames'] if self.stats['frames'] else 1.0
+
+
+def _bounds(points):
+    x0, y0 = points.min(axis=0)
+    x1, y1 = points.max(axis=0)
+    return int(x0), int(y0), int(x1 - x0), int(y1 - y0)
@@ -0,0 +1,785 @@
+"""
+local_store.py - Offline-First Local Replica of the Supabase Tables
+Keeps a SQLite copy of user1, admins and stress_records that every page reads
+from, and replicates local writes to Supabase in the background via an outbox.
+"""
+
+import json
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from config import OFFLINE_MODE, LOCAL_DB_PATH, SYNC_INTERVAL, SYNC_PAGE_SIZE, INGEST_SERVICE_URL, HISTORY_DAYS
+from supabase_client import supabase
+from event_log import get_logger
+from rollups import RollupStore
+from time_buckets import local_day, local_hour, parse_iso
+from ingestion_service import post_samples
+import instrumentation
+
+try:
+    from postgrest.exceptions import APIError
+except ImportError:  # pragma: no cover - postgrest ships with supabase
+    APIError = None
+
+logger = get_logger('local_store')
+
+# Columns copied out of the JSON row so SQL can filter, sort and aggregate
+# on them without json_extract().
+MATERIALIZED_COLUMNS = {
+    'user1': ('email', 'department', 'created_at'),
+    'admins': ('email', 'created_at'),
+    'stress_records': ('user_id', 'created_at', 'avg_stress_score', 'stress_level', 'dominant_emotion'),
+}
+
+# created_at as UTC epoch seconds, computed when a row is stored. The text
+# orders by separator and offset rather than time ('2025-10-07 20:00:00'
+# sorts before '2025-10-07T18:30:00'), so range filters and ordering use this.
+EPOCH_COLUMNS = {'stress_records': 'created_epoch'}
+
+INDEXES = {
+    'user1': (('email',), ('department',)),
+    'admins': (('email',),),
+    # The created_epoch index covers every aggregated column (and created_at
+    # for local day/hour) so range scans across everyone never touch the row
+    # JSON; (user_id, created_epoch) serves a range scan per user.
+    'stress_records': (('created_epoch', 'user_id', 'avg_stress_score', 'stress_level', 'dominant_emotion',
+                        'created_at'),
+                       ('user_id', 'created_epoch')),
+}
+
+# Small tables are mirrored in full; stress_records is pulled incrementally,
+# starting HISTORY_DAYS back on a new replica.
+SNAPSHOT_TABLES = ('user1', 'admins')
+INCREMENTAL_TABLES = ('stress_records',)
+
+# Credentials never reach local_cache.db: they are left out of the pulled
+# columns and stripped from locally written rows (sign-in checks the server).
+CREDENTIAL_COLUMNS = {'user1': ('password',), 'admins': ('password',)}
+SNAPSHOT_COLUMNS = {
+    'user1': 'id, first_name, last_name, email, phone, role, department, status, stress_events, last_active, '
+             'created_at, updated_at',
+    'admins': 'id, name, email, number, bio',
+}
+
+LOCAL_ID_PREFIX = 'local-'
+
+_COLUMN_RE = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+
+class SyncStatus:
+    """Replication states shown by the sync indicator."""
+    SYNCED = 'synced'
+    SYNCING = 'syncing'
+    PENDING = 'pending'
+    OFFLINE = 'offline'
+
+
+class LocalResponse:
+    """Mimics the postgrest response object the pages already use."""
+
+    def __init__(self, data):
+        self.data = data
+        self.count = len(data)
+
+
+def _is_rejection(error):
+    """Return True if the server answered and refused the request."""
+    return APIError is not None and isinstance(error, APIError)
+
+
+def _epoch(stamp):
+    """UTC epoch seconds of an ISO stamp; None (NULL) if unparseable."""
+    epoch = parse_iso(stamp) if isinstance(stamp, str) else float('nan')
+    return None if epoch != epoch else epoch
+
+
+def _stored_columns(table):
+    epoch = EPOCH_COLUMNS.get(table)
+    return MATERIALIZED_COLUMNS[table] + ((epoch,) if epoch else ())
+
+
+class LocalTable:
+    """Chainable query builder with the same surface as supabase.table()."""
+
+    def __init__(self, store, name):
+        if name not in MATERIALIZED_COLUMNS:
+            raise ValueError(f"Table '{name}' is not replicated locally")
+        self.store = store
+        self.name = name
+        self._action = 'select'
+        self._columns = '*'
+        self._payload = None
+        self._filters = []
+        self._orders = []
+        self._limit = None
+        self._offset = None
+
+    # ---------- actions ----------
+
+    def select(self, columns='*'):
+        self._action = 'select'
+        self._columns = columns
+        return self
+
+    def insert(self, data):
+        self._action = 'insert'
+        self._payload = data
+        return self
+
+    def update(self, data):
+        self._action = 'update'
+        self._payload = data
+        return self
+
+    def delete(self):
+        self._action = 'delete'
+        return self
+
+    # ---------- filters ----------
+
+    def _add_filter(self, op, column, value):
+        self._filters.append((op, column, value))
+        return self
+
+    def eq(self, column, value):
+        return self._add_filter('=', column, value)
+
+    def neq(self, column, value):
+        return self._add_filter('!=', column, value)
+
+    def gt(self, column, value):
+        return self._add_filter('>', column, value)
+
+    def gte(self, column, value):
+        return self._add_filter('>=', column, value)
+
+    def lt(self, column, value):
+        return self._add_filter('<', column, value)
+
+    def lte(self, column, value):
+        return self._add_filter('<=', column, value)
+
+    def ilike(self, column, pattern):
+        return self._add_filter('LIKE', column, pattern)
+
+    def in_(self, column, values):
+        return self._add_filter('IN', column, list(values))
+
+    def order(self, column, desc=False):
+        self._orders.append((column, desc))
+        return self
+
+    def limit(self, count):
+        self._limit = int(count)
+        return self
+
+    def range(self, start, end):
+        self._offset = int(start)
+        self._limit = int(end) - int(start) + 1
+        return self
+
+    # ---------- SQL helpers ----------
+
+    def _column_sql(self, column):
+        if not _COLUMN_RE.match(column):
+            raise ValueError(f"Invalid column name: {column}")
+        if column == 'id' or column in MATERIALIZED_COLUMNS[self.name]:
+            return f'"{column}"'
+        return f"json_extract(data, '$.{column}')"
+
+    def _order_column_sql(self, column):
+        # Time order, not text order, as on the server.
+        if column == 'created_at' and self.name in EPOCH_COLUMNS:
+            return f'"{EPOCH_COLUMNS[self.name]}"'
+        return self._column_sql(column)
+
+    def _where_sql(self):
+        clauses, params = [], []
+        for op, column, value in self._filters:
+            col = self._column_sql(column)
+            if column == 'created_at' and self.name in EPOCH_COLUMNS and op in ('<', '<=', '>', '>='):
+                col, value = f'"{EPOCH_COLUMNS[self.name]}"', _epoch(str(value))
+            if column == 'id':
+                value = [str(v) for v in value] if op == 'IN' else str(value)
+            if op == 'IN':
+                if not value:
+                    clauses.append('0')
+                    continue
+                clauses.append(f"{col} IN ({', '.join('?' * len(value))})")
+                params.extend(value)
+            else:
+                clauses.append(f"{col} {op} ?")
+                params.append(value)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ''
+        return where, params
+
+    def _select_sql(self):
+        where, params = self._where_sql()
+        sql = f'SELECT data FROM "{self.name}"{where}'
+        if self._orders:
+            terms = [f"{self._order_column_sql(c)} {'DESC' if d else 'ASC'}" for c, d in self._orders]
+            sql += f" ORDER BY {', '.join(terms)}"
+        if self._limit is not None:
+            sql += f" LIMIT {self._limit}"
+            if self._offset:
+                sql += f" OFFSET {self._offset}"
+        return sql, params
+
+    def _project(self, rows):
+        if self._columns.strip() == '*':
+            return rows
+        wanted = [c.strip() for c in self._columns.split(',') if c.strip()]
+        return [{c: row.get(c) for c in wanted} for row in rows]
+
+    # ---------- execution ----------
+
+    def execute(self):
+        with instrumentation.stage(f"db.{self.name}.{self._action}"):
+            return self._execute()
+
+    def _execute(self):
+        if self._action != 'insert':
+            self.store.ensure_synced(self.name)
+        if self._action == 'select':
+            sql, params = self._select_sql()
+            rows = [json.loads(r[0]) for r in self.store.query(sql, params)]
+            return LocalResponse(self._project(rows))
+        if self._action == 'insert':
+            return LocalResponse(self.store.local_insert(self.name, self._payload))
+        where, params = self._where_sql()
+        if self._action == 'update':
+            return LocalResponse(self.store.local_update(self.name, self._payload, where, params))
+        return LocalResponse(self.store.local_delete(self.name, where, params))
+
+
+class LocalStore:
+    """SQLite replica plus write-ahead outbox replicated to Supabase."""
+
+    def __init__(self, path=LOCAL_DB_PATH, remote=supabase):
+        self.path = path
+        self.remote = remote
+        self.status = SyncStatus.PENDING
+        self.last_sync = None
+        self.last_error = None
+        self.version = 0  # bumped on every replica change, for result caches
+        self._local = threading.local()
+        self._write_lock = threading.RLock()
+        self._sync_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._listeners = []
+        self._change_listeners = []
+        self._changed = set()  # tables written since listeners last heard
+        self._bootstrapped = set()
+        self._init_schema()
+
+    # ---------- connection / schema ----------
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            # Display-zone day/hour of created_at for rollups and hourly charts.
+            conn.create_function('local_day', 1, local_day, deterministic=True)
+            conn.create_function('local_hour', 1, local_hour, deterministic=True)
+            conn.create_function('iso_epoch', 1, _epoch, deterministic=True)
+            self._local.conn = conn
+        return conn
+
+    def _init_schema(self):
+        conn = self._conn()
+        with self._write_lock, conn:
+            for table in MATERIALIZED_COLUMNS:
+                columns = _stored_columns(table)
+                extra = ''.join(f', "{c}"' for c in columns)
+                conn.execute(f'CREATE TABLE IF NOT EXISTS "{table}" (id TEXT PRIMARY KEY, data TEXT NOT NULL{extra})')
+                # Replicas created by older versions lack newer columns: add and backfill.
+                existing = {r[1] for r in conn.execute(f'PRAGMA table_info("{table}")')}
+                for column in columns:
+                    if column not in existing:
+                        conn.execute(f'ALTER TABLE "{table}" ADD COLUMN "{column}"')
+                        if column == EPOCH_COLUMNS.get(table):
+                            conn.execute(f'UPDATE "{table}" SET "{column}" = iso_epoch(created_at)')
+                        else:
+                            conn.execute(f'''UPDATE "{table}" SET "{column}" = json_extract(data, '$.{column}')''')
+                wanted = {f'idx_{table}_{"_".join(index)}': index for index in INDEXES[table]}
+                for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = ? "
+                                            "AND name LIKE 'idx_%'", (table,)).fetchall():
+                    if name not in wanted:
+                        conn.execute(f'DROP INDEX "{name}"')
+                for name, index in wanted.items():
+                    names = ', '.join(f'"{c}"' for c in index)
+                    conn.execute(f'CREATE INDEX IF NOT EXISTS "{name}" ON "{table}" ({names})')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS outbox ('
+                'seq INTEGER PRIMARY KEY AUTOINCREMENT, table_name TEXT NOT NULL, op TEXT NOT NULL, '
+                'row_id TEXT NOT NULL, payload TEXT, queued_at REAL NOT NULL, '
+                'attempts INTEGER DEFAULT 0, last_error TEXT, base TEXT)'
+            )
+            if 'base' not in {r[1] for r in conn.execute('PRAGMA table_info(outbox)')}:
+                conn.execute('ALTER TABLE outbox ADD COLUMN base TEXT')
+            conn.execute('CREATE TABLE IF NOT EXISTS sync_state (table_name TEXT PRIMARY KEY, watermark TEXT, synced_at REAL, '
+                         'since TEXT)')
+            if 'since' not in {r[1] for r in conn.execute('PRAGMA table_info(sync_state)')}:
+                conn.execute('ALTER TABLE sync_state ADD COLUMN since TEXT')
+            # Replicas written by older versions still hold credentials.
+            for table, columns in CREDENTIAL_COLUMNS.items():
+                for column in columns:
+                    conn.execute(f"""UPDATE "{table}" SET data = json_remove(data, '$.{column}') """
+                                 f"""WHERE json_type(data, '$.{column}') IS NOT NULL""")
+
+    @contextmanager
+    def transaction(self):
+        """Serialized write transaction on this thread's connection."""
+        conn = self._conn()
+        with self._write_lock, conn:
+            yield conn
+
+    def query(self, sql, params=()):
+        return self._conn().execute(sql, params).fetchall()
+
+    def table(self, name):
+        self.start()
+        return LocalTable(self, name)
+
+    # ---------- listeners ----------
+
+    def add_listener(self, callback):
+        """Register callback(table, rows) fired for rows new to the replica."""
+        self._listeners.append(callback)
+
+    def add_change_listener(self, callback):
+        """Register callback(table) fired after any row of the table was
+        added, changed or removed, e.g. to drop caches derived from it."""
+        self._change_listeners.append(callback)
+
+    def _notify(self, table, rows):
+        if not rows:
+            return
+        for callback in list(self._listeners):
+            try:
+                callback(table, rows)
+            except Exception as e:
+                logger.error("❌ Local store listener failed: %s", e)
+
+    def _notify_changes(self):
+        with self._write_lock:
+            tables, self._changed = self._changed, set()
+        for table in sorted(tables):
+            for callback in list(self._change_listeners):
+                try:
+                    callback(table)
+                except Exception as e:
+                    logger.error("❌ Local store listener failed: %s", e)
+
+    def ingest(self, table, rows):
+        """Store rows pushed from outside the sync loop (e.g. Realtime inserts).
+
+        Listeners fire for the ones the replica had not seen yet, so a row that
+        arrives both by push and by the next pull is only handled once.
+        """
+        with self.transaction() as conn:
+            new_rows = self._store_rows(conn, table, rows)
+        self._notify(table, new_rows)
+        self._notify_changes()
+        return new_rows
+
+    # ---------- row storage ----------
+
+    def _store_rows(self, conn, table, rows):
+        """Upsert rows and return the ones that were not present before.
+        Caller holds the write lock."""
+        columns = _stored_columns(table)
+        epoch = EPOCH_COLUMNS.get(table)
+        placeholders = ', '.join('?' * (len(columns) + 2))
+        names = ''.join(f', "{c}"' for c in columns)
+        hidden = CREDENTIAL_COLUMNS.get(table, ())
+        new_rows = []
+        self.version += 1
+        for row in rows:
+            row_id = str(row['id'])
+            exists = conn.execute(f'SELECT data FROM "{table}" WHERE id = ?', (row_id,)).fetchone()
+            data = {k: v for k, v in row.items() if k not in hidden} if hidden else row
+            text = json.dumps(data, default=str)
+            conn.execute(
+                f'INSERT OR REPLACE INTO "{table}" (id, data{names}) VALUES ({placeholders})',
+                [row_id, text] + [_epoch(row.get('created_at')) if c == epoch else row.get(c) for c in columns]
+            )
+            if not exists:
+                new_rows.append(row)
+            if not exists or exists[0] != text:
+                self._changed.add(table)
+        return new_rows
+
+    def _matching_rows(self, conn, table, where, params):
+        return [json.loads(r[0]) for r in conn.execute(f'SELECT data FROM "{table}"{where}', params).fetchall()]
+
+    def _enqueue(self, conn, table, op, row_id, payload=None, base=None):
+        """Queue an op. For updates, base holds the changed columns' values
+        the edit was made against, for conflict checks at push time."""
+        conn.execute(
+            'INSERT INTO outbox (table_name, op, row_id, payload, queued_at, base) VALUES (?, ?, ?, ?, ?, ?)',
+            (table, op, str(row_id), json.dumps(payload, default=str) if payload is not None else None, time.time(),
+             json.dumps(base, default=str) if base is not None else None)
+        )
+
+    def _pending_op(self, conn, table, op, row_id):
+        return conn.execute(
+            "SELECT seq, payload, base FROM outbox WHERE table_name = ? AND op = ? AND row_id = ?",
+            (table, op, str(row_id))
+        ).fetchone()
+
+    def _pending_insert(self, conn, table, row_id):
+        return self._pending_op(conn, table, 'insert', row_id)
+
+    # ---------- local writes ----------
+
+    def local_insert(self, table, payload):
+        rows = payload if isinstance(payload, list) else [payload]
+        stored = []
+        conn = self._conn()
+        with self._write_lock, conn:
+            for row in rows:
+                row = dict(row)
+                outgoing = dict(row)
+                row.setdefault('id', f"{LOCAL_ID_PREFIX}{uuid.uuid4().hex}")
+                self._store_rows(conn, table, [row])
+                self._enqueue(conn, table, 'insert', row['id'], outgoing)
+                stored.append(row)
+        self._notify(table, stored)
+        self._notify_changes()
+        self._wake.set()
+        return stored
+
+    def local_update(self, table, changes, where, params):
+        conn = self._conn()
+        with self._write_lock, conn:
+            rows = self._matching_rows(conn, table, where, params)
+            for row in rows:
+                base = {column: row.get(column) for column in changes}
+                row.update(changes)
+                self._store_rows(conn, table, [row])
+                pending = self._pending_insert(conn, table, row['id'])
+                queued = None if pending else self._pending_op(conn, table, 'update', row['id'])
+                if pending:
+                    # Not on the server yet: fold the change into the insert.
+                    merged = json.loads(pending[1])
+                    merged.update(changes)
+                    conn.execute('UPDATE outbox SET payload = ? WHERE seq = ?',
+                                 (json.dumps(merged, default=str), pending[0]))
+                elif queued:
+                    # Fold into the unsent update; its base stays what the server last showed us.
+                    merged = dict(json.loads(queued[1]), **changes)
+                    merged_base = dict(base, **json.loads(queued[2] or '{}'))
+                    conn.execute('UPDATE outbox SET payload = ?, base = ? WHERE seq = ?',
+                                 (json.dumps(merged, default=str), json.dumps(merged_base, default=str), queued[0]))
+                else:
+                    self._enqueue(conn, table, 'update', row['id'], changes, base)
+        self._notify_changes()
+        self._wake.set()
+        return rows
+
+    def local_delete(self, table, where, params):
+        conn = self._conn()
+        with self._write_lock, conn:
+            rows = self._matching_rows(conn, table, where, params)
+            self.version += 1
+            if rows:
+                self._changed.add(table)
+            for row in rows:
+                conn.execute(f'DELETE FROM "{table}" WHERE id = ?', (str(row['id']),))
+                pending = self._pending_insert(conn, table, row['id'])
+                if pending:
+                    conn.execute('DELETE FROM outbox WHERE table_name = ? AND row_id = ?',
+                                 (table, str(row['id'])))
+                else:
+                    self._enqueue(conn, table, 'delete', row['id'])
+        self._notify_changes()
+        self._wake.set()
+        return rows
+
+    def local_rpc(self, table, function, params, rows=()):
+        """Queue a server function call that changes `table`, storing
+        `rows` as its expected local effect. The server applies the call
+        itself (e.g. adding deltas atomically); the next pull brings its result."""
+        conn = self._conn()
+        with self._write_lock, conn:
+            self._store_rows(conn, table, rows)
+            self._enqueue(conn, table, 'rpc', function, params)
+        self._notify_changes()
+        self._wake.set()
+
+    # ---------- replication ----------
+
+    def pending_count(self):
+        return self.query('SELECT COUNT(*) FROM outbox')[0][0]
+
+    def start(self):
+        """Start the background replicator once."""
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name='local-store-sync', daemon=True)
+                    self._thread.start()
+
+    def request_sync(self):
+        self._wake.set()
+
+    def ensure_synced(self, table):
+        """Block on the very first pull of this table so an empty replica is
+        never served; other tables are left to the background replicator."""
+        if table in self._bootstrapped:
+            return
+        self._bootstrapped.add(table)
+        if not self.query('SELECT 1 FROM sync_state WHERE table_name = ?', (table,)):
+            self.sync_once((table,))
+
+    def covers(self, table, start):
+        """Whether the replica holds every row of `table` from the UTC ISO
+        time `start` on. A new replica only pulls HISTORY_DAYS back; older
+        ranges have to be read from Supabase."""
+        state = self.query('SELECT since FROM sync_state WHERE table_name = ?', (table,))
+        if not state:
+            return False  # never pulled
+        # No start recorded: the first pull (or an older version's) had no lower bound.
+        return state[0][0] is None or parse_iso(start) >= parse_iso(state[0][0])
+
+    def _run(self):
+        while True:
+            self.sync_once()
+            self._wake.wait(SYNC_INTERVAL)
+            self._wake.clear()
+
+    def sync_once(self, tables=None):
+        """Push the outbox, then pull remote changes (of every table, or only
+        the given ones). Safe to call from any thread."""
+        with self._sync_lock, instrumentation.stage('supabase.sync'):
+            self.status = SyncStatus.SYNCING
+            try:
+                self._push_outbox()
+                for table in SNAPSHOT_TABLES:
+                    if tables is None or table in tables:
+                        self._pull_snapshot(table)
+                for table in INCREMENTAL_TABLES:
+                    if tables is None or table in tables:
+                        self._pull_incremental(table)
+            except Exception as e:
+                self.status = SyncStatus.OFFLINE
+                self.last_error = str(e)
+                logger.warning("⚠️ Sync paused, working offline: %s", e)
+                return False
+            finally:
+                self._notify_changes()
+            self.last_sync = time.time()
+            self.last_error = None
+            self.status = SyncStatus.PENDING if self.pending_count() else SyncStatus.SYNCED
+            return True
+
+    def _push_outbox(self):
+        conn = self._conn()
+        while True:
+            ops = conn.execute(
+                'SELECT seq, table_name, op, row_id, payload, queued_at, base FROM outbox ORDER BY seq LIMIT ?',
+                (SYNC_PAGE_SIZE,)
+            ).fetchall()
+            if not ops:
+                return
+            # Consecutive inserts into the same table go up as one bulk insert.
+            table, op = ops[0][1], ops[0][2]
+            if op == 'insert':
+                batch = ops[:next((i for i, o in enumerate(ops) if o[1] != table or o[2] != 'insert'), len(ops))]
+                self._push_inserts(table, batch)
+            else:
+                self._push_single(ops[0])
+
+    def _reject(self, ops, error):
+        """Server refused the writes: server state wins, drop the ops.
+
+        A refused insert also takes its local- row out of the replica; no
+        pull would ever reconcile it away.
+        """
+        conn = self._conn()
+        logger.warning("⚠️ Server rejected local change, keeping server copy: %s", error)
+        with self._write_lock, conn:
+            conn.executemany('DELETE FROM outbox WHERE seq = ?', [(o[0],) for o in ops])
+            for _, table, op, row_id, *_ in ops:
+                if op == 'insert':
+                    conn.execute(f'DELETE FROM "{table}" WHERE id = ?', (row_id,))
+                    self._changed.add(table)
+                    self.version += 1
+
+    def _push_inserts(self, table, batch):
+        payloads = [json.loads(o[4]) for o in batch]
+        if table == 'stress_records' and INGEST_SERVICE_URL:
+            # The ingestion service batches many clients into one bulk insert;
+            # a 503 raises and the batch is retried next round.
+            server_rows, errors = post_samples(INGEST_SERVICE_URL, payloads)
+            # Only samples that failed validation are refused for good; a
+            # database outage is a 503 and never reaches this point.
+            invalid = [e for e in errors if e.get('kind') == 'invalid']
+            refused = {e['index'] for e in invalid}
+            if refused:
+                self._reject([batch[i] for i in sorted(refused)], invalid[0]['error'])
+        else:
+            refused = set()
+            try:
+                server_rows = self.remote.table(table).insert(payloads).execute().data or []
+            except Exception as e:
+                if not _is_rejection(e):
+                    raise
+                self._reject(batch, e)
+                return
+        conn = self._conn()
+        with self._write_lock, conn:
+            # Swap each temporary local id for the row the server created.
+            settled = []
+            for op, sent, server_row in zip(batch, payloads, server_rows):
+                if server_row is None:
+                    continue  # refused (_reject dropped the op and its row) or not stored
+                self._settle_insert(conn, table, op, sent, server_row)
+                settled.append(op[0])
+            # Ops the server returned nothing for stay queued and go out again.
+            conn.executemany('DELETE FROM outbox WHERE seq = ?', [(seq,) for seq in settled])
+        if len(settled) + len(refused) < len(batch):
+            # End this round instead of resending the same head of the outbox at once.
+            raise RuntimeError(f"{len(batch) - len(settled) - len(refused)} inserts into {table} were not stored")
+
+    def _settle_insert(self, conn, table, op, sent, server_row):
+        """Replace a pushed insert's local- row with the server's row.
+
+        The network call runs unlocked, so the row may have changed
+        meanwhile: local_update folds edits into the pending insert's
+        payload, and those go back out as an update of the server row;
+        a local delete in that window deletes the server row.
+        """
+        queued = conn.execute('SELECT payload FROM outbox WHERE seq = ?', (op[0],)).fetchone()
+        conn.execute(f'DELETE FROM "{table}" WHERE id = ?', (op[3],))
+        if queued is None:
+            self._enqueue(conn, table, 'delete', server_row['id'])
+            return
+        latest = json.loads(queued[0])
+        changes = {k: v for k, v in latest.items() if k not in sent or sent[k] != v}
+        if changes:
+            self._enqueue(conn, table, 'update', server_row['id'], changes,
+                          {column: server_row.get(column) for column in changes})
+            server_row = dict(server_row, **changes)
+        self._store_rows(conn, table, [server_row])
+
+    def _push_single(self, op_row):
+        seq, table, op, row_id, payload, _, base = op_row
+        remote_table = self.remote.table(table)
+        try:
+            if op == 'update':
+                changes = json.loads(payload)
+                current = remote_table.select('*').eq('id', row_id).execute().data
+                server_row = current[0] if current else None
+                if server_row is None or self._conflicts(server_row, json.loads(base or '{}')):
+                    # Deleted, or a column we changed was changed on the server too: server wins.
+                    self._reject([op_row], 'row changed on server')
+                    if server_row is not None:
+                        with self._write_lock, self._conn():
+                            self._store_rows(self._conn(), table, [server_row])
+                    return
+                response = self.remote.table(table).update(changes).eq('id', server_row['id']).execute()
+                if response.data:
+                    with self._write_lock, self._conn():
+                        self._store_rows(self._conn(), table, response.data)
+            elif op == 'rpc':
+                self.remote.rpc(row_id, json.loads(payload)).execute()
+            else:
+                remote_table.delete().eq('id', row_id).execute()
+        except Exception as e:
+            if not _is_rejection(e):
+                raise
+            self._reject([op_row], e)
+            return
+        conn = self._conn()
+        with self._write_lock, conn:
+            conn.execute('DELETE FROM outbox WHERE seq = ?', (seq,))
+
+    @staticmethod
+    def _conflicts(server_row, base):
+        """True when the server no longer holds, for some column this edit
+        changes, the value the edit was made against. Edits to columns
+        nobody else touched apply; ops queued without a base always apply."""
+        return any(server_row.get(column) != value and str(server_row.get(column)) != str(value)
+                   for column, value in base.items())
+
+    def _pending_ids(self, table):
+        return {r[0] for r in self.query('SELECT row_id FROM outbox WHERE table_name = ?', (table,))}
+
+    def _fetch_pages(self, table, build):
+        rows, start = [], 0
+        while True:
+            page = build(self.remote.table(table)).range(start, start + SYNC_PAGE_SIZE - 1).execute().data or []
+            rows.extend(page)
+            if len(page) < SYNC_PAGE_SIZE:
+                return rows
+            start += SYNC_PAGE_SIZE
+
+    def _pull_snapshot(self, table):
+        rows = self._fetch_pages(table, lambda t: t.select(SNAPSHOT_COLUMNS[table]).order('id'))
+        pending = self._pending_ids(table)
+        remote_ids = {str(r['id']) for r in rows}
+        conn = self._conn()
+        with self._write_lock, conn:
+            # Rows with unsent local edits keep the local version until pushed.
+            new_rows = self._store_rows(conn, table, [r for r in rows if str(r['id']) not in pending])
+            for (row_id,) in conn.execute(f'SELECT id FROM "{table}"').fetchall():
+                if row_id not in remote_ids and row_id not in pending and not row_id.startswith(LOCAL_ID_PREFIX):
+                    conn.execute(f'DELETE FROM "{table}" WHERE id = ?', (row_id,))
+                    self._changed.add(table)
+                    self.version += 1
+            self._mark_synced(conn, table, None)
+        self._notify(table, new_rows)
+
+    def _pull_incremental(self, table):
+        state = self.query('SELECT watermark FROM sync_state WHERE table_name = ?', (table,))
+        watermark = state[0][0] if state else None
+        if watermark is not None and watermark.isdigit():
+            # The watermark is the server-assigned id, not created_at: a record
+            # stamped earlier but uploaded later (an offline desktop catching
+            # up) still has a new id and is pulled.
+            def build(t):
+                return t.select('*').order('id').gt('id', int(watermark))
+        else:
+            # A new replica starts HISTORY_DAYS back instead of at the first
+            # record ever; one written by an older version catches up once from
+            # its created_at watermark.
+            since = watermark or (datetime.now(timezone.utc) - timedelta(days=HISTORY_DAYS)).isoformat()
+
+            def build(t):
+                return t.select('*').order('id').gte('created_at', since)
+
+        rows = self._fetch_pages(table, build)
+        conn = self._conn()
+        with self._write_lock, conn:
+            new_rows = self._store_rows(conn, table, rows)
+            ids = [int(r['id']) for r in rows if str(r.get('id')).isdigit()]
+            if not state:
+                # First pull: remember where the replica's history starts.
+                conn.execute('INSERT OR REPLACE INTO sync_state (table_name, since) VALUES (?, ?)', (table, since))
+            if ids:
+                watermark = str(max(ids))
+            self._mark_synced(conn, table, watermark)
+        self._notify(table, new_rows)
+
+    def _mark_synced(self, conn, table, watermark):
+        conn.execute('INSERT INTO sync_state (table_name, watermark, synced_at) VALUES (?, ?, ?) '
+                     'ON CONFLICT (table_name) DO UPDATE SET watermark = excluded.watermark, '
+                     'synced_at = excluded.synced_at', (table, watermark, time.time()))
+
+
+# Pages import `db` and use it exactly like the Supabase client.
+store = LocalStore() if OFFLINE_MODE else None
+db = store if OFFLINE_MODE else supabase
+
+# Rollups subscribe here so every process that syncs keeps them current.
+rollups = RollupStore(store) if OFFLINE_MODE else None
@@ -6,8 +6,11 @@ It imports and initializes all components.
 
 import tkinter as tk
 from app import StressMonitorApp
+import session_memory
 
 if __name__ == "__main__":
     root = tk.Tk()
     app = StressMonitorApp(root)
+    # Figures and images are disposed on every page change.
+    session_memory.install(app)
     root.mainloop()
\ No newline at end of file
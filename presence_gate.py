@@ -0,0 +1,165 @@
+"""
+presence_gate.py - Motion and Presence Gating for the Monitoring Loop
+Decides per frame whether the full face-mesh pipeline should run. While the
+employee is at the desk every frame passes. Once no face has been seen for
+ACTIVITY_TIMEOUT the gate goes idle: the camera is dropped to IDLE_FPS and
+each frame only gets a downscaled grayscale difference plus an occasional
+Haar face check. The first frame with motion wakes it back up.
+"""
+
+import time
+from config import (FPS, ACTIVITY_TIMEOUT, PRESENCE_GATE, IDLE_FPS, PRESENCE_DIFF_SIZE,
+                    PRESENCE_PIXEL_DELTA, PRESENCE_MOTION_RATIO, PRESENCE_FACE_CHECK_SECONDS)
+from event_log import get_logger
+import instrumentation
+
+try:
+    import cv2
+except ImportError:  # pragma: no cover - listed in requirements.txt
+    cv2 = None
+
+
+ACTIVE = 'active'
+IDLE = 'idle'
+
+logger = get_logger('presence')
+
+
+class PresenceGate:
+    """Per-capture gate: call admit(frame) before the face mesh and
+    report(face_found) after it.
+
+        if gate.admit(frame):
+            results = face_mesh.process(rgb)
+            gate.report(bool(results.multi_face_landmarks))
+        root.after(gate.delay_ms, update_frame)
+    """
+
+    def __init__(self, capture=None, idle_after=ACTIVITY_TIMEOUT, active_fps=FPS, idle_fps=IDLE_FPS,
+                 enabled=PRESENCE_GATE):
+        self.capture = capture
+        self.idle_after = idle_after
+        self.active_fps = active_fps
+        self.idle_fps = idle_fps
+        self.enabled = enabled and cv2 is not None
+        self.state = ACTIVE
+        self.stats = {'frames': 0, 'admitted': 0, 'wakes': 0, 'face_checks': 0, 'idle_seconds': 0.0}
+        self._last_face = time.monotonic()
+        self._idle_since = None
+        self._next_face_check = 0.0
+        self._previous = None
+        self._cascade = None
+        if enabled and cv2 is None:
+            logger.warning("⚠️ OpenCV unavailable, presence gating is off")
+
+    @property
+    def idle(self):
+        return self.state == IDLE
+
+    @property
+    def delay_ms(self):
+        """Milliseconds until the next frame is worth reading."""
+        return max(1, int(1000 / (self.idle_fps if self.idle else self.active_fps)))
+
+    # ---------- per frame ----------
+
+    def admit(self, frame, now=None):
+        """True if this frame should go through the full pipeline."""
+        self.stats['frames'] += 1
+        if not self.enabled:
+            self.stats['admitted'] += 1
+            return True
+        now = time.monotonic() if now is None else now
+        if self.idle:
+            with instrumentation.stage(instrumentation.STAGE_PRESENCE):
+                woke = self._check_idle(frame, now)
+            if not woke:
+                instrumentation.count('presence.skipped')
+                return False
+        self.stats['admitted'] += 1
+        return True
+
+    def report(self, face_found, now=None):
+        """Feed back whether the face mesh found a face in an admitted frame."""
+        if not self.enabled:
+            return
+        now = time.monotonic() if now is None else now
+        if face_found:
+            self._last_face = now
+        elif not self.idle and now - self._last_face >= self.idle_after:
+            self._enter_idle(now)
+
+    # ---------- state changes ----------
+
+    def _check_idle(self, frame, now):
+        small = self._downscale(frame)
+        previous, self._previous = self._previous, small
+        if previous is not None and self._moved(previous, small):
+            self._wake(now, 'motion')
+            return True
+        if now >= self._next_face_check:
+            self._next_face_check = now + PRESENCE_FACE_CHECK_SECONDS
+            self.stats['face_checks'] += 1
+            if self._face_visible(small):
+                self._wake(now, 'face')
+                return True
+        return False
+
+    def _enter_idle(self, now):
+        self.state = IDLE
+        self._idle_since = now
+        self._previous = None
+        self._next_face_check = now + PRESENCE_FACE_CHECK_SECONDS
+        self._set_camera_fps(self.idle_fps)
+        logger.info("No face for %ss, monitoring idles at %s fps", self.idle_after, self.idle_fps)
+
+    def _wake(self, now, reason):
+        self.state = ACTIVE
+        self.stats['wakes'] += 1
+        self.stats['idle_seconds'] += now - self._idle_since
+        self._idle_since = None
+        # Counts as a sighting so one empty frame does not send us straight back.
+        self._last_face = now
+        self._set_camera_fps(self.active_fps)
+        logger.info("Presence detected (%s), monitoring back at %s fps", reason, self.active_fps)
+
+    def _set_camera_fps(self, fps):
+        # Many webcams ignore this; delay_ms still throttles the read loop.
+        if self.capture is not None:
+            try:
+                self.capture.set(cv2.CAP_PROP_FPS, fps)
+            except Exception as e:
+                logger.debug("Camera refused %s fps: %s", fps, e)
+
+    # ---------- cheap checks ----------
+
+    @staticmethod
+    def _downscale(frame):
+        gray = frame if frame.ndim == 2 else cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        return cv2.resize(gray, PRESENCE_DIFF_SIZE, interpolation=cv2.INTER_AREA)
+
+    @staticmethod
+    def _moved(previous, current):
+        diff = cv2.absdiff(previous, current)
+        _, changed = cv2.threshold(diff, PRESENCE_PIXEL_DELTA, 255, cv2.THRESH_BINARY)
+        return cv2.countNonZero(changed) > PRESENCE_MOTION_RATIO * changed.size
+
+    def _face_visible(self, small):
+        if self._cascade is None:
+            try:
+                self._cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+            except AttributeError:  # OpenCV builds without objdetect: motion only
+                logger.warning("⚠️ Haar cascades unavailable, idle mode wakes on motion only")
+                self._cascade = False
+        if not self._cascade:
+            return False
+        faces = self._cascade.detectMultiScale(small, scaleFactor=1.2, minNeighbors=3, minSize=(16, 16))
+        return len(faces) > 0
+
+    def snapshot(self, now=None):
+        """Counters for the perf overlay / logs, including the current idle stretch."""
+        now = time.monotonic() if now is None else now
+        stats = dict(self.stats, state=self.state)
+        if self._idle_since is not None:
+            stats['idle_seconds'] += now - self._idle_since
+        return stats
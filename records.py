@@ -0,0 +1,311 @@
+"""
+records.py - Typed Record Models for Users, Admins and Stress Records
+Slotted dataclasses for user1/admins rows and a column-oriented
+StressRecordBatch for stress_records, parsed once from query results.
+"""
+
+import json
+from array import array
+from dataclasses import dataclass, field, fields
+from datetime import datetime, timezone
+import numpy as np
+from rollups import HIGH_STRESS_SCORE
+from time_buckets import parse_iso_array, bucket, hour_of_day
+
+
+UNKNOWN = 'Unknown'
+
+
+class _RowAccess:
+    """Mapping-style reads (record['email'], record.get(...)) for code that
+    still treats rows as dicts."""
+
+    __slots__ = ()
+
+    def get(self, key, default=None):
+        if key in self._field_names():
+            value = getattr(self, key)
+            return default if value is None else value
+        return self.extra.get(key, default)
+
+    def __getitem__(self, key):
+        if key in self._field_names():
+            return getattr(self, key)
+        return self.extra[key]
+
+    def __contains__(self, key):
+        return key in self._field_names() or key in self.extra
+
+    @classmethod
+    def _field_names(cls):
+        names = cls.__dict__.get('_names')
+        if names is None:
+            names = dict.fromkeys(f.name for f in fields(cls) if f.name != 'extra')
+            setattr(cls, '_names', names)
+        return names
+
+    @classmethod
+    def from_row(cls, row):
+        """Build from a response row; unmodelled columns land in .extra."""
+        known = cls._field_names()
+        values = {k: v for k, v in row.items() if k in known}
+        return cls(**values, extra={k: v for k, v in row.items() if k not in known})
+
+    @classmethod
+    def from_rows(cls, rows):
+        return [cls.from_row(row) for row in rows or ()]
+
+    def to_row(self):
+        """Plain dict for inserts/updates and edit forms."""
+        row = {name: getattr(self, name) for name in self._field_names()}
+        row.update(self.extra)
+        return row
+
+
+@dataclass(slots=True)
+class User(_RowAccess):
+    id: object = None
+    first_name: str = ''
+    last_name: str = ''
+    email: str = ''
+    phone: str = ''
+    password: str = ''
+    role: str = 'User'
+    department: str = ''
+    status: str = 'Active'
+    stress_events: int = 0
+    last_active: str = None
+    created_at: str = None
+    updated_at: str = None
+    extra: dict = field(default_factory=dict)
+
+    @property
+    def full_name(self):
+        return f"{self.first_name or ''} {self.last_name or ''}".strip() or self.email or 'User'
+
+
+@dataclass(slots=True)
+class Admin(_RowAccess):
+    id: object = None
+    name: str = ''
+    email: str = ''
+    password: str = ''
+    number: str = ''
+    bio: str = ''
+    created_at: str = None
+    updated_at: str = None
+    extra: dict = field(default_factory=dict)
+
+    @property
+    def full_name(self):
+        return self.name or self.email or 'Admin'
+
+
+# ---------- stress records ----------
+
+class _Categories:
+    """String -> small int code table."""
+
+    __slots__ = ('codes', 'values')
+
+    def __init__(self):
+        self.codes = {}
+        self.values = []
+
+    def code(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+
+class _BatchBuilder:
+    """Appends one record at a time into typed arrays; created_at strings are
+    parsed and bucketed together in build()."""
+
+    def __init__(self):
+        self.users = _Categories()
+        self.levels, self.emotions = _Categories(), _Categories()
+        self.user_codes = array('i')
+        self.level_codes, self.emotion_codes = array('H'), array('H')
+        self.stamps, self.scores = [], array('d')
+
+    def add(self, user_id, created_at, score, level, emotion):
+        self.user_codes.append(self.users.code(user_id))
+        self.stamps.append(created_at or '')
+        self.scores.append(float(score or 0))
+        self.level_codes.append(self.levels.code(level or UNKNOWN))
+        self.emotion_codes.append(self.emotions.code(emotion or UNKNOWN))
+
+    def add_row(self, row):
+        self.add(row.get('user_id'), row.get('created_at'), row.get('avg_stress_score'),
+                 row.get('stress_level'), row.get('dominant_emotion'))
+
+    def build(self):
+        def column(values, dtype):
+            return np.frombuffer(values, dtype=dtype) if len(values) else np.empty(0, dtype)
+
+        timestamps = parse_iso_array(self.stamps)
+        day_codes, days = bucket(timestamps, 'day')
+        return StressRecordBatch(
+            self.users.values, column(self.user_codes, np.int32),
+            timestamps, column(self.scores, np.float64),
+            days, day_codes.astype(np.int32), hour_of_day(timestamps),
+            self.levels.values, column(self.level_codes, np.uint16),
+            self.emotions.values, column(self.emotion_codes, np.uint16))
+
+
+class StressRecordBatch:
+    """stress_records as columns: ~30 bytes per record instead of a dict.
+
+    user_id, day ('YYYY-MM-DD' in DISPLAY_TIMEZONE), stress_level and
+    dominant_emotion are stored as codes into small category lists;
+    created_at is parsed once into epoch seconds and hours are local too.
+    """
+
+    __slots__ = ('user_ids', 'user_codes', 'timestamps', 'scores', 'days', 'day_codes', 'hours',
+                 'levels', 'level_codes', 'emotions', 'emotion_codes')
+
+    def __init__(self, user_ids, user_codes, timestamps, scores, days, day_codes, hours,
+                 levels, level_codes, emotions, emotion_codes):
+        self.user_ids = user_ids
+        self.user_codes = user_codes
+        self.timestamps = timestamps
+        self.scores = scores
+        self.days = days
+        self.day_codes = day_codes
+        self.hours = hours
+        self.levels = levels
+        self.level_codes = level_codes
+        self.emotions = emotions
+        self.emotion_codes = emotion_codes
+
+    # ---------- construction ----------
+
+    @classmethod
+    def empty(cls):
+        return _BatchBuilder().build()
+
+    @classmethod
+    def from_rows(cls, rows):
+        """One pass over response dicts (e.g. `response.data`)."""
+        builder = _BatchBuilder()
+        for row in rows or ():
+            builder.add_row(row)
+        return builder.build()
+
+    @classmethod
+    def from_pages(cls, pages):
+        """Like from_rows over an iterable of pages, without joining them."""
+        builder = _BatchBuilder()
+        for page in pages:
+            for row in page:
+                builder.add_row(row)
+        return builder.build()
+
+    @classmethod
+    def from_tuples(cls, rows):
+        """(user_id, created_at, score, level, emotion) tuples, e.g. from SQLite."""
+        builder = _BatchBuilder()
+        for row in rows:
+            builder.add(*row)
+        return builder.build()
+
+    @classmethod
+    def from_json(cls, text):
+        """Parse a JSON array of records straight into columns; the per-row
+        dicts are dropped as soon as they are decoded."""
+        builder = _BatchBuilder()
+
+        def hook(obj):
+            if 'avg_stress_score' in obj:
+                builder.add_row(obj)
+                return None
+            return obj
+
+        json.loads(text, object_hook=hook)
+        return builder.build()
+
+    def take(self, index):
+        """Sub-batch for an index array or boolean mask (categories shared)."""
+        return StressRecordBatch(
+            self.user_ids, self.user_codes[index], self.timestamps[index], self.scores[index],
+            self.days, self.day_codes[index], self.hours[index],
+            self.levels, self.level_codes[index], self.emotions, self.emotion_codes[index])
+
+    def split_by_user(self):
+        """{user_id: sub-batch} in one sort."""
+        if not len(self):
+            return {}
+        order = np.argsort(self.user_codes, kind='stable')
+        codes = self.user_codes[order]
+        bounds = np.flatnonzero(np.diff(codes)) + 1
+        return {self.user_ids[codes[part[0]]]: self.take(order[part[0]:part[-1] + 1])
+                for part in np.split(np.arange(len(codes)), bounds)}
+
+    def __len__(self):
+        return len(self.scores)
+
+    @property
+    def nbytes(self):
+        return sum(getattr(self, name).nbytes for name in
+                   ('user_codes', 'timestamps', 'scores', 'day_codes', 'hours', 'level_codes', 'emotion_codes'))
+
+    # ---------- aggregates ----------
+
+    def score_sum(self):
+        return float(self.scores.sum(dtype=np.float64))
+
+    def max_score(self):
+        return float(self.scores.max()) if len(self) else 0.0
+
+    def mean_score(self):
+        return self.score_sum() / len(self) if len(self) else 0.0
+
+    def high_count(self, threshold=HIGH_STRESS_SCORE):
+        return int(np.count_nonzero(self.scores >= threshold))
+
+    def _grouped_percent(self, codes, labels, size):
+        totals = np.bincount(codes, weights=self.scores, minlength=size)
+        counts = np.bincount(codes, minlength=size)
+        return {labels[i]: int(totals[i] / counts[i] * 100) for i in np.flatnonzero(counts)}
+
+    def daily_means(self):
+        """{'YYYY-MM-DD': average stress %} in date order."""
+        if not len(self):
+            return {}
+        means = self._grouped_percent(self.day_codes, self.days, len(self.days))
+        return {day: means[day] for day in sorted(means) if day}
+
+    def hourly_means(self):
+        """{'HH:00': average stress %} in hour order."""
+        valid = self.hours >= 0
+        if not valid.any():
+            return {}
+        labels = [f"{h:02d}:00" for h in range(24)]
+        return self.take(valid)._grouped_percent(self.hours[valid].astype(np.intp), labels, 24)
+
+    def _label_counts(self, codes, labels):
+        counts = np.bincount(codes, minlength=len(labels)) if len(self) else []
+        return {labels[i]: int(n) for i, n in enumerate(counts) if n}
+
+    def level_counts(self):
+        return self._label_counts(self.level_codes, self.levels)
+
+    def emotion_counts(self):
+        return self._label_counts(self.emotion_codes, self.emotions)
+
+    def average_daily_active_users(self):
+        """Distinct users per day, averaged over days with records."""
+        if not len(self):
+            return 0
+        pairs = np.unique(self.day_codes.astype(np.int64) * len(self.user_ids) + self.user_codes)
+        return len(pairs) / len(np.unique(self.day_codes))
+
+    def iter_rows(self):
+        """(created_at UTC ISO, score, level, emotion) tuples, e.g. for CSV export."""
+        for ts, score, level, emotion in zip(self.timestamps.tolist(), self.scores.tolist(),
+                                             self.level_codes.tolist(), self.emotion_codes.tolist()):
+            stamp = '' if ts != ts else datetime.fromtimestamp(ts, timezone.utc).isoformat()
+            yield stamp, round(score, 6), self.levels[level], self.emotions[emotion]
@@ -0,0 +1,267 @@
+"""
+report_engine.py - Employee Stress Report Generation
+Builds per-employee DOCX (and optional PDF/CSV) reports from stress_records
+across a process pool, streaming finished files into REPORTS_FOLDER.
+"""
+
+import argparse
+import csv
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from config import COLORS, REPORTS_FOLDER, REPORT_WORKERS, REPORT_CHUNK_SIZE
+from records import User, StressRecordBatch
+from time_buckets import utc_bounds, now as zone_now
+
+
+REPORT_FORMATS = ('docx', 'pdf', 'csv')
+
+# Per-process chart cache: one Agg figure is built per worker and only its
+# line data is swapped for each employee.
+_CHART = None
+
+
+# ---------- data collection (parent process) ----------
+
+def month_range(month):
+    """Return (start, end) ISO strings for a 'YYYY-MM' month."""
+    start = datetime.strptime(month, '%Y-%m')
+    end = (start + timedelta(days=32)).replace(day=1)
+    return start.strftime('%Y-%m-%d'), end.strftime('%Y-%m-%d')
+
+
+def collect_report_jobs(start, end, user_id=None, department=None):
+    """Load users and their records for the period, grouped per user.
+
+    Records come from the replica when it holds the whole period and from
+    Supabase otherwise (a new replica only has the last HISTORY_DAYS).
+    """
+    from local_store import db, store
+    from stress_queries import fetch_record_pages
+    from supabase_client import supabase
+
+    users_query = db.table('user1').select('id, first_name, last_name, email, department')
+    if user_id is not None:
+        users_query = users_query.eq('id', user_id)
+    if department:
+        users_query = users_query.eq('department', department)
+    users = User.from_rows(users_query.execute().data)
+    # A user or department run reads only those users' records.
+    user_ids = [u.id for u in users] if user_id is not None or department else None
+
+    utc_start, utc_end = utc_bounds(start, end)
+    local = store is not None
+    if local:
+        store.ensure_synced('stress_records')
+        local = store.covers('stress_records', utc_start)
+    if local:
+        # The replica has no response cap: one indexed query.
+        records_query = (store.table('stress_records')
+                         .select('user_id, created_at, avg_stress_score, stress_level, dominant_emotion')
+                         .gte('created_at', utc_start).lt('created_at', utc_end)
+                         .order('created_at'))
+        if user_ids is not None:
+            records_query = records_query.in_('user_id', user_ids)
+        records = StressRecordBatch.from_rows(records_query.execute().data)
+    else:
+        # PostgREST caps each response (1000 rows by default): keyset pages.
+        records = StressRecordBatch.from_pages(fetch_record_pages(start, end, user_ids, client=supabase))
+
+    # Column batches keep the pickled payload sent to workers small.
+    by_user = {str(user_id): batch for user_id, batch in records.split_by_user().items()}
+    return [(user, by_user.get(str(user.id)) or StressRecordBatch.empty()) for user in users]
+
+
+# ---------- worker side ----------
+
+def _init_worker():
+    """Build the shared chart once per worker process."""
+    global _CHART
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=(7, 2.8), dpi=100, facecolor='white')
+    canvas = FigureCanvasAgg(fig)
+    ax = fig.add_subplot(111)
+    line, = ax.plot([], [], color=COLORS['accent_blue'], linewidth=2, marker='o', markersize=4)
+    ax.set_ylim(0, 100)
+    ax.set_ylabel('Average Stress Level (%)', fontsize=8)
+    ax.grid(True, linestyle='--', alpha=0.3)
+    ax.spines['top'].set_visible(False)
+    ax.spines['right'].set_visible(False)
+    ax.tick_params(labelsize=7)
+    fig.tight_layout()
+    _CHART = (fig, canvas, ax, line)
+
+
+def _render_chart(days, values, fmt='png'):
+    """Swap new data into the cached figure and return the encoded image."""
+    if _CHART is None:
+        _init_worker()
+    fig, canvas, ax, line = _CHART
+    x = list(range(len(values)))
+    line.set_data(x, values)
+    ax.set_xlim(-0.5, max(len(values) - 0.5, 0.5))
+    step = max(1, len(days) // 10)
+    ax.set_xticks(x[::step])
+    ax.set_xticklabels([d[5:] for d in days[::step]])
+    buffer = io.BytesIO()
+    if fmt == 'png':
+        canvas.print_png(buffer)
+    else:
+        fig.savefig(buffer, format=fmt)
+    buffer.seek(0)
+    return buffer
+
+
+def summarize(records):
+    """Aggregate one employee's StressRecordBatch into the report figures."""
+    return {
+        'sessions': len(records),
+        'avg_stress': int(records.mean_score() * 100),
+        'max_stress': int(records.max_score() * 100),
+        'high_stress_count': records.high_count(),
+        'levels': records.level_counts(),
+        'emotions': records.emotion_counts(),
+        'daily': records.daily_means(),
+    }
+
+
+def _write_docx(path, user, period, summary, chart):
+    from docx import Document
+    from docx.shared import Inches
+
+    document = Document()
+    document.add_heading(f"Stress Report - {user.full_name}", level=1)
+    document.add_paragraph(f"{user.email}  |  {user.department or 'No department'}  |  {period}")
+
+    table = document.add_table(rows=0, cols=2)
+    table.style = 'Light List Accent 1'
+    for label, value in (("Sessions", summary['sessions']),
+                         ("Average Stress", f"{summary['avg_stress']}%"),
+                         ("Peak Stress", f"{summary['max_stress']}%"),
+                         ("High Stress Sessions", summary['high_stress_count'])):
+        cells = table.add_row().cells
+        cells[0].text, cells[1].text = label, str(value)
+
+    if chart is not None:
+        document.add_heading("Daily Stress Trend", level=2)
+        document.add_picture(chart, width=Inches(6.5))
+
+    document.add_heading("Emotion Breakdown", level=2)
+    for emotion, count in sorted(summary['emotions'].items(), key=lambda item: -item[1]):
+        document.add_paragraph(f"{emotion}: {count}", style='List Bullet')
+    document.save(path)
+
+
+def _write_csv(path, records):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['created_at', 'avg_stress_score', 'stress_level', 'dominant_emotion'])
+        writer.writerows(records.iter_rows())
+
+
+def _write_pdf(path, user, period, summary):
+    if _CHART is None:
+        _init_worker()
+    fig = _CHART[0]
+    title = fig.suptitle(f"{user.full_name} - {period} - avg {summary['avg_stress']}%, "
+                         f"{summary['high_stress_count']} high-stress sessions", fontsize=9)
+    try:
+        with open(path, 'wb') as f:
+            f.write(_render_chart(list(summary['daily']), list(summary['daily'].values()), fmt='pdf').getvalue())
+    finally:
+        title.remove()
+
+
+def _slug(text):
+    return ''.join(c for c in text.replace(' ', '_') if c.isalnum() or c in '_-') or 'report'
+
+
+def generate_chunk(jobs, output_dir, period, formats):
+    """Worker entry point: write every report for a chunk of employees.
+
+    Returns a list of (summary row, written paths) per employee.
+    """
+    results = []
+    for user, records in jobs:
+        summary = summarize(records)
+        base = os.path.join(output_dir, f"{_slug(user.full_name)}_{user.id}")
+        paths = []
+        if 'docx' in formats:
+            chart = None
+            if summary['daily']:
+                chart = _render_chart(list(summary['daily']), list(summary['daily'].values()))
+            _write_docx(base + '.docx', user, period, summary, chart)
+            paths.append(base + '.docx')
+        if 'pdf' in formats:
+            _write_pdf(base + '.pdf', user, period, summary)
+            paths.append(base + '.pdf')
+        if 'csv' in formats:
+            _write_csv(base + '.csv', records)
+            paths.append(base + '.csv')
+        row = [user.id, user.full_name, user.department or '', summary['sessions'],
+               summary['avg_stress'], summary['max_stress'], summary['high_stress_count']]
+        results.append((row, paths))
+    return results
+
+
+# ---------- orchestration ----------
+
+def generate_reports(start, end, user_id=None, department=None, formats=('docx',),
+                     workers=REPORT_WORKERS, chunk_size=REPORT_CHUNK_SIZE, on_progress=None):
+    """Generate reports across a process pool, yielding file paths as they finish.
+
+    A summary.csv covering every employee in the run is written alongside.
+    """
+    unknown = set(formats) - set(REPORT_FORMATS)
+    if unknown:
+        raise ValueError(f"Unsupported report format(s): {', '.join(sorted(unknown))}")
+
+    jobs = collect_report_jobs(start, end, user_id=user_id, department=department)
+    period = f"{start} to {end}"
+    scope = f"user_{user_id}" if user_id is not None else (department or 'all')
+    output_dir = os.path.join(REPORTS_FOLDER, _slug(f"{start}_{end}_{scope}"))
+    os.makedirs(output_dir, exist_ok=True)
+
+    chunks = [jobs[i:i + chunk_size] for i in range(0, len(jobs), chunk_size)]
+    summary_path = os.path.join(output_dir, 'summary.csv')
+    done = 0
+    with open(summary_path, 'w', newline='', encoding='utf-8') as f:
+        summary_writer = csv.writer(f)
+        summary_writer.writerow(['user_id', 'name', 'department', 'sessions', 'avg_stress',
+                                 'max_stress', 'high_stress_count'])
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+            futures = [pool.submit(generate_chunk, chunk, output_dir, period, tuple(formats)) for chunk in chunks]
+            for future in as_completed(futures):
+                for row, paths in future.result():
+                    summary_writer.writerow(row)
+                    done += 1
+                    if on_progress:
+                        on_progress(done, len(jobs))
+                    yield from paths
+    yield summary_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate employee stress reports.")
+    parser.add_argument('--month', default=(zone_now().replace(day=1) - timedelta(days=1)).strftime('%Y-%m'),
+                        help="Report month as YYYY-MM (defaults to last month)")
+    parser.add_argument('--user', help="Only report on this user id")
+    parser.add_argument('--department', help="Only report on this department")
+    parser.add_argument('--formats', default='docx', help="Comma separated: docx,pdf,csv")
+    parser.add_argument('--workers', type=int, default=REPORT_WORKERS)
+    args = parser.parse_args()
+
+    start, end = month_range(args.month)
+    count = 0
+    for path in generate_reports(start, end, user_id=args.user, department=args.department,
+                                 formats=args.formats.split(','), workers=args.workers):
+        count += 1
+        print(f"✅ {path}")
+    print(f"Generated {count} file(s) in {REPORTS_FOLDER}")
+
+
+if __name__ == "__main__":
+    main()
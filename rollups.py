@@ -0,0 +1,217 @@
+"""
+rollups.py - Precomputed Per-User and Per-Department Daily Stress Rollups
+Keeps per-user/day and per-department/day aggregates (sum, count, max,
+high-stress count, stress level and emotion counts) in the local replica,
+updated incrementally as stress_records arrive.
+"""
+
+import threading
+from config import DISPLAY_TIMEZONE
+from event_log import get_logger
+from time_buckets import local_day
+import instrumentation
+
+
+HIGH_STRESS_SCORE = 0.7
+NO_DEPARTMENT = ''
+
+logger = get_logger('rollups')
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS rollup_user_day (user_id, day TEXT, score_sum REAL, count INTEGER, '
+    'score_max REAL, high_count INTEGER, PRIMARY KEY (user_id, day))',
+    'CREATE TABLE IF NOT EXISTS rollup_dept_day (department TEXT, day TEXT, score_sum REAL, count INTEGER, '
+    'score_max REAL, high_count INTEGER, active_users INTEGER, PRIMARY KEY (department, day))',
+    'CREATE TABLE IF NOT EXISTS rollup_user_day_labels (user_id, day TEXT, kind TEXT, label TEXT, count INTEGER, '
+    'PRIMARY KEY (user_id, day, kind, label))',
+    'CREATE TABLE IF NOT EXISTS rollup_dept_day_labels (department TEXT, day TEXT, kind TEXT, label TEXT, '
+    'count INTEGER, PRIMARY KEY (department, day, kind, label))',
+    'CREATE INDEX IF NOT EXISTS idx_rollup_dept_day_day ON rollup_dept_day (day)',
+    'CREATE TABLE IF NOT EXISTS rollup_state (key TEXT PRIMARY KEY, value TEXT)',
+)
+
+
+def record_day(record):
+    """Day bucket of a stress record ('YYYY-MM-DD' in DISPLAY_TIMEZONE)."""
+    return local_day(record.get('created_at'))
+
+
+def accumulate(records, departments):
+    """Group raw records into rollup deltas.
+
+    Returns (user_days, dept_days, user_labels, dept_labels) where the day
+    dicts map key -> [score_sum, count, score_max, high_count] and the label
+    dicts map (key, day, kind, label) -> count. Shared by the SQLite rollups
+    and the in-memory ones kept by the ingestion service.
+    """
+    user_days, dept_days, user_labels, dept_labels = {}, {}, {}, {}
+    for record in records:
+        day = record_day(record)
+        if not day:
+            continue
+        score = float(record.get('avg_stress_score') or 0)
+        user_id = record.get('user_id')
+        department = departments.get(str(user_id), NO_DEPARTMENT)
+        high = 1 if score >= HIGH_STRESS_SCORE else 0
+        for bucket, key in ((user_days, (user_id, day)), (dept_days, (department, day))):
+            agg = bucket.get(key)
+            if agg is None:
+                bucket[key] = [score, 1, score, high]
+            else:
+                agg[0] += score
+                agg[1] += 1
+                agg[2] = max(agg[2], score)
+                agg[3] += high
+        for kind, label in (('level', record.get('stress_level') or 'Unknown'),
+                            ('emotion', record.get('dominant_emotion') or 'Unknown')):
+            user_key = (user_id, day, kind, label)
+            dept_key = (department, day, kind, label)
+            user_labels[user_key] = user_labels.get(user_key, 0) + 1
+            dept_labels[dept_key] = dept_labels.get(dept_key, 0) + 1
+    return user_days, dept_days, user_labels, dept_labels
+
+
+class RollupStore:
+    """Rollup tables living next to the replica in the local SQLite file."""
+
+    def __init__(self, store):
+        self.store = store
+        self._departments = None
+        self._lock = threading.Lock()
+        with store.transaction() as conn:
+            for statement in SCHEMA:
+                conn.execute(statement)
+        store.add_listener(self._on_rows)
+        store.add_change_listener(self._on_change)
+        built = store.query("SELECT value FROM rollup_state WHERE key = 'timezone'")
+        if not built or built[0][0] != DISPLAY_TIMEZONE:
+            # First run, or days were bucketed in another zone.
+            self.rebuild()
+
+    # ---------- maintenance ----------
+
+    def _department_map(self):
+        if self._departments is None:
+            rows = self.store.query('SELECT id, department FROM user1')
+            self._departments = {row_id: dept or NO_DEPARTMENT for row_id, dept in rows}
+        return self._departments
+
+    def _on_rows(self, table, rows):
+        if table == 'stress_records':
+            self.apply(rows)
+
+    def _on_change(self, table):
+        if table == 'user1':
+            # New users and department moves alike: records from now on roll up by the new map.
+            self._departments = None
+
+    @instrumentation.timed('rollups.apply')
+    def apply(self, records):
+        """Fold newly arrived records into the rollups."""
+        user_days, dept_days, user_labels, dept_labels = accumulate(records, self._department_map())
+        if not user_days:
+            return
+        with self._lock, self.store.transaction() as conn:
+            departments = self._department_map()
+            new_active = {}
+            for (user_id, day), (score_sum, count, score_max, high) in user_days.items():
+                is_new = not conn.execute('SELECT 1 FROM rollup_user_day WHERE user_id = ? AND day = ?',
+                                          (user_id, day)).fetchone()
+                conn.execute(
+                    'INSERT INTO rollup_user_day VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (user_id, day) DO UPDATE SET '
+                    'score_sum = score_sum + excluded.score_sum, count = count + excluded.count, '
+                    'score_max = MAX(score_max, excluded.score_max), high_count = high_count + excluded.high_count',
+                    (user_id, day, score_sum, count, score_max, high))
+                if is_new:
+                    # First record of the day for this user: one more active user.
+                    key = (departments.get(str(user_id), NO_DEPARTMENT), day)
+                    new_active[key] = new_active.get(key, 0) + 1
+            for (department, day), (score_sum, count, score_max, high) in dept_days.items():
+                conn.execute(
+                    'INSERT INTO rollup_dept_day VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT (department, day) DO UPDATE SET '
+                    'score_sum = score_sum + excluded.score_sum, count = count + excluded.count, '
+                    'score_max = MAX(score_max, excluded.score_max), high_count = high_count + excluded.high_count, '
+                    'active_users = active_users + excluded.active_users',
+                    (department, day, score_sum, count, score_max, high, new_active.get((department, day), 0)))
+            for table, key_column, labels in (('rollup_user_day_labels', 'user_id', user_labels),
+                                              ('rollup_dept_day_labels', 'department', dept_labels)):
+                conn.executemany(
+                    f'INSERT INTO {table} VALUES (?, ?, ?, ?, ?) ON CONFLICT ({key_column}, day, kind, label) '
+                    f'DO UPDATE SET count = count + excluded.count',
+                    [(key, day, kind, label, n) for (key, day, kind, label), n in labels.items()])
+
+    @instrumentation.timed('rollups.rebuild')
+    def rebuild(self):
+        """Recompute every rollup from the raw replica (first run or repair)."""
+        logger.info("Rebuilding stress rollups from the local replica")
+        day = 'local_day(s.created_at)'
+        dept = f"COALESCE(u.department, '{NO_DEPARTMENT}')"
+        join = 'LEFT JOIN user1 u ON u.id = CAST(s.user_id AS TEXT)'
+        with self._lock, self.store.transaction() as conn:
+            for table in ('rollup_user_day', 'rollup_dept_day', 'rollup_user_day_labels', 'rollup_dept_day_labels'):
+                conn.execute(f'DELETE FROM {table}')
+            conn.execute(
+                f'INSERT INTO rollup_user_day SELECT s.user_id, {day}, SUM(s.avg_stress_score), COUNT(*), '
+                f'MAX(s.avg_stress_score), SUM(s.avg_stress_score >= {HIGH_STRESS_SCORE}) '
+                f"FROM stress_records s WHERE {day} != '' GROUP BY 1, 2")
+            conn.execute(
+                f'INSERT INTO rollup_dept_day SELECT {dept}, r.day, SUM(r.score_sum), SUM(r.count), '
+                f'MAX(r.score_max), SUM(r.high_count), COUNT(*) FROM rollup_user_day r '
+                f'LEFT JOIN user1 u ON u.id = CAST(r.user_id AS TEXT) GROUP BY 1, 2')
+            for kind, column in (('level', 'stress_level'), ('emotion', 'dominant_emotion')):
+                conn.execute(
+                    f"INSERT INTO rollup_user_day_labels SELECT s.user_id, {day}, '{kind}', "
+                    f"COALESCE(s.{column}, 'Unknown'), COUNT(*) FROM stress_records s "
+                    f"WHERE {day} != '' GROUP BY 1, 2, 4")
+                conn.execute(
+                    f"INSERT INTO rollup_dept_day_labels SELECT {dept}, {day}, '{kind}', "
+                    f"COALESCE(s.{column}, 'Unknown'), COUNT(*) FROM stress_records s {join} "
+                    f"WHERE {day} != '' GROUP BY 1, 2, 4")
+            conn.execute("INSERT OR REPLACE INTO rollup_state VALUES ('built', datetime('now'))")
+            conn.execute("INSERT OR REPLACE INTO rollup_state VALUES ('timezone', ?)", (DISPLAY_TIMEZONE,))
+        self._departments = None
+
+    # ---------- reads ----------
+
+    def summary(self, start, end, department=None, user_id=None):
+        """Aggregate [start, end) from rollups in O(days).
+
+        'active_users' is the average number of users active per day, so
+        engagement is the mean daily participation over the range.
+        """
+        if user_id is not None:
+            day_rows = self.store.query(
+                'SELECT day, score_sum, count, score_max, high_count, 1 FROM rollup_user_day '
+                'WHERE user_id = ? AND day >= ? AND day < ?', (user_id, start, end))
+            label_rows = self.store.query(
+                'SELECT kind, label, SUM(count) FROM rollup_user_day_labels '
+                'WHERE user_id = ? AND day >= ? AND day < ? GROUP BY 1, 2', (user_id, start, end))
+            total_users = 1
+        else:
+            where, params = 'day >= ? AND day < ?', [start, end]
+            if department is not None:
+                where += ' AND department = ?'
+                params.append(department)
+            day_rows = self.store.query(
+                f'SELECT day, SUM(score_sum), SUM(count), MAX(score_max), SUM(high_count), SUM(active_users) '
+                f'FROM rollup_dept_day WHERE {where} GROUP BY day', params)
+            label_rows = self.store.query(
+                f'SELECT kind, label, SUM(count) FROM rollup_dept_day_labels WHERE {where} GROUP BY 1, 2', params)
+            if department is not None:
+                total_users = self.store.query('SELECT COUNT(*) FROM user1 WHERE department = ?', (department,))[0][0]
+            else:
+                total_users = self.store.query('SELECT COUNT(*) FROM user1')[0][0]
+
+        sessions = sum(r[2] for r in day_rows)
+        return {
+            'sessions': sessions,
+            'score_sum': sum(r[1] for r in day_rows),
+            'max_score': max((r[3] for r in day_rows), default=0.0),
+            'high_stress_count': sum(r[4] for r in day_rows),
+            'active_users': sum(r[5] for r in day_rows) / len(day_rows) if day_rows else 0,
+            'total_users': total_users,
+            'daily': {day: int(s / c * 100) for day, s, c, *_ in sorted(day_rows) if c},
+            'hourly': {},
+            'levels': {label: n for kind, label, n in label_rows if kind == 'level'},
+            'emotions': {label: n for kind, label, n in label_rows if kind == 'emotion'},
+        }
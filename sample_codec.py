@@ -0,0 +1,193 @@
+"""
+sample_codec.py - Compact Binary Encoding for Stress Sample Batches
+Column-oriented wire format for POST /samples so clients do not send one
+verbose JSON object per sample. created_at is sent as a base timestamp and
+delta-encoded microseconds, avg_stress_score is quantized to
+1/SAMPLE_SCORE_SCALE, and user_id, stress_level and dominant_emotion are
+dictionary-coded. The body is optionally zstd- or zlib-compressed.
+
+Layout: MAGIC, one compression byte, then (compressed) the HEADER struct
+(count, base timestamp in microseconds, flags, score scale, column type
+codes, JSON length), the JSON list [users, levels, emotions, extra
+columns or null] and the NumPy columns back to back: time deltas, scores,
+user codes, level codes, emotion codes.
+"""
+
+import json
+import struct
+import zlib
+from datetime import datetime, timezone
+import numpy as np
+from config import SAMPLE_SCORE_SCALE, INGEST_WIRE_COMPRESSION
+from time_buckets import parse_iso, parse_iso_array
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional, zlib is used without it
+    zstandard = None
+
+
+CONTENT_TYPE = 'application/x-stress-samples'
+MAGIC = b'SSB\x01'
+MAX_DECODED_BYTES = 64 * 1024 * 1024  # refuse bodies that inflate past this
+VECTOR_PARSE_MIN = 64  # parse_iso_array has a fixed cost that only pays off on larger batches
+COMPRESS_MIN_BYTES = 256  # smaller bodies come out of zlib/zstd larger than they went in
+
+NONE, ZLIB, ZSTD = 0, 1, 2
+COMPRESSIONS = {None: NONE, 'zlib': ZLIB, 'zstd': ZSTD}
+
+COLUMNS = ('user_id', 'created_at', 'avg_stress_score', 'stress_level', 'dominant_emotion')
+MISSING_SCORE = np.iinfo(np.uint16).max  # non-numeric or out-of-range score; decodes to None
+
+# Flags
+NAIVE_TIMES = 1  # created_at had no UTC offset; decoded stamps have none either
+
+# count, base microseconds, flags, score scale, type codes (deltas, users, levels, emotions), JSON length
+HEADER = struct.Struct('<IqBH4sI')
+
+
+def _ranges(*dtypes):
+    return [(np.dtype(d).newbyteorder('<'), np.iinfo(d).min, np.iinfo(d).max) for d in dtypes]
+
+
+SIGNED = _ranges(np.int8, np.int16, np.int32, np.int64)
+UNSIGNED = _ranges(np.uint8, np.uint16, np.uint32)
+
+
+def _smallest(low, high, ranges):
+    """Narrowest little-endian dtype holding every value in [low, high]."""
+    for dtype, lowest, highest in ranges:
+        if lowest <= low and high <= highest:
+            return dtype
+    raise ValueError("value out of range for the wire format")
+
+
+def _dictionary(values):
+    """(distinct values in first-seen order, codes array)."""
+    table = {}
+    try:
+        codes = [table.setdefault(value, len(table)) for value in values]
+    except TypeError:
+        raise ValueError("dictionary-coded columns must be scalars")
+    return list(table), np.array(codes, _smallest(0, len(table) - 1, UNSIGNED))
+
+
+def _compress(body, compression):
+    if len(body) < COMPRESS_MIN_BYTES:
+        return NONE, body
+    if compression == 'zstd' and zstandard is None:
+        compression = 'zlib'
+    if compression == 'zstd':
+        return ZSTD, zstandard.ZstdCompressor(level=3).compress(body)
+    if compression == 'zlib':
+        return ZLIB, zlib.compress(body, 6)
+    return NONE, body
+
+
+def _decompress(kind, data):
+    if kind == NONE:
+        return data
+    if kind == ZLIB:
+        inflater = zlib.decompressobj()
+        try:
+            body = inflater.decompress(data, MAX_DECODED_BYTES)
+        except zlib.error as e:
+            raise ValueError(f"bad zlib body: {e}")
+        if inflater.unconsumed_tail:
+            raise ValueError("sample batch too large")
+        return body
+    if kind == ZSTD:
+        if zstandard is None:
+            raise ValueError("zstd-compressed batch but zstandard is not installed")
+        try:
+            return zstandard.ZstdDecompressor().decompress(data, max_output_size=MAX_DECODED_BYTES)
+        except zstandard.ZstdError as e:
+            raise ValueError(f"bad zstd body: {e}")
+    raise ValueError(f"unknown compression {kind}")
+
+
+def encode_samples(samples, compression=INGEST_WIRE_COMPRESSION):
+    """Bytes for a list of sample dicts.
+
+    Raises ValueError for batches the format cannot carry (unparseable
+    created_at, naive and aware stamps mixed, non-scalar categories);
+    callers then send JSON instead.
+    Scores outside 0..1 travel as missing so the service still reports
+    them per row.
+    """
+    now = datetime.now(timezone.utc).isoformat()
+    stamps = [s.get('created_at') or now for s in samples]
+    if len(stamps) < VECTOR_PARSE_MIN:
+        seconds = np.array([parse_iso(str(s)) for s in stamps], np.float64)
+    else:
+        seconds = parse_iso_array([str(s) for s in stamps])
+    if np.isnan(seconds).any():
+        raise ValueError("created_at must be an ISO timestamp")
+    micros = np.round(seconds * 1e6).astype(np.int64)
+    deltas = np.diff(micros)
+    delta_dtype = _smallest(int(deltas.min(initial=0)), int(deltas.max(initial=0)), SIGNED)
+
+    scores = np.array([s if isinstance(s, (int, float)) and not isinstance(s, bool) else np.nan
+                       for s in (sample.get('avg_stress_score') for sample in samples)], np.float64)
+    valid = (scores >= 0) & (scores <= 1)  # False for NaN
+    quantized = np.where(valid, np.round(scores * SAMPLE_SCORE_SCALE), MISSING_SCORE).astype('<u2')
+
+    users, user_codes = _dictionary(s.get('user_id') for s in samples)
+    levels, level_codes = _dictionary(s.get('stress_level') for s in samples)
+    emotions, emotion_codes = _dictionary(s.get('dominant_emotion') for s in samples)
+    extra = [{k: v for k, v in s.items() if k not in COLUMNS} for s in samples]
+
+    # One flag covers the whole batch, so it must hold for every stamp.
+    zones = {datetime.fromisoformat(str(s)).tzinfo is None for s in stamps}
+    if len(zones) > 1:
+        raise ValueError("created_at mixes naive and offset-aware timestamps")
+    naive = zones == {True}
+    types = ''.join(dtype.char for dtype in (delta_dtype, user_codes.dtype, level_codes.dtype, emotion_codes.dtype))
+    tables = json.dumps([users, levels, emotions, extra if any(extra) else None],
+                        separators=(',', ':'), default=str).encode()
+    body = b''.join((HEADER.pack(len(samples), int(micros[0]) if samples else 0, NAIVE_TIMES if naive else 0,
+                                 SAMPLE_SCORE_SCALE, types.encode(), len(tables)),
+                     tables, deltas.astype(delta_dtype).tobytes(), quantized.tobytes(),
+                     user_codes.tobytes(), level_codes.tobytes(), emotion_codes.tobytes()))
+    kind, body = _compress(body, compression)
+    return MAGIC + bytes((kind,)) + body
+
+
+def decode_samples(data):
+    """Sample dicts from encode_samples() bytes. Raises ValueError on a malformed body."""
+    if data[:len(MAGIC)] != MAGIC or len(data) <= len(MAGIC):
+        raise ValueError("not a stress sample batch")
+    body = _decompress(data[len(MAGIC)], data[len(MAGIC) + 1:])
+    try:
+        count, base, flags, scale, types, length = HEADER.unpack_from(body)
+        users, levels, emotions, extra = json.loads(body[HEADER.size:HEADER.size + length])
+        delta_dtype, user_dtype, level_dtype, emotion_dtype = (np.dtype(c).newbyteorder('<') for c in types.decode())
+        offset = HEADER.size + length
+        columns = []
+        for dtype, n in ((delta_dtype, max(count - 1, 0)), (np.dtype('<u2'), count),
+                         (user_dtype, count), (level_dtype, count), (emotion_dtype, count)):
+            columns.append(np.frombuffer(body, dtype, n, offset))
+            offset += dtype.itemsize * n
+    except (struct.error, ValueError, TypeError) as e:
+        raise ValueError(f"malformed sample batch: {e}")
+    if offset != len(body):
+        raise ValueError("malformed sample batch: trailing bytes")
+    deltas, quantized, user_codes, level_codes, emotion_codes = columns
+    if count == 0:
+        return []
+
+    micros = base + np.concatenate(([0], np.cumsum(deltas, dtype=np.int64)))
+    stamps = np.datetime_as_string(micros.astype('datetime64[us]'), unit='us')
+    suffix = '' if flags & NAIVE_TIMES else '+00:00'
+    scores = (quantized / scale).tolist()
+    try:
+        rows = [{'user_id': users[u], 'created_at': f'{t}{suffix}',
+                 'avg_stress_score': None if q == MISSING_SCORE else s,
+                 'stress_level': levels[lv], 'dominant_emotion': emotions[em]}
+                for u, t, q, s, lv, em in zip(user_codes.tolist(), stamps.tolist(), quantized.tolist(), scores,
+                                             level_codes.tolist(), emotion_codes.tolist())]
+    except IndexError:
+        raise ValueError("malformed sample batch: code outside its dictionary")
+    for row, columns in zip(rows, extra or ()):
+        row.update(columns)
+    return rows
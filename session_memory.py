@@ -0,0 +1,196 @@
+"""
+session_memory.py - Memory-Bounded Buffers for Shift-Long Sessions
+Fixed-capacity history for the monitoring loop (stress/EAR series, blink
+and emotion events) that downsamples old history instead of growing, and
+explicit disposal of matplotlib figures and Tk images whenever
+app.clear_window() tears a page down.
+"""
+
+from collections import Counter, deque
+import numpy as np
+from config import LONG_SESSION_MODE, SESSION_HISTORY_POINTS, SESSION_EVENT_CAPACITY
+from event_log import get_logger
+
+
+logger = get_logger('session')
+
+
+class HistorySeries:
+    """(time, value) samples in preallocated arrays.
+
+    When full, the older half is averaged pairwise, so the buffer always
+    covers the whole session: recent samples at full rate, older ones at
+    progressively coarser resolution.
+    """
+
+    __slots__ = ('capacity', 'times', 'values', 'size', 'compactions')
+
+    def __init__(self, capacity=SESSION_HISTORY_POINTS):
+        if capacity < 4 or capacity % 2:
+            raise ValueError("capacity must be an even number >= 4")
+        self.capacity = capacity
+        self.times = np.empty(capacity, np.float64)
+        self.values = np.empty(capacity, np.float32)
+        self.size = 0
+        self.compactions = 0
+
+    def append(self, at, value):
+        if self.size == self.capacity:
+            self._compact()
+        self.times[self.size] = at
+        self.values[self.size] = value
+        self.size += 1
+
+    def _compact(self):
+        half = self.capacity // 2
+        # Mean of each older pair lands in the first quarter...
+        self.times[:half // 2] = self.times[:half].reshape(-1, 2).mean(axis=1)
+        self.values[:half // 2] = self.values[:half].reshape(-1, 2).mean(axis=1)
+        # ...and the recent half slides down behind it.
+        self.times[half // 2:half // 2 + half] = self.times[half:]
+        self.values[half // 2:half // 2 + half] = self.values[half:]
+        self.size = half // 2 + half
+        self.compactions += 1
+
+    def __len__(self):
+        return self.size
+
+    def series(self):
+        """(times, values) views of the filled part."""
+        return self.times[:self.size], self.values[:self.size]
+
+    def clear(self):
+        self.size = 0
+        self.compactions = 0
+
+    @property
+    def nbytes(self):
+        return self.times.nbytes + self.values.nbytes
+
+
+class EventHistory:
+    """Recent event times (and labels) with exact running totals."""
+
+    __slots__ = ('recent', 'totals', 'count')
+
+    def __init__(self, capacity=SESSION_EVENT_CAPACITY):
+        self.recent = deque(maxlen=capacity)
+        self.totals = Counter()
+        self.count = 0
+
+    def add(self, at, label=None):
+        self.recent.append((at, label))
+        self.totals[label] += 1
+        self.count += 1
+
+    def rate(self, window, now):
+        """Events per minute over the last `window` seconds."""
+        since = now - window
+        n = 0
+        for at, _ in reversed(self.recent):
+            if at < since:
+                break
+            n += 1
+        return n * 60.0 / window if window else 0.0
+
+    def clear(self):
+        self.recent.clear()
+        self.totals.clear()
+        self.count = 0
+
+
+class SessionBuffers:
+    """Everything the monitoring loop keeps per session, all bounded."""
+
+    def __init__(self, history_points=SESSION_HISTORY_POINTS, event_capacity=SESSION_EVENT_CAPACITY):
+        self.stress = HistorySeries(history_points)
+        self.ear = HistorySeries(history_points)
+        self.blinks = EventHistory(event_capacity)
+        self.emotions = EventHistory(event_capacity)
+
+    def clear(self):
+        for buffer in (self.stress, self.ear, self.blinks, self.emotions):
+            buffer.clear()
+
+
+# ---------- page disposal ----------
+
+_figures = []  # (canvas widget, Figure) created by the current page
+_images = []  # (interpreter, image name) owned by the current page
+
+
+def track_figure(canvas):
+    """Register a FigureCanvasTkAgg so its figure is closed with the page.
+
+    Figures whose widget is already gone (a chart redrawn in place) are
+    closed now rather than held until the page changes.
+    """
+    for entry in [e for e in _figures if not _widget_alive(e[0])]:
+        _figures.remove(entry)
+        entry[1].clear()
+    _figures.append((canvas.get_tk_widget(), canvas.figure))
+    return canvas
+
+
+def _widget_alive(widget):
+    try:
+        return bool(widget.winfo_exists())
+    except Exception:
+        return False
+
+
+def track_image(widget, image):
+    """Register a PhotoImage (Tk or PIL) shown on `widget` so its pixels are
+    freed with the page."""
+    _images.append((widget.tk, str(image)))
+    return image
+
+
+def set_label_image(label, image):
+    """Show `image` on a label, deleting the frame it replaces right away
+    (for video labels updated every frame)."""
+    previous = getattr(label, '_session_image', None)
+    label.configure(image=image)
+    label._session_image = image
+    if previous is not None and previous is not image:
+        _delete_image(label.tk, str(previous))
+
+
+def _delete_image(interp, name):
+    try:
+        interp.call('image', 'delete', name)
+    except Exception:
+        pass  # already deleted, or its interpreter is gone
+
+
+def dispose_page():
+    """Close every tracked figure and image; returns how many were freed."""
+    freed = 0
+    while _figures:
+        widget, figure = _figures.pop()
+        if _widget_alive(widget):
+            widget.destroy()
+        figure.clear()
+        freed += 1
+    while _images:
+        _delete_image(*_images.pop())
+        freed += 1
+    return freed
+
+
+def install(app):
+    """Run dispose_page() every time the app clears its window."""
+    if not LONG_SESSION_MODE or getattr(app, '_session_installed', False):
+        return
+    clear_window = app.clear_window
+
+    def clear_and_dispose(*args, **kwargs):
+        freed = dispose_page()
+        if freed:
+            logger.debug("Disposed %d figure(s)/image(s) on page change", freed)
+        return clear_window(*args, **kwargs)
+
+    app.clear_window = clear_and_dispose
+    app._session_installed = True
+    if not hasattr(app, 'session'):
+        app.session = SessionBuffers()
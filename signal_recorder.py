@@ -0,0 +1,224 @@
+"""
+signal_recorder.py - Per-Frame Signal Recording
+Optional audit trail of the monitoring loop: every frame's eye landmarks,
+EAR values, emotion probabilities, stress score and timestamp appended as
+fixed-size records to a binary file. The file opens later as a
+numpy.memmap without parsing, so a whole shift can be sliced and re-scored
+with different EAR_THRESHOLD / STRESS_ALERT_THRESHOLD values at disk speed.
+
+File layout: a HEADER_SIZE-byte JSON header (padded with spaces), then
+RECORD_DTYPE records back to back. A crash can only lose the unflushed
+tail; a partial trailing record is ignored on open.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import deque
+import numpy as np
+from config import (EAR_THRESHOLD, CONSEC_FRAMES, STRESS_ALERT_THRESHOLD, ALERT_SUSTAIN_SECONDS,
+                    RECORDINGS_FOLDER, RECORD_FLUSH_SECONDS, RECORD_BLOCK_FRAMES)
+from emotion_backend import EMOTION_LABELS
+from event_log import get_logger
+
+
+MAGIC = 'stress-signals'
+VERSION = 1
+HEADER_SIZE = 4096
+MAX_PENDING_BLOCKS = 64  # ~16k frames waiting on the disk before frames are dropped
+
+# Flags
+FACE_FOUND = 1
+FACE_TRACKED = 2  # landmarks came from optical flow, not the face mesh
+
+RECORD_DTYPE = np.dtype([
+    ('time', '<f8'),  # epoch seconds
+    ('eyes', '<f4', (12, 2)),  # LEFT_EYE then RIGHT_EYE, pixels
+    ('ear_left', '<f4'),
+    ('ear_right', '<f4'),
+    ('emotions', '<f4', (len(EMOTION_LABELS),)),
+    ('stress', '<f4'),
+    ('flags', 'u1'),
+    ('_pad', 'u1', (3,)),
+])  # 152 bytes, 8-byte aligned so 'time' never straddles a record
+
+logger = get_logger('recorder')
+
+
+class SignalRecorder:
+    """Append-only recorder. record() only fills a slot in an in-memory
+    block; a background thread writes full (or aged) blocks to disk."""
+
+    def __init__(self, path, user_id=None, block_frames=RECORD_BLOCK_FRAMES, flush_seconds=RECORD_FLUSH_SECONDS):
+        self.path = path
+        self.block_frames = block_frames
+        self.flush_seconds = flush_seconds
+        self.frames = 0
+        self.dropped = 0
+        self._block = np.zeros(block_frames, RECORD_DTYPE)
+        self._used = 0
+        self._pending = deque()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        new = not os.path.exists(path) or os.path.getsize(path) == 0
+        self._file = open(path, 'ab')
+        if new:
+            self._file.write(_header(user_id))
+            self._file.flush()
+        self._thread = threading.Thread(target=self._run, name='signal-recorder', daemon=True)
+        self._thread.start()
+
+    # ---------- capture side ----------
+
+    def record(self, at, eyes=None, ear_left=np.nan, ear_right=np.nan, emotions=None, stress=np.nan,
+               tracked=False):
+        """Append one frame. Never blocks on disk I/O."""
+        with self._lock:
+            row = self._block[self._used]
+            row['time'] = at
+            if eyes is not None:
+                row['eyes'] = eyes
+                row['flags'] = FACE_FOUND | (FACE_TRACKED if tracked else 0)
+            else:
+                row['eyes'] = np.nan
+                row['flags'] = 0
+            row['ear_left'] = ear_left
+            row['ear_right'] = ear_right
+            row['emotions'] = np.nan if emotions is None else emotions
+            row['stress'] = stress
+            self._used += 1
+            self.frames += 1
+            if self._used == self.block_frames:
+                self._hand_off()
+                self._wake.set()
+
+    def _hand_off(self):
+        # Caller holds the lock.
+        if len(self._pending) >= MAX_PENDING_BLOCKS:
+            self.dropped += self._used  # disk cannot keep up: shed the newest frames
+        else:
+            self._pending.append(self._block[:self._used].copy())
+        self._used = 0
+
+    # ---------- writer thread ----------
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_seconds)
+            self._wake.clear()
+            self._write_pending(take_partial=True)
+        self._write_pending(take_partial=True)
+
+    def _write_pending(self, take_partial):
+        with self._lock:
+            if take_partial and self._used:
+                self._hand_off()
+            blocks = list(self._pending)
+            self._pending.clear()
+        if not blocks:
+            return
+        try:
+            for block in blocks:
+                self._file.write(block.tobytes())
+            self._file.flush()
+        except OSError as e:
+            logger.error("❌ Recording write failed (%d frames lost): %s", sum(map(len, blocks)), e)
+
+    def close(self):
+        self._stop.set()
+        self._wake.set()
+        self._thread.join(timeout=5)
+        self._file.close()
+        if self.dropped:
+            logger.warning("⚠️ %d frames were dropped while recording %s", self.dropped, self.path)
+
+
+def _header(user_id):
+    header = json.dumps({
+        'magic': MAGIC,
+        'version': VERSION,
+        'user_id': user_id,
+        'started': time.time(),
+        'record_size': RECORD_DTYPE.itemsize,
+        'dtype': RECORD_DTYPE.descr,
+        'emotions': list(EMOTION_LABELS),
+    }).encode()
+    if len(header) > HEADER_SIZE:
+        raise ValueError("Recording header does not fit")
+    return header.ljust(HEADER_SIZE)
+
+
+def recording_path(user_id, folder=RECORDINGS_FOLDER, started=None):
+    """recordings/<user>_<YYYYmmdd-HHMMSS>.sig"""
+    os.makedirs(folder, exist_ok=True)
+    stamp = time.strftime('%Y%m%d-%H%M%S', time.localtime(started))
+    return os.path.join(folder, f"{user_id or 'anonymous'}_{stamp}.sig")
+
+
+# ---------- reading ----------
+
+def open_recording(path):
+    """(header, records) where records is a read-only memmap of RECORD_DTYPE."""
+    with open(path, 'rb') as f:
+        header = json.loads(f.read(HEADER_SIZE))
+    if header.get('magic') != MAGIC:
+        raise ValueError(f"{path} is not a signal recording")
+    if header['record_size'] != RECORD_DTYPE.itemsize:
+        raise ValueError(f"{path} has {header['record_size']}-byte records, expected {RECORD_DTYPE.itemsize}")
+    count = (os.path.getsize(path) - HEADER_SIZE) // RECORD_DTYPE.itemsize
+    if count <= 0:
+        return header, np.zeros(0, RECORD_DTYPE)
+    return header, np.memmap(path, RECORD_DTYPE, 'r', offset=HEADER_SIZE, shape=(count,))
+
+
+def blink_times(records, ear_threshold=EAR_THRESHOLD, consec_frames=CONSEC_FRAMES):
+    """Times of blinks under the live loop's rule: at least consec_frames
+    consecutive frames below ear_threshold, counted when the eye reopens."""
+    ear = (records['ear_left'] + records['ear_right']) / 2
+    closed = np.concatenate(([False], ear < ear_threshold, [False])).astype(np.int8)
+    edges = np.diff(closed)
+    starts, ends = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+    complete = (ends - starts >= consec_frames) & (ends < len(ear))
+    return records['time'][ends[complete]]
+
+
+def stress_episodes(records, threshold=STRESS_ALERT_THRESHOLD, sustain=ALERT_SUSTAIN_SECONDS):
+    """[(start, end)] spans where stress stayed at/above threshold for at
+    least `sustain` seconds."""
+    high = np.concatenate(([False], records['stress'] >= threshold, [False])).astype(np.int8)
+    edges = np.diff(high)
+    starts, ends = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1) - 1
+    times = records['time']
+    return [(float(times[s]), float(times[e])) for s, e in zip(starts, ends) if times[e] - times[s] >= sustain]
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Summarize or re-score a signal recording.")
+    parser.add_argument('path')
+    parser.add_argument('--ear-threshold', type=float, default=EAR_THRESHOLD)
+    parser.add_argument('--consec-frames', type=int, default=CONSEC_FRAMES)
+    parser.add_argument('--stress-threshold', type=float, default=STRESS_ALERT_THRESHOLD)
+    parser.add_argument('--sustain', type=float, default=ALERT_SUSTAIN_SECONDS)
+    args = parser.parse_args()
+
+    header, records = open_recording(args.path)
+    if not len(records):
+        print("Empty recording")
+        return
+    minutes = (records['time'][-1] - records['time'][0]) / 60
+    face = (records['flags'] & FACE_FOUND).astype(bool)
+    blinks = blink_times(records, args.ear_threshold, args.consec_frames)
+    episodes = stress_episodes(records, args.stress_threshold, args.sustain)
+    print(f"user {header['user_id']}: {len(records):,} frames over {minutes:.1f} min, "
+          f"face in {face.mean():.0%}")
+    print(f"blinks: {len(blinks):,} ({len(blinks) / max(minutes, 1e-9):.1f}/min at EAR < {args.ear_threshold})")
+    print(f"stress episodes >= {args.stress_threshold:.0%} for {args.sustain:.0f}s: {len(episodes)}")
+    print(f"mean stress {np.nanmean(records['stress']):.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,12 @@
+-- Range-indexed access paths for stress_records.
+-- Used by the incremental sync (created_at watermark) and by per-user
+-- drill-down queries when offline mode is disabled.
+
+create index if not exists stress_records_created_at_idx
+    on public.stress_records (created_at);
+
+create index if not exists stress_records_user_created_at_idx
+    on public.stress_records (user_id, created_at);
+
+create index if not exists user1_department_idx
+    on public.user1 (department);
@@ -0,0 +1,97 @@
+-- Server-side maintenance of user1.last_active and user1.stress_events.
+-- Assumes last_active is timestamptz and stress_events is an integer.
+-- stress_events is counted by the stress_records trigger below, so it is
+-- accurate however the records arrive (directly or via the ingestion service).
+
+-- Batched activity writes from heartbeat_service.py: one call applies a whole
+-- flush. last_active only moves forward. A stress_events key sent by older
+-- clients is ignored; the trigger owns that column.
+create or replace function public.apply_user_heartbeats(updates jsonb)
+returns integer
+language sql
+as $$
+    with changed as (
+        update public.user1 u
+           set last_active = greatest(u.last_active, h.last_active)
+          from jsonb_to_recordset(updates) as h(id text, last_active timestamptz)
+         where u.id::text = h.id::text
+        returning 1
+    )
+    select count(*)::integer from changed;
+$$;
+
+-- Keeps last_active current and counts stress events for every insert into
+-- stress_records. Statement-level with a transition table, so a bulk insert
+-- costs two UPDATEs however many rows it carries.
+--
+-- A stress event is the alert rule from alert_engine.py: a run of records with
+-- avg_stress_score >= 0.9, no two more than 600 s apart, lasting 60 s. It is
+-- counted once, by the insert that carries the record reaching the 60 s mark.
+-- Keep these numbers in sync with STRESS_ALERT_THRESHOLD, ALERT_SUSTAIN_SECONDS
+-- and ALERT_MAX_GAP_SECONDS in config.py (hysteresis is not modelled: a run
+-- ends at the first record below the threshold). The one-hour lookback covers
+-- any run whose counting record can be in this insert, and runs cut off by it
+-- can only count records older than this insert, so nothing is counted twice.
+create or replace function public.user1_from_stress_records()
+returns trigger
+language plpgsql
+as $$
+begin
+    update public.user1 u
+       set last_active = greatest(u.last_active, n.latest)
+      from (select user_id::text as user_id, max(created_at) as latest
+              from new_rows group by 1) n
+     where u.id::text = n.user_id
+       and (u.last_active is null or u.last_active < n.latest);
+
+    with touched as (
+        select user_id::text as user_id, min(created_at) as since
+          from new_rows group by 1
+    ),
+    ordered as (
+        select s.id, s.user_id::text as user_id, s.created_at,
+               s.avg_stress_score >= 0.9 as high,
+               lag(s.avg_stress_score >= 0.9) over w as prev_high,
+               lag(s.created_at) over w as prev_at
+          from public.stress_records s
+          join touched t on s.user_id::text = t.user_id
+         where s.created_at >= t.since - interval '1 hour'
+        window w as (partition by s.user_id order by s.created_at, s.id)
+    ),
+    runs as (
+        select id, user_id, created_at, high,
+               sum((high and (prev_high is not true
+                              or created_at - prev_at > interval '600 seconds'))::int)
+                   over (partition by user_id order by created_at, id) as run
+          from ordered
+    ),
+    high_runs as (
+        select id, user_id, created_at, run,
+               min(created_at) over (partition by user_id, run) as run_start
+          from runs
+         where high
+    ),
+    sustained as (
+        select distinct on (user_id, run) id, user_id
+          from high_runs
+         where created_at - run_start >= interval '60 seconds'
+         order by user_id, run, created_at, id
+    )
+    update public.user1 u
+       set stress_events = coalesce(u.stress_events, 0) + e.events
+      from (select user_id, count(*)::integer as events
+              from sustained
+             where id in (select id from new_rows)
+             group by user_id) e
+     where u.id::text = e.user_id;
+    return null;
+end;
+$$;
+
+drop trigger if exists stress_records_touch_user1 on public.stress_records;
+drop function if exists public.user1_touch_from_stress_records();
+drop trigger if exists stress_records_update_user1 on public.stress_records;
+create trigger stress_records_update_user1
+    after insert on public.stress_records
+    referencing new table as new_rows
+    for each statement execute function public.user1_from_stress_records();
@@ -0,0 +1,217 @@
+"""
+stress_queries.py - Range and Department Drill-Down Queries
+Aggregates stress_records for a time range, department and/or user. Served
+from the daily rollups (plus an indexed hourly scan for single days) on the
+local replica; with offline mode off, from the shared analytics service
+or the ingestion service's in-memory rollups when one is configured, else
+by filtered Supabase reads.
+"""
+
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+import numpy as np
+from config import INGEST_SERVICE_URL, ANALYTICS_SERVICE_URL, HISTORY_DAYS
+from local_store import db, store, rollups
+from ingestion_service import fetch_summary
+from analytics_service import fetch_payload
+from records import User, StressRecordBatch
+import instrumentation
+import time_buckets
+
+
+RANGE_PRESETS = ('today', '7d', '30d', 'custom')
+FETCH_PAGE_SIZE = 1000
+ID_CHUNK_SIZE = 200  # user ids per in_() filter, so a large department stays within URL limits
+CACHE_SIZE = 32
+
+# (start, end, department, user_id, replica version) -> summary. Flipping
+# between filters answers from memory until the replica changes. Dashboard
+# workers share it, hence the lock.
+_summary_cache = OrderedDict()
+_summary_lock = threading.Lock()
+
+
+def preset_range(preset, now=None):
+    """Return (start, end) date strings for a preset; end is exclusive."""
+    now = now or time_buckets.now()
+    tomorrow = (now + timedelta(days=1)).strftime('%Y-%m-%d')
+    days = {'today': 0, '7d': 6, '30d': 29}[preset]
+    return (now - timedelta(days=days)).strftime('%Y-%m-%d'), tomorrow
+
+
+def parse_custom_range(start_text, end_text):
+    """Validate 'YYYY-MM-DD' inputs and make the end date inclusive."""
+    start = datetime.strptime(start_text.strip(), '%Y-%m-%d')
+    end = datetime.strptime(end_text.strip(), '%Y-%m-%d')
+    if end < start:
+        raise ValueError("End date is before start date")
+    return start.strftime('%Y-%m-%d'), (end + timedelta(days=1)).strftime('%Y-%m-%d')
+
+
+def previous_range(start, end):
+    """The equally long period immediately before [start, end)."""
+    start_dt = datetime.strptime(start, '%Y-%m-%d')
+    length = datetime.strptime(end, '%Y-%m-%d') - start_dt
+    return (start_dt - length).strftime('%Y-%m-%d'), start
+
+
+def is_single_day(start, end):
+    return (datetime.strptime(end, '%Y-%m-%d') - datetime.strptime(start, '%Y-%m-%d')).days <= 1
+
+
+def load_departments():
+    """Distinct non-empty departments from user1."""
+    if store is None and ANALYTICS_SERVICE_URL:
+        return fetch_payload(ANALYTICS_SERVICE_URL, '/departments')
+    rows = db.table('user1').select('department').execute().data or []
+    return sorted({r['department'] for r in rows if r.get('department')})
+
+
+def load_department_users(department=None):
+    """Users for the user filter, optionally limited to one department."""
+    if store is None and ANALYTICS_SERVICE_URL:
+        return User.from_rows(fetch_payload(ANALYTICS_SERVICE_URL, '/users', {'department': department}))
+    query = db.table('user1').select('id, first_name, last_name, email, department')
+    if department:
+        query = query.eq('department', department)
+    return User.from_rows(query.order('first_name').execute().data)
+
+
+def empty_summary():
+    """Summary shape for a range with no records."""
+    return {'sessions': 0, 'score_sum': 0.0, 'high_stress_count': 0, 'active_users': 0,
+            'total_users': 0, 'daily': {}, 'hourly': {}, 'levels': {}, 'emotions': {}}
+
+
+def _batch_summary(batch, total_users):
+    """Fold a StressRecordBatch into the dict every dashboard widget reads."""
+    return {
+        'sessions': len(batch),
+        'score_sum': batch.score_sum(),
+        'max_score': batch.max_score(),
+        'high_stress_count': batch.high_count(),
+        'active_users': batch.average_daily_active_users(),
+        'total_users': total_users,
+        'daily': batch.daily_means(),
+        'hourly': batch.hourly_means(),
+        'levels': batch.level_counts(),
+        'emotions': batch.emotion_counts(),
+    }
+
+
+def _hourly_rows(start, end, department, user_id):
+    """Indexed raw scan for one local day's (hour, score_sum, count)."""
+    where = 'created_epoch >= ? AND created_epoch < ?'
+    params = list(time_buckets.epoch_bounds(start, end))
+    if user_id is not None:
+        where += ' AND user_id = ?'
+        params.append(user_id)
+    elif department:
+        # Subquery instead of a bound id list: no parameter limit for big departments.
+        where += " AND user_id IN (SELECT json_extract(data, '$.id') FROM user1 WHERE department = ?)"
+        params.append(department)
+    return store.query(
+        f"SELECT local_hour(created_at) AS hour, SUM(avg_stress_score), COUNT(*) "
+        f"FROM stress_records WHERE {where} GROUP BY 1 HAVING hour != ''", params)
+
+
+def _local_summary(start, end, department, user_id):
+    summary = rollups.summary(start, end, department=department, user_id=user_id)
+    if is_single_day(start, end):
+        summary['hourly'] = {f"{h}:00": int(t / c * 100)
+                             for h, t, c in sorted(_hourly_rows(start, end, department, user_id)) if c}
+    return summary
+
+
+def fetch_record_pages(start, end, user_ids=None, client=None):
+    """Pages of stress_records dicts for local days [start, end) from
+    Supabase (`client`, default db), optionally only for some users.
+
+    Keyset pages on (created_at, id) are never capped or shifted by new
+    rows. Long user lists go out in chunks of ID_CHUNK_SIZE, each read in
+    time order, so one user's records still arrive oldest first.
+    """
+    client = client or db
+    start, end = time_buckets.utc_bounds(start, end)
+    chunks = [None] if user_ids is None else [user_ids[i:i + ID_CHUNK_SIZE]
+                                              for i in range(0, len(user_ids), ID_CHUNK_SIZE)]
+    for chunk in chunks:
+        cursor = None
+        while True:
+            query = (client.table('stress_records')
+                     .select('id, user_id, created_at, avg_stress_score, stress_level, dominant_emotion')
+                     .gte('created_at', start).lt('created_at', end))
+            if chunk is not None:
+                query = query.in_('user_id', chunk)
+            if cursor:
+                stamp, row_id = cursor
+                query = query.or_(f'created_at.gt."{stamp}",and(created_at.eq."{stamp}",id.gt.{row_id})')
+            page = query.order('created_at').order('id').limit(FETCH_PAGE_SIZE).execute().data or []
+            if page:
+                yield page
+            if len(page) < FETCH_PAGE_SIZE:
+                break
+            cursor = (page[-1]['created_at'], page[-1]['id'])
+
+
+def _remote_summary(start, end, department, user_id):
+    user_ids = None
+    if user_id is not None:
+        user_ids = [user_id]
+    elif department:
+        user_ids = [u.id for u in load_department_users(department)]
+    total = len(user_ids) if user_ids is not None else len(db.table('user1').select('id').execute().data or [])
+    # Pages are folded into columns as they arrive; no list of dicts is kept.
+    return _batch_summary(StressRecordBatch.from_pages(fetch_record_pages(start, end, user_ids)), total)
+
+
+@instrumentation.timed('query.user_history')
+def load_user_history(user_id, days=HISTORY_DAYS):
+    """(epoch seconds, stress %) arrays of every sample one user recorded
+    in the last `days` days, oldest first."""
+    today = time_buckets.now()
+    start = (today - timedelta(days=days - 1)).strftime('%Y-%m-%d')
+    end = (today + timedelta(days=1)).strftime('%Y-%m-%d')
+    if store is None:
+        rows = [(r['created_at'], r['avg_stress_score'])
+                for page in fetch_record_pages(start, end, [user_id]) for r in page]
+    else:
+        store.ensure_synced('stress_records')
+        rows = store.query("SELECT created_at, avg_stress_score FROM stress_records "
+                           "WHERE user_id = ? AND created_epoch >= ? AND created_epoch < ? ORDER BY created_epoch",
+                           (user_id, *time_buckets.epoch_bounds(start, end)))
+    if not rows:
+        return np.empty(0), np.empty(0)
+    stamps, scores = zip(*rows)
+    return time_buckets.parse_iso_array(stamps), np.array(scores, np.float64) * 100
+
+
+@instrumentation.timed('query.stress_summary')
+def query_stress_summary(start, end, department=None, user_id=None):
+    """Aggregate stress for [start, end) filtered by department or user.
+
+    'active_users' is the average number of users active per day.
+    """
+    if store is None:
+        if ANALYTICS_SERVICE_URL:
+            return fetch_payload(ANALYTICS_SERVICE_URL, '/summary', {'start': start, 'end': end,
+                                                                     'department': department, 'user_id': user_id})
+        if INGEST_SERVICE_URL:
+            return fetch_summary(INGEST_SERVICE_URL, start, end, department, user_id)
+        return _remote_summary(start, end, department, user_id)
+    store.ensure_synced('stress_records')
+    store.ensure_synced('user1')
+    key = (start, end, department, user_id, store.version)
+    with _summary_lock:
+        summary = _summary_cache.get(key)
+        if summary is not None:
+            _summary_cache.move_to_end(key)
+            return summary
+    # Computed unlocked: another filter's summary need not wait for this one.
+    summary = _local_summary(start, end, department, user_id)
+    with _summary_lock:
+        _summary_cache[key] = summary
+        while len(_summary_cache) > CACHE_SIZE:
+            _summary_cache.popitem(last=False)
+    return summary
@@ -0,0 +1,272 @@
+"""
+time_buckets.py - Timestamp Parsing and Time-Zone Aware Bucketing
+Parses ISO-8601 created_at values (either 'T' or ' ' separator, optional
+fraction and offset; naive values are UTC) into epoch seconds, and buckets
+them by hour, day, week or month in the display time zone. Shared by the
+rollups, record batches, charts and reports.
+"""
+
+import re
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from zoneinfo import ZoneInfo
+import numpy as np
+from config import DISPLAY_TIMEZONE
+
+
+BUCKET_UNITS = ('hour', 'day', 'week', 'month')
+PREFIX_CACHE_SIZE = 1 << 16
+
+_OFFSET_RE = re.compile(r'(Z|[+-]\d{2}:?\d{2})$')
+
+
+@lru_cache(maxsize=32)
+def get_zone(name=None):
+    """ZoneInfo for a name, defaulting to DISPLAY_TIMEZONE."""
+    name = name or DISPLAY_TIMEZONE
+    return timezone.utc if name.upper() == 'UTC' else ZoneInfo(name)
+
+
+def zone_label(name=None):
+    """Human label such as 'Asia/Colombo (GMT+5:30)' for the current offset."""
+    offset = datetime.now(get_zone(name)).utcoffset() or timedelta(0)
+    minutes = int(offset.total_seconds() // 60)
+    sign = '+' if minutes >= 0 else '-'
+    hours, mins = divmod(abs(minutes), 60)
+    return f"{name or DISPLAY_TIMEZONE} (GMT{sign}{hours}{f':{mins:02d}' if mins else ''})"
+
+
+def now(name=None):
+    return datetime.now(get_zone(name))
+
+
+def format_local(stamp, fmt='%Y-%m-%d %H:%M', zone=None):
+    """A stored timestamp as display-zone wall-clock text (unchanged if unparseable)."""
+    epoch = parse_iso(stamp) if isinstance(stamp, str) else float('nan')
+    if epoch != epoch:
+        return str(stamp)
+    return datetime.fromtimestamp(epoch, get_zone(zone)).strftime(fmt)
+
+
+# ---------- parsing ----------
+
+@lru_cache(maxsize=256)
+def _offset_seconds(suffix):
+    if suffix in ('', 'Z'):
+        return 0
+    digits = suffix[1:].replace(':', '')
+    seconds = int(digits[:2]) * 3600 + int(digits[2:4]) * 60
+    return -seconds if suffix[0] == '-' else seconds
+
+
+def parse_iso(stamp):
+    """Epoch seconds for one ISO timestamp, NaN if it cannot be parsed.
+
+    Deliberately uncached: datetime.fromisoformat beats an LRU lookup on the
+    date/hour prefix plus reading the rest in Python. Repeated prefixes are
+    cached after parsing instead, in _utc_offset and _local_slot.
+    """
+    try:
+        parsed = datetime.fromisoformat(stamp)
+    except (TypeError, ValueError):
+        return float('nan')
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def _field(cols, start, stop, ok):
+    """Integer value of digit columns [start, stop); clears `ok` where a
+    character is not a digit."""
+    value = np.zeros(cols.shape[1], np.int64)
+    for col in range(start, stop):
+        digit = cols[col] - np.uint8(48)  # wraps around for anything below '0'
+        ok &= digit <= 9
+        value = value * 10 + digit
+    return value
+
+
+def _days_from_civil(year, month, day):
+    """Days since 1970-01-01 for proleptic Gregorian dates (vectorized)."""
+    year = year - (month <= 2)
+    era = np.floor_divide(year, 400)
+    yoe = year - era * 400
+    doy = (153 * (month + np.where(month > 2, -3, 9)) + 2) // 5 + day - 1
+    doe = yoe * 365 + yoe // 4 - yoe // 100 + doy
+    return era * 146097 + doe - 719468
+
+
+def parse_iso_array(stamps):
+    """Vectorized parse_iso for a sequence of timestamps -> float64 epochs.
+
+    Timestamps are grouped by length; within a group sharing one offset
+    suffix (the usual case for a query result) the date and time fields are
+    read straight from the character codes with NumPy. Rows that do not fit
+    the group's layout fall back to the scalar parser.
+    """
+    stamps = stamps if isinstance(stamps, (list, tuple)) else list(stamps)
+    out = np.full(len(stamps), np.nan)
+    if not stamps:
+        return out
+    try:
+        arr = np.array(stamps, dtype=bytes)  # None -> b'None', too short to parse
+    except (UnicodeEncodeError, TypeError, ValueError):
+        out[:] = [parse_iso(s) for s in stamps]
+        return out
+    lengths = np.char.str_len(arr)
+    for length in np.unique(lengths):
+        if length < 10:
+            continue  # too short for a date: stays NaN
+        idx = np.flatnonzero(lengths == length)
+        group = arr[idx].astype(f'S{length}')
+        # One contiguous row of ASCII codes per character position.
+        cols = np.ascontiguousarray(group.view(np.uint8).reshape(len(group), length).T)
+        match = _OFFSET_RE.search(group[0].decode()) if length > 19 else None
+        suffix = match.group(0) if match else ''
+        body = length - len(suffix)
+
+        ok = (cols[4] == ord('-')) & (cols[7] == ord('-'))
+        for i, ch in enumerate(suffix):
+            ok &= cols[body + i] == ord(ch)
+        if not suffix:
+            # No row may carry an offset the first one lacks.
+            for col in range(19, length):
+                ok &= (cols[col] != ord('Z')) & (cols[col] != ord('+')) & (cols[col] != ord('-'))
+        month, day = _field(cols, 5, 7, ok), _field(cols, 8, 10, ok)
+        ok &= (month >= 1) & (month <= 12) & (day >= 1) & (day <= 31)
+        epoch = (_days_from_civil(_field(cols, 0, 4, ok), month, day) * 86400).astype(np.float64)
+        for start, scale, limit in ((11, 3600, 24), (14, 60, 60), (17, 1, 61)):
+            if body >= start + 2:
+                value = _field(cols, start, start + 2, ok)
+                ok &= value < limit
+                epoch += value * scale
+        if body > 20:
+            ok &= cols[19] == ord('.')
+            epoch += _field(cols, 20, body, ok) / 10.0 ** (body - 20)
+        out[idx] = epoch - _offset_seconds(suffix)
+
+        odd = np.flatnonzero(~ok)
+        if len(odd):
+            out[idx[odd]] = [parse_iso(stamps[i]) for i in idx[odd]]
+    return out
+
+
+# ---------- bucketing ----------
+
+@lru_cache(maxsize=PREFIX_CACHE_SIZE)
+def _utc_offset(zone_name, hour_index):
+    """UTC offset (seconds) of a zone during one UTC hour."""
+    moment = datetime.fromtimestamp(hour_index * 3600, timezone.utc).astimezone(get_zone(zone_name))
+    return int(moment.utcoffset().total_seconds())
+
+
+def to_local(epochs, zone=None):
+    """Shift UTC epochs to local wall-clock seconds in the zone (NaN kept)."""
+    epochs = np.asarray(epochs, dtype=np.float64)
+    local = np.full(epochs.shape, np.nan)
+    valid = ~np.isnan(epochs)
+    if valid.any():
+        hours, inverse = np.unique((epochs[valid] // 3600).astype(np.int64), return_inverse=True)
+        offsets = np.array([_utc_offset(zone or DISPLAY_TIMEZONE, int(h)) for h in hours], dtype=np.float64)
+        local[valid] = epochs[valid] + offsets[inverse.ravel()]
+    return local
+
+
+def bucket_index(epochs, unit='day', zone=None):
+    """Integer bucket per epoch: hours/days/Monday-weeks/months since 1970, local time.
+
+    Unparseable timestamps map to -1 << 40.
+    """
+    if unit not in BUCKET_UNITS:
+        raise ValueError(f"Unknown bucket unit: {unit}")
+    local = to_local(epochs, zone)
+    valid = ~np.isnan(local)
+    seconds = np.where(valid, local, 0).astype(np.int64)
+    if unit == 'hour':
+        index = seconds // 3600
+    else:
+        days = seconds // 86400
+        if unit == 'day':
+            index = days
+        elif unit == 'week':
+            index = days - (days + 3) % 7  # 1970-01-01 was a Thursday
+        else:
+            index = days.astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+    return np.where(valid, index, -1 << 40)
+
+
+@lru_cache(maxsize=PREFIX_CACHE_SIZE)
+def bucket_label(index, unit='day'):
+    """Label of a bucket index: 'YYYY-MM-DDTHH:00', 'YYYY-MM-DD' (day or
+    week start) or 'YYYY-MM'."""
+    if index == -1 << 40:
+        return ''
+    if unit == 'hour':
+        return f"{np.datetime64(int(index), 'h').astype(datetime):%Y-%m-%dT%H}:00"
+    if unit == 'month':
+        return str(np.datetime64(int(index), 'M'))
+    return str(np.datetime64(int(index), 'D'))
+
+
+def bucket(epochs, unit='day', zone=None):
+    """Return (codes, labels): codes index into labels, which are in time
+    order, so np.bincount(codes, ...) aggregates per bucket."""
+    index = bucket_index(epochs, unit, zone)
+    if not len(index):
+        return np.empty(0, np.intp), []
+    values, codes = np.unique(index, return_inverse=True)
+    return codes.ravel(), [bucket_label(int(v), unit) for v in values]
+
+
+def hour_of_day(epochs, zone=None):
+    """Local hour 0-23 per epoch, -1 where unparseable."""
+    local = to_local(epochs, zone)
+    valid = ~np.isnan(local)
+    hours = (np.where(valid, local, 0).astype(np.int64) // 3600) % 24
+    return np.where(valid, hours, -1).astype(np.int8)
+
+
+# ---------- scalar helpers (rollups, SQLite functions) ----------
+
+@lru_cache(maxsize=PREFIX_CACHE_SIZE)
+def _local_slot(zone_name, slot):
+    """('YYYY-MM-DD', 'HH') in the zone for one UTC quarter hour; every real
+    offset is a multiple of 15 minutes, so rows in the same slot share it."""
+    moment = datetime.fromtimestamp(slot * 900, timezone.utc).astimezone(get_zone(zone_name))
+    return moment.strftime('%Y-%m-%d'), moment.strftime('%H')
+
+
+def _local_fields(stamp, zone):
+    epoch = parse_iso(stamp) if isinstance(stamp, str) else float('nan')
+    if epoch != epoch:
+        return '', ''
+    return _local_slot(zone or DISPLAY_TIMEZONE, int(epoch // 900))
+
+
+def local_day(stamp, zone=None):
+    """'YYYY-MM-DD' of a timestamp in the display zone ('' if unparseable)."""
+    return _local_fields(stamp, zone)[0]
+
+
+def local_hour(stamp, zone=None):
+    """Local 'HH' of a timestamp in the display zone ('' if unparseable)."""
+    return _local_fields(stamp, zone)[1]
+
+
+def epoch_bounds(start_day, end_day, zone=None):
+    """Epoch-second bounds for local days [start_day, end_day), for filters on
+    the replica's created_epoch column."""
+    tz = get_zone(zone)
+    return tuple(datetime.strptime(day, '%Y-%m-%d').replace(tzinfo=tz).timestamp() for day in (start_day, end_day))
+
+
+def utc_bounds(start_day, end_day, zone=None):
+    """UTC ISO bounds for local days [start_day, end_day), for created_at
+    filters on the server (timestamptz compares by time there)."""
+    tz = get_zone(zone)
+
+    def to_utc(day):
+        local = datetime.strptime(day, '%Y-%m-%d').replace(tzinfo=tz)
+        return local.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S')
+
+    return to_utc(start_day), to_utc(end_day)